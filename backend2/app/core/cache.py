@@ -3,7 +3,7 @@ Cache manager for in-memory caching with TTL support.
 Provides automatic cache invalidation on write operations.
 """
 from functools import wraps
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 from cachetools import TTLCache
 import hashlib
 import json
@@ -24,7 +24,7 @@ def generate_cache_key(func_name: str, *args, **kwargs) -> str:
         **kwargs: Keyword arguments
         
     Returns:
-        MD5 hash of the function signature
+        "<func_name>:<MD5 hash of the arguments>", so keys can be invalidated by prefix
     """
     # Create a stable string representation of the arguments
     key_data = {
@@ -33,10 +33,10 @@ def generate_cache_key(func_name: str, *args, **kwargs) -> str:
         "kwargs": {k: str(v) for k, v in sorted(kwargs.items())}
     }
     key_string = json.dumps(key_data, sort_keys=True)
-    return hashlib.md5(key_string.encode()).hexdigest()
+    return f"{func_name}:{hashlib.md5(key_string.encode()).hexdigest()}"
 
 
-def cached(key_prefix: str = ""):
+def cached(key_prefix: str = "", key: Optional[Callable[..., Any]] = None):
     """
     Decorator for caching function results with TTL.
     
@@ -44,9 +44,16 @@ def cached(key_prefix: str = ""):
         @cached(key_prefix="skills")
         def get_skills(grade: int):
             return db.query(Skill).filter(Skill.grade == grade).all()
+        
+        # Explicit key (e.g. when an argument is a DB session), invalidated with
+        # invalidate_cache(f"stats:get_stats:{user_id}")
+        @cached(key_prefix="stats", key=lambda db, user_id: user_id)
+        def get_stats(db: Session, user_id: UUID): ...
     
     Args:
         key_prefix: Optional prefix for cache keys (e.g., "skills", "questions")
+        key: Optional function of the call arguments giving the key suffix
+             instead of a hash of all arguments
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
@@ -57,7 +64,10 @@ def cached(key_prefix: str = ""):
             
             # Generate cache key
             func_name = f"{key_prefix}:{func.__name__}" if key_prefix else func.__name__
-            cache_key = generate_cache_key(func_name, *args, **kwargs)
+            if key is not None:
+                cache_key = f"{func_name}:{key(*args, **kwargs)}"
+            else:
+                cache_key = generate_cache_key(func_name, *args, **kwargs)
             
             # Check if result is cached
             if cache_key in _cache:
@@ -15,6 +15,56 @@ class Settings(BaseSettings):
     CACHE_TTL: int = 300  # 5 minutes in seconds
     CACHE_MAX_SIZE: int = 1000  # Maximum cache entries
     
+    # Template sandbox settings
+    SANDBOX_POOL_SIZE: int = 4  # Worker processes for template code (0 = run in-process)
+    SANDBOX_ACQUIRE_TIMEOUT: int = 30  # Seconds to wait for a free worker
+    
+    # Question storage: "full" stores rendered text, "compact" stores (template version, seed)
+    QUESTION_STORAGE_MODE: str = "full"
+    RENDER_CACHE_SIZE: int = 5000  # Rendered (version, seed) outputs kept in memory
+    
+    # Practice instance pools (pre-generated questions per template)
+    PRACTICE_POOL_ENABLED: bool = True
+    PRACTICE_POOL_CAPACITY: int = 60  # Ready instances kept per template
+    PRACTICE_POOL_LOW_WATER: int = 20  # Refill when a pool drops below this
+    PRACTICE_POOL_MAX_TEMPLATES: int = 500  # Least recently used pools are dropped beyond this
+    PRACTICE_POOL_REFILL_INTERVAL: float = 2.0  # Seconds between refiller sweeps
+    PRACTICE_POOL_SPILL: bool = False  # Persist pools to the DB on shutdown and reload them lazily
+    
+    # Question generation worker (python -m app.worker)
+    GENERATION_JOBS_INLINE: bool = False  # Run jobs inside the create request instead of queueing them for the worker
+    GENERATION_WORKER_CONCURRENCY: int = 4  # Jobs one worker runs at once
+    GENERATION_WORKER_POLL_INTERVAL: float = 2.0  # Seconds between queue polls when idle
+    GENERATION_WORKER_HEARTBEAT: float = 15.0  # Seconds between heartbeats of running jobs
+    GENERATION_JOB_STALE_SECONDS: int = 120  # Processing jobs without a heartbeat this long are recovered
+    GENERATION_JOB_MAX_ATTEMPTS: int = 3  # Attempts before a failing job stays failed
+    GENERATION_JOB_RETRY_DELAY: float = 30.0  # Seconds before a retry, times the attempts so far
+    GENERATION_DEDUP_SET_LIMIT: int = 500000  # Stored questions per template held as an exact set; above, a Bloom filter
+    GENERATION_INSERT_CHUNK_SIZE: int = 500  # Generated questions per bulk INSERT
+    GENERATION_CHECKPOINT_SECONDS: float = 10.0  # Longest a job runs without committing its progress
+    GENERATION_JOB_SHARDS: int = 4  # Seed ranges of one job run at once (capped by SANDBOX_POOL_SIZE)
+    
+    # Executor metrics
+    EXECUTOR_METRICS_ENABLED: bool = True
+    EXECUTOR_METRICS_FLUSH_INTERVAL: int = 60  # Seconds between flushes to template_execution_stats
+    
+    # Assessment paper generation
+    TEMPLATE_INDEX_TTL: int = 300  # Seconds before the in-memory template index is rebuilt anyway
+    ASSESSMENT_MAX_PER_TOPIC: int = 0  # Templates per topic in a paper before others are preferred (0 = no cap)
+    ASSESSMENT_GENERATION_WORKERS: int = 8  # Concurrent template executions across all papers
+    ASSESSMENT_PAPER_DEADLINE: float = 20.0  # Seconds to fill a paper; incomplete papers are discarded (live starts get a 503)
+    ASSESSMENT_PAPER_BANK_DEPTH: int = 20  # Ready papers kept per grade (0 = always generate live)
+    ASSESSMENT_PAPER_BANK_GRADES: str = ""  # Comma-separated grades to pre-build; empty = every grade with students
+    ASSESSMENT_PAPER_BANK_INTERVAL: float = 30.0  # Seconds between builder sweeps
+    ASSESSMENT_PAPER_BANK_MAX_AGE_HOURS: int = 24  # Older papers are dropped so template edits reach students
+    ASSESSMENT_ANSWER_VALIDATORS: bool = True  # Re-check mismatched answers with v1 logical_answer validators
+    ASSESSMENT_AUTOSAVE_INTERVAL: float = 5.0  # Seconds between batched writes of autosaved answers
+    ASSESSMENT_AUTOSAVE_MAX_PENDING: int = 2000  # Buffered answers that trigger an early write
+    REPORT_EXPORT_BATCH_SIZE: int = 1000  # Sessions fetched per server-side cursor batch when exporting reports
+    ROSTER_IMPORT_CHUNK_SIZE: int = 1000  # Roster rows looked up and inserted per statement
+    ROSTER_IMPORT_BACKGROUND_BYTES: int = 512 * 1024  # Larger uploads are imported in the background
+    ROSTER_IMPORT_MAX_ERRORS: int = 1000  # Row errors kept per import (all are counted)
+    
     class Config:
         env_file = ".env"
 
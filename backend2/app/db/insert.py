@@ -0,0 +1,17 @@
+"""
+Dialect-aware INSERT for bulk writes that skip rows hitting a unique constraint.
+"""
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def insert_for(db: Session, table: Table):
+    """
+    INSERT construct supporting .on_conflict_do_nothing() and .returning()
+    for the session's database (PostgreSQL, or SQLite in local runs).
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
@@ -30,6 +30,14 @@ from app.modules.mentor.router import router as mentor_router
 
 from fastapi.staticfiles import StaticFiles
 from app.modules.upload.router import router as upload_router
+from app.modules.questions.sandbox import sandbox_pool
+from app.modules.questions.pool import practice_pool
+from app.modules.questions.metrics import executor_metrics
+from app.modules.assessment_integration import service as paper_service
+from app.modules.assessment_integration.paper_bank import paper_bank
+from app.modules.assessment_integration.autosave import answer_autosave
+from app.modules.questions.template_index import template_index
+from app.db.session import SessionLocal
 
 
 app = FastAPI(
@@ -91,6 +99,58 @@ api_router.include_router(mentor_router)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+def start_sandbox_pool():
+    # Pre-start template sandbox workers so the first request doesn't pay for it
+    if sandbox_pool.size > 0:
+        try:
+            sandbox_pool.start()
+        except OSError as e:
+            print(f"WARNING: Sandbox pool could not be started: {e}")
+
+@app.on_event("startup")
+def start_practice_pool():
+    # Background refiller for pre-generated practice questions
+    if settings.PRACTICE_POOL_ENABLED:
+        practice_pool.start()
+
+@app.on_event("startup")
+def start_executor_metrics():
+    # Periodic flush of per-template executor metrics
+    executor_metrics.start()
+
+@app.on_event("startup")
+def build_template_index():
+    # Template metadata for assessment paper selection
+    db = SessionLocal()
+    try:
+        template_index.build(db)
+    except Exception as e:
+        print(f"WARNING: Template index could not be built: {e}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_paper_bank():
+    # Background builder for pre-generated assessment papers
+    paper_bank.start()
+
+@app.on_event("startup")
+def start_answer_autosave():
+    # Batched writes of autosaved assessment answers
+    answer_autosave.start()
+
+@app.on_event("shutdown")
+def shutdown_sandbox_pool():
+    # Stop the refillers first; they submit work to the sandbox
+    practice_pool.shutdown()
+    paper_bank.shutdown()
+    paper_service.shutdown()
+    answer_autosave.shutdown()
+    executor_metrics.shutdown()
+    # Stop template sandbox worker processes
+    sandbox_pool.shutdown()
+
 @app.get("/health")
 def health():
     # Health check endpoint - force reload
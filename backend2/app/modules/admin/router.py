@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.db.session import get_db
 from app.core.security import get_current_user
 from app.modules.auth.models import User
 from app.modules.admin.models import AuditLog
 from app.modules.admin.schemas import AuditLogResponse
+from app.modules.questions.sandbox import executor, sandbox_pool
+from app.modules.questions.pool import practice_pool
+from app.modules.questions.metrics import executor_metrics
+from app.modules.assessment_integration.paper_bank import paper_bank
+from app.modules.assessment_integration.autosave import answer_autosave
+from app.modules.questions.template_index import template_index
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -19,6 +25,67 @@ def get_audit_logs(
     logs = db.query(AuditLog).filter(AuditLog.tenant_id == current_user.tenant_id).limit(100).all()
     return logs
 
+
+@router.get("/executor-stats")
+def get_executor_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Question executor statistics (compiled-code cache, sandbox pool, practice pool, template index).
+    """
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return {
+        "success": True,
+        "data": {
+            "compile_cache": executor.get_compile_cache_stats(),
+            "sandbox_pool": sandbox_pool.stats(),
+            "practice_pool": practice_pool.stats(),
+            "template_index": template_index.stats()
+        }
+    }
+
+
+@router.get("/paper-bank")
+def get_paper_bank_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Pre-built assessment papers: ready papers per grade and claim hit rate,
+    plus the answer autosave buffer.
+    """
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return {
+        "success": True,
+        "data": {**paper_bank.stats(db), "autosave": answer_autosave.stats()}
+    }
+
+
+@router.get("/template-metrics")
+def get_template_metrics(
+    hours: int = Query(24, ge=1, le=24 * 30, description="Look-back window"),
+    sort_by: str = Query("run_ms", description="run_ms, p95_ms, failure_rate, timeouts, duplicate_rate or executions"),
+    source: Optional[str] = Query(None, description="v1, v2 or adhoc"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Per-template executor metrics: executions, compile vs. run time, latency
+    percentiles, timeouts, exceptions by type and duplicate rate.
+    """
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return {
+        "success": True,
+        "data": executor_metrics.report(db, hours=hours, sort_by=sort_by, limit=limit, source=source)
+    }
+
 from app.modules.admin.schemas import (
     AdminDashboardOverview, PlatformHealthStat, ActivityMetric, AlertItem, 
     SkillTroubleItem, UserActivityItem, ActivityFeedItem, QuestionHealthItem
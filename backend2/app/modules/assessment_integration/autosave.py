@@ -0,0 +1,174 @@
+"""
+Answer autosave for in-progress assessments.
+
+Autosave requests only merge answer deltas into an in-memory buffer
+(session -> question -> latest answer), so repeated edits of one answer cost
+a single write. A background thread flushes the buffer every
+ASSESSMENT_AUTOSAVE_INTERVAL seconds, or sooner once
+ASSESSMENT_AUTOSAVE_MAX_PENDING answers are waiting, as one executemany
+UPDATE of student_answer. Submitting takes the session's unflushed answers
+and grades everything, so writes are spread over the exam instead of landing
+at the deadline.
+
+Answers being flushed stay visible to take() until the flush commits. Submit
+calls take() before it reads the stored answers, so every autosaved answer
+is either returned by take() or already committed when the rows are read
+(a flush that commits after the submit skips the completed session).
+
+The buffer is per process, so this only fully works for a single-process
+deployment: at most one interval of autosaved answers is lost if a worker
+dies, and with several workers a submit handled by another process only sees
+answers this one has already flushed. Submissions carry the full answer set,
+so only answers the client never resent at submit can be missed.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, bindparam, exists, update
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.assessment_integration.models import AssessmentSession, AssessmentSessionQuestion
+
+
+class AnswerAutosaveBuffer:
+    """Coalesces answer deltas per session and writes them in batches"""
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # session_id -> question_id (string) -> answer
+        self._pending: Dict[UUID, Dict[str, str]] = {}
+        self._pending_count = 0
+        # Answers taken by the running flush, until it commits
+        self._in_flight: Dict[UUID, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.received = 0
+        self.flushed = 0
+        self.flushes = 0
+
+    def add(self, session_id: UUID, answers: Dict[str, str]):
+        """Buffer answers for a session; later answers to the same question replace earlier ones"""
+        with self._lock:
+            session_answers = self._pending.setdefault(session_id, {})
+            before = len(session_answers)
+            session_answers.update(answers)
+            self._pending_count += len(session_answers) - before
+            self.received += len(answers)
+            full = self._pending_count >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def take(self, session_id: UUID) -> Dict[str, str]:
+        """Remove and return a session's unflushed answers, including any still being flushed (on submit)"""
+        with self._lock:
+            pending = self._pending.pop(session_id, {})
+            self._pending_count -= len(pending)
+            return {**self._in_flight.get(session_id, {}), **pending}
+
+    def _restore(self, pending: Dict[UUID, Dict[str, str]]):
+        """Put back answers of a failed flush without overwriting newer ones"""
+        with self._lock:
+            for session_id, answers in pending.items():
+                session_answers = self._pending.setdefault(session_id, {})
+                for question_id, answer in answers.items():
+                    if question_id not in session_answers:
+                        session_answers[question_id] = answer
+                        self._pending_count += 1
+
+    def flush(self) -> int:
+        """Write all buffered answers in one batched UPDATE; returns the number of answers sent"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_count = 0
+                self._in_flight = pending
+            try:
+                return self._write(pending)
+            finally:
+                with self._lock:
+                    self._in_flight = {}
+
+    def _write(self, pending: Dict[UUID, Dict[str, str]]) -> int:
+        params = []
+        for session_id, answers in pending.items():
+            for question_id, answer in answers.items():
+                try:
+                    params.append({"b_id": UUID(question_id), "b_session_id": session_id, "b_answer": answer})
+                except ValueError:
+                    continue # Not a question id; nothing to update
+        if not params:
+            return 0
+
+        # Matching on session_id too, so a delta can only touch its own session's
+        # questions, and never after the session was submitted
+        in_progress = exists().where(and_(
+            AssessmentSession.id == bindparam("b_session_id"),
+            AssessmentSession.status != "COMPLETED"
+        ))
+        statement = update(AssessmentSessionQuestion).where(and_(
+            AssessmentSessionQuestion.id == bindparam("b_id"),
+            AssessmentSessionQuestion.session_id == bindparam("b_session_id"),
+            in_progress
+        )).values(student_answer=bindparam("b_answer"))
+
+        db = SessionLocal()
+        try:
+            db.connection().execute(statement, params)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._restore(pending)
+            print(f"WARNING: Could not flush autosaved answers: {e}")
+            return 0
+        finally:
+            db.close()
+
+        with self._lock:
+            self.flushed += len(params)
+            self.flushes += 1
+        return len(params)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="assessment-autosave-flusher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # Whatever arrived after the last sweep
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending_sessions": len(self._pending),
+                "pending_answers": self._pending_count,
+                "received": self.received,
+                "flushed": self.flushed,
+                "flushes": self.flushes
+            }
+
+
+answer_autosave = AnswerAutosaveBuffer(
+    flush_interval=settings.ASSESSMENT_AUTOSAVE_INTERVAL,
+    max_pending=settings.ASSESSMENT_AUTOSAVE_MAX_PENDING
+)
@@ -0,0 +1,132 @@
+"""
+Streaming export of completed assessment reports.
+
+Rows are read with a server-side cursor (yield_per) as plain column tuples,
+with the student joined, so no ORM objects or relationships are loaded and
+memory stays flat however many sessions an uploader has.
+
+- CSV is written batch by batch and each batch is sent as soon as it is read
+- Excel uses an openpyxl write-only workbook (rows go to a temp file, not
+  memory); the finished file is spooled to disk and streamed in chunks
+"""
+
+import csv
+import io
+import tempfile
+from datetime import datetime
+from typing import Any, Iterator, List, Tuple
+from uuid import UUID
+
+import openpyxl
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.assessment_integration.models import AssessmentSession, AssessmentStudent
+
+HEADERS = ["Serial Number", "Student Name", "Grade", "School Name", "Completion Date", "Score", "Total Questions", "Accuracy (%)"]
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv"
+
+# Bytes per chunk when streaming the finished workbook
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def _reports_query(db: Session, uploader_id: UUID):
+    return db.query(
+        AssessmentStudent.serial_number,
+        AssessmentStudent.name,
+        AssessmentStudent.grade,
+        AssessmentStudent.school_name,
+        AssessmentSession.completed_at,
+        AssessmentSession.correct_count,
+        AssessmentSession.total_questions,
+        AssessmentSession.accuracy
+    ).join(
+        AssessmentStudent, AssessmentSession.student_id == AssessmentStudent.id
+    ).filter(
+        AssessmentStudent.uploaded_by_user_id == uploader_id,
+        AssessmentSession.status == "COMPLETED"
+    )
+
+
+def has_reports(db: Session, uploader_id: UUID) -> bool:
+    return _reports_query(db, uploader_id).first() is not None
+
+
+def iter_report_rows(uploader_id: UUID) -> Iterator[List[List[Any]]]:
+    """
+    Export rows in batches of REPORT_EXPORT_BATCH_SIZE, newest first.
+    Uses its own session: the generator outlives the request's session.
+    """
+    db = SessionLocal()
+    try:
+        query = _reports_query(db, uploader_id).order_by(
+            AssessmentSession.completed_at.desc()
+        ).yield_per(settings.REPORT_EXPORT_BATCH_SIZE)
+
+        batch = []
+        for serial_number, name, grade, school_name, completed_at, correct, total, accuracy in query:
+            batch.append([
+                serial_number,
+                name,
+                grade,
+                school_name,
+                completed_at.strftime("%Y-%m-%d %H:%M:%S") if completed_at else "N/A",
+                correct or 0,
+                total or 0,
+                accuracy or 0
+            ])
+            if len(batch) >= settings.REPORT_EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        db.close()
+
+
+def stream_csv(uploader_id: UUID) -> Iterator[bytes]:
+    """CSV bytes, one chunk per batch (UTF-8 with BOM so Excel detects the encoding)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(HEADERS)
+    for batch in iter_report_rows(uploader_id):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(uploader_id: UUID) -> Iterator[bytes]:
+    """
+    Excel bytes. An .xlsx is a zip that is only complete once the workbook is saved,
+    so chunks start after the last row; rows never accumulate in memory.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Assessment Reports")
+    ws.append(HEADERS)
+    for batch in iter_report_rows(uploader_id):
+        for row in batch:
+            ws.append(row)
+
+    with tempfile.SpooledTemporaryFile(max_size=FILE_CHUNK_SIZE * 16) as output:
+        wb.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_stream(uploader_id: UUID, export_format: str) -> Tuple[Iterator[bytes], str, str]:
+    """(byte chunks, media type, filename) for 'xlsx' or 'csv'"""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if export_format == "csv":
+        return stream_csv(uploader_id), CSV_MEDIA_TYPE, f"Assessment_Reports_{stamp}.csv"
+    return stream_xlsx(uploader_id), XLSX_MEDIA_TYPE, f"Assessment_Reports_{stamp}.xlsx"
@@ -0,0 +1,110 @@
+"""
+Assessment answer grading.
+
+A submission is graded in one pass over its questions: answers are compared
+with precompiled normalizers (case, surrounding whitespace and Markdown
+emphasis such as "**8.44**" are ignored). Answers that do not match and come
+from v1 templates are then re-checked by the templates' logical_answer
+validators, all in one batched sandbox call; a validator can only turn a
+mismatch into a correct answer, and failing validators leave the answer
+wrong. The result is a list of row mappings the caller writes with a single
+bulk update.
+"""
+
+import re
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.modules.questions.executor import CodeExecutionError
+from app.modules.questions.metrics import executor_metrics
+from app.modules.questions.models import QuestionGeneration, QuestionTemplate
+from app.modules.questions.sandbox import executor
+
+_MARKDOWN = re.compile(r'[*_`]')
+
+
+def normalize_answer(value: Any) -> str:
+    return str(value).strip().lower()
+
+
+def answers_match(correct: Any, given: Any) -> bool:
+    correct = normalize_answer(correct)
+    given = normalize_answer(given)
+    if correct == given:
+        return True
+    # e.g. "8.44" vs "**8.44**"
+    return _MARKDOWN.sub('', correct) == _MARKDOWN.sub('', given)
+
+
+def _validator_code(db: Session, questions: List[Any]) -> Dict[int, str]:
+    """
+    logical_answer code of the v1 templates among the questions' templates.
+    Rows without template_source (older sessions) count as v1 unless their id
+    is a v2 template, as in reports.
+    """
+    v1_ids = {q.template_id for q in questions if q.template_source == 'v1'}
+    legacy_ids = {q.template_id for q in questions if q.template_source is None} - v1_ids
+    if legacy_ids:
+        v2_ids = {
+            row[0] for row in db.query(QuestionGeneration.template_id).filter(
+                QuestionGeneration.template_id.in_(legacy_ids)
+            ).all()
+        }
+        v1_ids |= legacy_ids - v2_ids
+    if not v1_ids:
+        return {}
+    return {
+        template_id: code
+        for template_id, code in db.query(
+            QuestionTemplate.template_id,
+            QuestionTemplate.logical_answer
+        ).filter(QuestionTemplate.template_id.in_(v1_ids)).all()
+        if code
+    }
+
+
+def grade_submission(db: Session, questions: List[Any], answers: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Grade a session's questions against submitted answers.
+
+    Args:
+        questions: Rows with id, template_id, template_source, correct_answer, student_answer and is_correct
+        answers: question id (string) -> submitted answer
+
+    Returns:
+        One mapping per question with id, student_answer and is_correct ('True'/'False'
+        as stored). Questions without a submitted answer are graded on their stored
+        (autosaved) answer, if any; unanswered ones keep their current values
+    """
+    graded = []
+    mismatches = []
+    for q in questions:
+        given = answers.get(str(q.id), q.student_answer)
+        if given is None:
+            graded.append({'id': q.id, 'student_answer': q.student_answer, 'is_correct': q.is_correct})
+            continue
+        is_correct = answers_match(q.correct_answer, given)
+        graded.append({'id': q.id, 'student_answer': given, 'is_correct': str(is_correct)})
+        if not is_correct and given.strip():
+            mismatches.append((len(graded) - 1, q))
+
+    if mismatches and settings.ASSESSMENT_ANSWER_VALIDATORS:
+        validators = _validator_code(db, [q for _, q in mismatches])
+        checks = [
+            (index, (validators[q.template_id], graded[index]['student_answer'], q.correct_answer))
+            for index, q in mismatches if q.template_source != 'v2' and q.template_id in validators
+        ]
+        if checks:
+            try:
+                with executor_metrics.track('v1') as trace:
+                    verdicts = executor.execute_validator_batch([item for _, item in checks], trace=trace)
+            except CodeExecutionError as e:
+                print(f"WARNING: Answer validators failed, keeping normalized comparison: {e}")
+                verdicts = []
+            for (index, _), verdict in zip(checks, verdicts):
+                if verdict:
+                    graded[index]['is_correct'] = 'True'
+
+    return graded
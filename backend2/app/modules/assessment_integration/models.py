@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, BigInteger, Float, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -34,6 +34,13 @@ class AssessmentSession(Base):
     completed_at = Column(DateTime, nullable=True)
     status = Column(String, default="PENDING") # PENDING, IN_PROGRESS, COMPLETED
     
+    # Score summary, set when the session is submitted (NULL = not scored yet)
+    correct_count = Column(Integer, nullable=True)
+    wrong_count = Column(Integer, nullable=True)
+    skipped_count = Column(Integer, nullable=True)
+    total_questions = Column(Integer, nullable=True)
+    accuracy = Column(Float, nullable=True) # Percent, rounded to 2 decimals
+    
     # Relationship
     student = relationship("AssessmentStudent", back_populates="sessions")
     questions = relationship("AssessmentSessionQuestion", back_populates="session")
@@ -44,11 +51,16 @@ class AssessmentSessionQuestion(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("assessment_sessions.id"), nullable=False)
     template_id = Column(Integer, nullable=False) # Store the source template ID
+    template_source = Column(String, nullable=True) # 'v1' or 'v2' (v1 and v2 ids overlap); NULL on older rows
     
-    question_html = Column(String, nullable=False)
+    question_html = Column(String, nullable=True) # NULL when stored compactly (see template_version)
     question_type = Column(String, nullable=False)
     options = Column(String, nullable=True) # JSON string for options if MCQ
     
+    # Compact storage: re-render from (template version, seed) instead of storing text
+    template_version = Column(String, nullable=True)
+    generation_seed = Column(BigInteger, nullable=True)
+    
     correct_answer = Column(String, nullable=False)
     student_answer = Column(String, nullable=True)
     is_correct = Column(String, nullable=True) # True/False stored as string or boolean
@@ -56,3 +68,38 @@ class AssessmentSessionQuestion(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     session = relationship("AssessmentSession", back_populates="questions")
+
+class AssessmentPaper(Base):
+    """
+    A pre-generated, complete assessment paper waiting to be assigned.
+    Claimed (and deleted) by start-assessment, which copies its questions into a new session.
+    """
+    __tablename__ = "assessment_papers"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grade = Column(Integer, nullable=False, index=True)
+    questions = Column(JSON, nullable=False) # AssessmentSessionQuestion mappings without session_id
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AssessmentRosterImport(Base):
+    """
+    A roster upload processed in the background (large files).
+    Progress is committed after every chunk, so it can be polled while running.
+    """
+    __tablename__ = "assessment_roster_imports"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    uploaded_by_user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False, index=True)
+    filename = Column(String, nullable=True)
+    
+    status = Column(String, default="pending") # pending, processing, completed, failed
+    total_rows = Column(Integer, nullable=True) # Data rows per the sheet dimensions (estimate)
+    processed_rows = Column(Integer, default=0)
+    uploaded_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    errors = Column(JSON, nullable=True) # "Row N: ..." messages, first ROSTER_IMPORT_MAX_ERRORS only
+    status_detail = Column(String, nullable=True) # Why the import failed
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
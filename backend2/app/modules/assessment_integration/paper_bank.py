@@ -0,0 +1,226 @@
+"""
+Pre-built assessment paper bank.
+
+A background builder keeps up to `depth` complete, validated papers per grade
+in assessment_papers. Starting an assessment claims one (row lock with
+SKIP LOCKED, so concurrent students never get the same paper) and copies its
+questions into the new session in the same transaction. Returning students
+only get papers without templates they have already seen. When the bank for
+a grade has no such paper, start-assessment falls back to generating the
+paper live.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.assessment_integration import service as paper_service
+from app.modules.assessment_integration.models import AssessmentPaper, AssessmentStudent
+
+
+class AssessmentPaperBank:
+    """
+    Per-grade stock of ready papers.
+
+    - claim() runs on the request path and never executes template code
+    - The builder thread tops every grade up to `depth`, one paper at a time
+    - Papers older than `max_age_hours` are dropped so template edits reach students
+    """
+
+    def __init__(self, depth: int, grades: str, refill_interval: float, max_age_hours: int):
+        self.depth = depth
+        self.grades = [int(g) for g in grades.split(",") if g.strip()]
+        self.refill_interval = refill_interval
+        self.max_age_hours = max_age_hours
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------------
+
+    def claim(
+        self,
+        db: Session,
+        grade_level: int,
+        exclude_templates: Optional[set] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Lock and delete one ready paper for a grade and return its question mappings.
+        The claim only becomes final when the caller commits (together with the
+        session rows built from it); None if the bank has no paper for the grade.
+
+        With exclude_templates ((source, id) the student has already seen), only
+        papers using none of them are claimed; if every ready paper overlaps,
+        this returns None and the caller generates a paper live instead.
+        """
+        if self.depth <= 0:
+            return None
+
+        ready = db.query(AssessmentPaper).filter(
+            AssessmentPaper.grade == grade_level,
+            AssessmentPaper.created_at >= self._cutoff()
+        ).order_by(AssessmentPaper.created_at)
+
+        if not exclude_templates:
+            paper = ready.limit(1).with_for_update(skip_locked=True).first()
+        else:
+            paper = None
+            # Check without locking, then lock the first fitting paper no one else holds
+            for paper_id, questions in ready.with_entities(AssessmentPaper.id, AssessmentPaper.questions).all():
+                if paper_service.paper_overlaps(questions, exclude_templates):
+                    continue
+                paper = db.query(AssessmentPaper).filter(
+                    AssessmentPaper.id == paper_id
+                ).with_for_update(skip_locked=True).first()
+                if paper is not None:
+                    break
+
+        with self._lock:
+            if paper is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        # Top the grade up in the background either way
+        self._wake.set()
+
+        if paper is None:
+            return None
+        questions = [dict(q) for q in paper.questions]
+        db.delete(paper)
+        return questions
+
+    # ------------------------------------------------------------------
+    # Builder
+    # ------------------------------------------------------------------
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(hours=self.max_age_hours)
+
+    def target_grades(self, db: Session) -> List[int]:
+        if self.grades:
+            return self.grades
+        # Every grade that has students
+        grades = {
+            paper_service.parse_grade(row[0])
+            for row in db.query(AssessmentStudent.grade).distinct().all()
+        }
+        return sorted(g for g in grades if g)
+
+    def build_paper(self, db: Session, grade_level: int) -> bool:
+        """
+        Generate one paper and store it (caller commits).
+        Only complete papers, with every selected slot filled, are banked.
+
+        Raises:
+            PaperUnavailableError: If the grade has no assessment templates
+        """
+        selected_items, refill_candidates = paper_service.select_paper_templates(db, grade_level)
+        paper = paper_service.generate_paper(selected_items, refill_candidates)
+        rows = paper_service.build_question_rows(db, paper)
+
+        if not rows or len(rows) < len(selected_items):
+            print(f"WARNING: Discarding incomplete grade {grade_level} paper ({len(rows)}/{len(selected_items)} questions)")
+            return False
+
+        db.add(AssessmentPaper(grade=grade_level, questions=rows))
+        return True
+
+    def top_up(self, db: Session, grade_level: int, depth: Optional[int] = None) -> int:
+        """Build papers until the grade has `depth` ready ones; returns how many were added"""
+        depth = self.depth if depth is None else depth
+        ready = db.query(func.count(AssessmentPaper.id)).filter(
+            AssessmentPaper.grade == grade_level,
+            AssessmentPaper.created_at >= self._cutoff()
+        ).scalar() or 0
+
+        added = 0
+        failures = 0
+        while ready + added < depth and failures < 3 and not self._stop.is_set():
+            if self.build_paper(db, grade_level):
+                db.commit()
+                added += 1
+            else:
+                db.rollback()
+                failures += 1
+        return added
+
+    def _expire(self, db: Session):
+        expired = db.query(AssessmentPaper).filter(
+            AssessmentPaper.created_at < self._cutoff()
+        ).delete(synchronize_session=False)
+        db.commit()
+        if expired:
+            print(f"DEBUG: Dropped {expired} expired assessment papers")
+
+    def _sweep(self):
+        db = SessionLocal()
+        try:
+            self._expire(db)
+            for grade_level in self.target_grades(db):
+                if self._stop.is_set():
+                    break
+                try:
+                    added = self.top_up(db, grade_level)
+                    if added:
+                        print(f"DEBUG: Paper bank built {added} grade {grade_level} papers")
+                except paper_service.PaperUnavailableError as e:
+                    db.rollback()
+                    print(f"DEBUG: No papers for grade {grade_level}: {e}")
+        except Exception as e:
+            db.rollback()
+            print(f"WARNING: Paper bank sweep failed: {e}")
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sweep()
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+
+    def start(self):
+        if self.depth <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="assessment-paper-builder", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=settings.ASSESSMENT_PAPER_DEADLINE + 5)
+            self._thread = None
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        ready = db.query(AssessmentPaper.grade, func.count(AssessmentPaper.id)).filter(
+            AssessmentPaper.created_at >= self._cutoff()
+        ).group_by(AssessmentPaper.grade).all()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "depth": self.depth,
+                "ready": {grade: count for grade, count in ready},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0,
+                "builder_running": bool(self._thread and self._thread.is_alive())
+            }
+
+
+paper_bank = AssessmentPaperBank(
+    depth=settings.ASSESSMENT_PAPER_BANK_DEPTH,
+    grades=settings.ASSESSMENT_PAPER_BANK_GRADES,
+    refill_interval=settings.ASSESSMENT_PAPER_BANK_INTERVAL,
+    max_age_hours=settings.ASSESSMENT_PAPER_BANK_MAX_AGE_HOURS
+)
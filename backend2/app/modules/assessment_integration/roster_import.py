@@ -0,0 +1,254 @@
+"""
+Bulk student roster import.
+
+The workbook is streamed with openpyxl read-only mode and processed in chunks
+of ROSTER_IMPORT_CHUNK_SIZE rows. Each chunk costs one query for serial
+numbers that already exist and one multi-row INSERT ... ON CONFLICT
+(serial_number) DO NOTHING, then commits. A student inserted concurrently by
+another upload is reported like any other duplicate instead of failing the
+chunk. Problems are reported per row ("Row N: ..."); empty rows are skipped.
+
+Small uploads are imported inline. Large ones are saved to a temp file and
+imported in the background, with progress recorded on an
+AssessmentRosterImport row after every chunk.
+"""
+
+import os
+import uuid
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Tuple, Union
+
+import openpyxl
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.insert import insert_for
+from app.db.session import SessionLocal
+from app.modules.assessment_integration import service as paper_service
+from app.modules.assessment_integration.models import AssessmentRosterImport, AssessmentStudent
+
+# Result key -> expected header (case-insensitive)
+COLUMNS = {
+    'serial_number': 'serial number',
+    'name': 'student name',
+    'grade': 'grade',
+    'school_name': 'school name',
+    'phone_number': 'phone number',
+}
+REQUIRED = ('serial_number', 'name', 'grade', 'school_name')
+
+
+class RosterFormatError(Exception):
+    """The file is not a roster (empty, or a required column is missing)"""
+    pass
+
+
+def _column_indexes(header: Tuple[Any, ...]) -> Dict[str, int]:
+    headers = [str(h).lower().strip() if h else '' for h in header]
+    indexes = {}
+    for key, title in COLUMNS.items():
+        if title not in headers:
+            raise RosterFormatError(f"Missing required column: '{title}'")
+        indexes[key] = headers.index(title)
+    return indexes
+
+
+def _parse_row(row: Tuple[Any, ...], columns: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """Student fields from a sheet row; None for rows missing a required field"""
+    student = {}
+    for key, index in columns.items():
+        value = row[index] if index < len(row) else None
+        student[key] = str(value).strip() if value else None
+    if not all(student[key] for key in REQUIRED):
+        return None
+    return student
+
+
+class _ImportProgress:
+    def __init__(self):
+        self.processed_rows = 0
+        self.uploaded_count = 0
+        self.error_count = 0
+        self.errors: List[str] = []
+        self.seen_serials: Set[str] = set()
+
+    def error(self, row_number: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < settings.ROSTER_IMPORT_MAX_ERRORS:
+            self.errors.append(f"Row {row_number}: {message}")
+
+
+def _import_chunk(db: Session, chunk: List[Tuple[int, Tuple[Any, ...]]], columns: Dict[str, int], uploader_id: Any, progress: _ImportProgress):
+    """Insert one chunk of rows (caller commits)"""
+    students = []
+    for row_number, row in chunk:
+        try:
+            student = _parse_row(row, columns)
+        except Exception as e:
+            progress.error(row_number, str(e))
+            continue
+        if student is None:
+            continue # Skip empty rows
+        if student['serial_number'] in progress.seen_serials:
+            progress.error(row_number, f"Serial Number {student['serial_number']} appears more than once in the file.")
+            continue
+        progress.seen_serials.add(student['serial_number'])
+        students.append((row_number, student))
+    progress.processed_rows += len(chunk)
+
+    if not students:
+        return
+
+    existing = {
+        serial for (serial,) in db.query(AssessmentStudent.serial_number).filter(
+            AssessmentStudent.serial_number.in_([s['serial_number'] for _, s in students])
+        ).all()
+    }
+    new_students = []
+    for row_number, student in students:
+        if student['serial_number'] in existing:
+            progress.error(row_number, f"Serial Number {student['serial_number']} already exists.")
+        else:
+            new_students.append((row_number, student))
+    if not new_students:
+        return
+
+    table = AssessmentStudent.__table__
+    now = datetime.utcnow()
+    statement = insert_for(db, table).values([
+        dict(student, id=uuid.uuid4(), uploaded_by_user_id=uploader_id, created_at=now)
+        for _, student in new_students
+    ]).on_conflict_do_nothing(index_elements=['serial_number']).returning(table.c.serial_number)
+    inserted = {serial for (serial,) in db.execute(statement)}
+
+    progress.uploaded_count += len(inserted)
+    for row_number, student in new_students:
+        if student['serial_number'] not in inserted:
+            # Added by a concurrent upload since the lookup above
+            progress.error(row_number, f"Serial Number {student['serial_number']} already exists.")
+
+
+def _save_progress(job: AssessmentRosterImport, progress: _ImportProgress):
+    job.processed_rows = progress.processed_rows
+    job.uploaded_count = progress.uploaded_count
+    job.error_count = progress.error_count
+    job.errors = list(progress.errors)
+
+
+def import_roster(
+    db: Session,
+    source: Union[str, BinaryIO],
+    uploader_id: Any,
+    job: Optional[AssessmentRosterImport] = None
+) -> Dict[str, Any]:
+    """
+    Import a roster workbook (path or seekable file), committing after every chunk.
+    With a job, its progress is updated in the same commits.
+
+    Raises:
+        RosterFormatError: If the file is empty or lacks a required column
+    """
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise RosterFormatError("Empty file")
+        columns = _column_indexes(header)
+
+        progress = _ImportProgress()
+        chunk = []
+        for row_number, row in enumerate(rows, start=2): # Data starts on row 2
+            chunk.append((row_number, row))
+            if len(chunk) >= settings.ROSTER_IMPORT_CHUNK_SIZE:
+                _import_chunk(db, chunk, columns, uploader_id, progress)
+                if job is not None:
+                    _save_progress(job, progress)
+                db.commit()
+                chunk = []
+        _import_chunk(db, chunk, columns, uploader_id, progress)
+        if job is not None:
+            _save_progress(job, progress)
+        db.commit()
+    finally:
+        workbook.close()
+
+    paper_service.invalidate_dashboard_stats(uploader_id)
+    return {
+        "uploaded_count": progress.uploaded_count,
+        "error_count": progress.error_count,
+        "errors": progress.errors
+    }
+
+
+# ----------------------------------------------------------------------
+# Background imports
+# ----------------------------------------------------------------------
+
+def count_rows(path: str) -> Optional[int]:
+    """Data rows according to the sheet's recorded dimensions (None if the file has none)"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def create_import_job(db: Session, uploader_id: Any, filename: str, path: str) -> AssessmentRosterImport:
+    job = AssessmentRosterImport(
+        uploaded_by_user_id=uploader_id,
+        filename=filename,
+        status="pending",
+        total_rows=count_rows(path)
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def run_import_job(job_id: int, path: str):
+    """Import a saved upload for a job and delete the file (runs after the response)"""
+    db = SessionLocal()
+    try:
+        job = db.query(AssessmentRosterImport).filter(AssessmentRosterImport.id == job_id).first()
+        if not job:
+            return
+        job.status = "processing"
+        db.commit()
+
+        try:
+            import_roster(db, path, job.uploaded_by_user_id, job=job)
+            job.status = "completed"
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.status_detail = str(e)
+            print(f"WARNING: Roster import {job_id} failed: {e}")
+        job.completed_at = datetime.utcnow()
+        db.commit()
+        # Chunks committed before a failure stay imported
+        paper_service.invalidate_dashboard_stats(job.uploaded_by_user_id)
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def job_summary(job: AssessmentRosterImport) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "status_detail": job.status_detail,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows or 0,
+        "uploaded_count": job.uploaded_count or 0,
+        "error_count": job.error_count or 0,
+        "errors": job.errors or [],
+        "created_at": job.created_at,
+        "completed_at": job.completed_at
+    }
@@ -49,6 +49,10 @@ class AssessmentSubmission(BaseModel):
     session_id: UUID
     answers: dict[str, str] # question_id (UUID string) -> answer string (or JSON string)
 
+class AssessmentAutosave(BaseModel):
+    session_id: UUID
+    answers: dict[str, str] # Changed answers only: question_id (UUID string) -> answer string
+
 class AssessmentQuestionDetail(BaseModel):
     id: UUID
     question_html: str
@@ -0,0 +1,458 @@
+"""
+Assessment paper selection and generation.
+
+Templates for a paper are picked per grade: the fixed Grade 7 blueprint, or a
+topic-diverse mix of easy templates at a grade-dependent MCQ/input ratio,
+chosen from the in-memory template index; code is loaded for the chosen ones.
+A paper's templates run concurrently on a bounded, process-wide thread pool
+(each call then waits for a sandbox worker), so a paper takes about as long as
+its slowest template instead of the sum of all of them. Slots whose template
+fails are refilled from another template of the same topic until the
+per-paper deadline passes.
+"""
+
+import json
+import random
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.assessment_integration.grade7_blueprint import GRADE_7_TEMPLATE_IDS
+from app.modules.questions import rendering
+from app.modules.questions.models import QuestionGeneration
+from app.modules.questions.sandbox import executor
+from app.modules.questions.metrics import executor_metrics
+from app.modules.questions.template_index import attach_template_code, normalize_difficulty, template_index
+from app.modules.questions.sampler import index_sampler
+from app.modules.assessment_integration.models import AssessmentSession, AssessmentSessionQuestion, AssessmentStudent
+from app.core.cache import cached, invalidate_cache
+
+# Attempts per paper slot (the original template plus refills)
+MAX_SLOT_ATTEMPTS = 3
+
+# Shared by all requests, so a 9:00 rush queues here instead of flooding the sandbox
+_generation_pool = ThreadPoolExecutor(
+    max_workers=settings.ASSESSMENT_GENERATION_WORKERS,
+    thread_name_prefix="paper-generation"
+)
+
+
+class PaperUnavailableError(Exception):
+    """No templates to build an assessment paper from for a grade"""
+    pass
+
+
+def parse_grade(grade: Any) -> Optional[int]:
+    """Grade number from a free-form grade string such as 'Grade 7' or '7th'"""
+    match = re.search(r'\d+', str(grade))
+    return int(match.group()) if match else None
+
+
+def paper_ratio(grade_level: int) -> Tuple[int, int]:
+    """(MCQ, input) question counts of a paper for a grade"""
+    if grade_level <= 5:
+        return 18, 7
+    elif grade_level <= 8:
+        return 13, 12
+    return 10, 15
+
+
+def normalize_v2(t: QuestionGeneration) -> Dict[str, Any]:
+    return {
+        "id": t.template_id,
+        "source": "v2",
+        "topic": t.skill_name,
+        "difficulty": t.difficulty,
+        "code": t.question_template,
+        "answer_code": t.answer_template,
+        "type": t.type,
+        "obj": t
+    }
+
+
+def seen_templates(db: Session, student_id: Any) -> set:
+    """
+    (source, id) of templates used in any of the student's earlier assessment sessions.
+    Questions from before template_source was recorded count as both v1 and v2.
+    """
+    rows = db.query(AssessmentSessionQuestion.template_source, AssessmentSessionQuestion.template_id).join(
+        AssessmentSession, AssessmentSession.id == AssessmentSessionQuestion.session_id
+    ).filter(AssessmentSession.student_id == student_id).distinct().all()
+    seen = set()
+    for source, template_id in rows:
+        for s in ((source,) if source else ('v1', 'v2')):
+            seen.add((s, template_id))
+    return seen
+
+
+def paper_overlaps(questions: List[Dict[str, Any]], seen: set) -> bool:
+    """Whether a banked paper (question mappings) uses any of the (source, id) templates in seen"""
+    for q in questions:
+        sources = (q['template_source'],) if q.get('template_source') else ('v1', 'v2')
+        if any((source, q['template_id']) in seen for source in sources):
+            return True
+    return False
+
+
+def select_paper_templates(
+    db: Session,
+    grade_level: int,
+    exclude_templates: Optional[set] = None
+) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """
+    Pick the templates for one paper.
+    Templates in exclude_templates ((source, id), e.g. already seen) are only used if nothing else fits.
+
+    Returns:
+        (selected templates, templates failed slots may be refilled from)
+
+    Raises:
+        PaperUnavailableError: If the grade has no assessment templates
+    """
+    # SPECIAL HANDLING FOR GRADE 7
+    if grade_level == 7:
+        # Fetch the specific 25 templates
+        templates = db.query(QuestionGeneration).filter(
+            QuestionGeneration.template_id.in_(GRADE_7_TEMPLATE_IDS)
+        ).all()
+        
+        # Verify we have all of them (or as many as possible)
+        if not templates:
+             raise PaperUnavailableError("Grade 7 assessment templates not found")
+             
+        # Normalize to standard format
+        selected_items = [normalize_v2(t) for t in templates]
+            
+        # Shuffle to randomize order
+        random.shuffle(selected_items)
+        return selected_items, None
+    
+    # STANDARD LOGIC FOR OTHER GRADES
+    target_mcq, target_input = paper_ratio(grade_level)
+    total_target = target_mcq + target_input
+    
+    # Easy templates (v2 and active v1), plus medium v2 ones in case easy ones run short
+    pool = template_index.select(db, grade_level, 'easy') + template_index.select(db, grade_level, 'medium', source='v2')
+    if not pool:
+        raise PaperUnavailableError("No assessment questions available for this grade level")
+
+    # Topic-diverse, at the grade's MCQ/input ratio; medium only fills easy shortages
+    selected_items = index_sampler.sample(
+        pool,
+        total_target,
+        topic_cap=settings.ASSESSMENT_MAX_PER_TOPIC or None,
+        type_quota={'mcq': target_mcq, 'input': target_input},
+        difficulty_mix={'easy': 1.0},
+        exclude_ids=exclude_templates
+    )
+    
+    mediums = sum(1 for item in selected_items if normalize_difficulty(item['difficulty']) != 'easy')
+    if mediums:
+        print(f"DEBUG: Shortage in Easy templates for grade {grade_level}; used {mediums} medium templates")
+
+    # Code text only for the chosen templates; refill candidates load theirs when used
+    attach_template_code(db, selected_items)
+    return selected_items, pool
+
+
+def _strip_markdown(code: str) -> str:
+    if code.startswith("```python"):
+        code = code.replace("```python", "").replace("```", "")
+    return code
+
+
+def execute_template(template_data: Dict[str, Any]) -> Tuple[Dict[str, Any], str, List[str]]:
+    """
+    Run one normalized template (see start_assessment) with a fresh seed.
+    Safe to call from worker threads: templates without code (refill
+    candidates from the index) load it through their own session.
+
+    Returns:
+        (executor result, version source, version scripts)
+    """
+    if 'code' not in template_data:
+        db = SessionLocal()
+        try:
+            attach_template_code(db, [template_data])
+        finally:
+            db.close()
+        if 'code' not in template_data:
+            raise PaperUnavailableError(f"Template {template_data['id']} ({template_data['source']}) no longer exists")
+    
+    if template_data['source'] == 'v2':
+        q_code = _strip_markdown(template_data['code'])
+        a_code = _strip_markdown(template_data.get('answer_code', ''))
+
+        # Use sequential execution for V2 (shared context)
+        with executor_metrics.track('v2', template_data['id']) as trace:
+            result = executor.execute_sequential([q_code, a_code], trace=trace)
+        return result, 'v2', [q_code, a_code]
+
+    code = _strip_markdown(template_data['code'])
+    with executor_metrics.track('v1', template_data['id']) as trace:
+        result = executor.execute_generator(code, trace=trace)
+    return result, 'v1', [code]
+
+
+def _template_key(item: Dict[str, Any]) -> Tuple[str, int]:
+    """v1 and v2 template ids overlap, so templates are identified by (source, id)"""
+    return item['source'], item['id']
+
+
+def _replacement(
+    failed: Dict[str, Any],
+    candidates: List[Dict[str, Any]],
+    used_keys: set
+) -> Dict[str, Any]:
+    """Unused template of the same topic (same type preferred), else the same template with a new seed"""
+    same_topic = [c for c in candidates if c['topic'] == failed['topic'] and _template_key(c) not in used_keys]
+    same_type = [c for c in same_topic if (c['type'] or '').lower() == (failed['type'] or '').lower()]
+    if same_type:
+        return same_type[0]
+    if same_topic:
+        return same_topic[0]
+    return failed
+
+
+def generate_paper(
+    selected_items: List[Dict[str, Any]],
+    candidates: Optional[List[Dict[str, Any]]] = None,
+    deadline_seconds: Optional[float] = None
+) -> List[Tuple[Dict[str, Any], Dict[str, Any], str, List[str]]]:
+    """
+    Execute a paper's templates concurrently.
+
+    Args:
+        selected_items: Normalized templates, one per paper slot
+        candidates: Templates failed slots may be refilled from (by topic);
+                    defaults to selected_items, i.e. retry the same template
+        deadline_seconds: Give up on unfilled slots after this long
+
+    Returns:
+        (template_data, result, version_source, version_scripts) per filled
+        slot, in slot order. Slots still unfilled at the deadline are omitted.
+    """
+    if deadline_seconds is None:
+        deadline_seconds = settings.ASSESSMENT_PAPER_DEADLINE
+    candidates = candidates if candidates is not None else selected_items
+    deadline = time.monotonic() + deadline_seconds
+
+    slots: List[Optional[Tuple[Dict[str, Any], Dict[str, Any], str, List[str]]]] = [None] * len(selected_items)
+    attempts = [1] * len(selected_items)
+    used_keys = {_template_key(item) for item in selected_items}
+    pending: Dict[Future, Tuple[int, Dict[str, Any]]] = {
+        _generation_pool.submit(execute_template, item): (i, item)
+        for i, item in enumerate(selected_items)
+    }
+
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            i, item = pending.pop(future)
+            try:
+                slots[i] = (item, *future.result())
+            except Exception as e:
+                print(f"Failed to generate question from template {item['id']} ({item['source']}): {e}")
+                if attempts[i] >= MAX_SLOT_ATTEMPTS:
+                    continue
+                replacement = _replacement(item, candidates, used_keys)
+                used_keys.add(_template_key(replacement))
+                attempts[i] += 1
+                pending[_generation_pool.submit(execute_template, replacement)] = (i, replacement)
+
+    if pending:
+        print(f"WARNING: Paper deadline of {deadline_seconds}s passed with {len(pending)} slot(s) unfilled")
+        for future in pending:
+            future.cancel()
+
+    return [slot for slot in slots if slot is not None]
+
+
+def build_question_rows(
+    db: Session,
+    paper: List[Tuple[Dict[str, Any], Dict[str, Any], str, List[str]]]
+) -> List[Dict[str, Any]]:
+    """
+    AssessmentSessionQuestion mappings (without session_id) for a generated paper.
+    In compact storage mode this registers template versions in the current transaction.
+    """
+    compact = rendering.compact_storage_enabled()
+    rows = []
+    
+    for template_data, result, version_source, version_scripts in paper:
+        try:
+            question_text = result.get('question', '')
+            answer_value = str(result.get('answer', ''))
+            
+            # Type handling (ensure lowercase for DB consistency if needed)
+            q_type = result.get('type')
+            if q_type: q_type = q_type.lower()
+            
+            # Infer MCQ if options exist
+            if 'options' in result and result['options'] and isinstance(result['options'], list):
+                if not q_type or q_type == 'user_input':
+                    q_type = 'mcq'
+            
+            # Default if still nothing
+            if not q_type:
+                orig_type = template_data['type']
+                q_type = orig_type.lower() if orig_type else 'user_input'
+            
+            options = json.dumps(result.get('options', [])) if 'options' in result else None
+            
+            row = {
+                'template_id': template_data['id'],
+                'template_source': template_data['source'],
+                'question_html': question_text,
+                'question_type': q_type,
+                'options': options,
+                'correct_answer': answer_value,
+                'student_answer': None,
+                'is_correct': None,
+                'template_version': None,
+                'generation_seed': result['seed']
+            }
+            
+            if compact:
+                # Store only (version, seed); text is re-rendered when read
+                version_hash = rendering.register_template_version(
+                    db, version_source, template_data['id'], version_scripts
+                )
+                rendering.remember_rendered(version_hash, result['seed'], result)
+                row.update({
+                    'question_html': None,
+                    'options': None,
+                    'template_version': version_hash
+                })
+            
+            rows.append(row)
+            
+        except Exception as e:
+            print(f"Failed to generate question from template {template_data['id']} ({template_data['source']}): {e}")
+            continue
+    
+    return rows
+
+
+def score_session(session: AssessmentSession, graded: List[Dict[str, Any]]):
+    """Store the score summary of a graded session (see grading.grade_submission) on the session row"""
+    correct = sum(1 for q in graded if q['is_correct'] == 'True')
+    skipped = sum(1 for q in graded if q['is_correct'] != 'True' and not q['student_answer'])
+    total = len(graded)
+    
+    session.correct_count = correct
+    session.skipped_count = skipped
+    session.wrong_count = total - correct - skipped
+    session.total_questions = total
+    session.accuracy = round(correct / total * 100, 2) if total > 0 else 0
+    
+
+def backfill_session_scores(db: Session, uploader_id: Optional[Any] = None) -> int:
+    """
+    Score completed sessions that predate the score columns (one aggregate
+    query, one bulk update) and commit. Optionally limited to one uploader's
+    students. Run once via scripts/backfill_session_scores.py if sessions were
+    completed between the migration and the deploy; read endpoints never call it.
+    """
+    unscored = db.query(AssessmentSession.id).filter(
+        AssessmentSession.status == "COMPLETED",
+        AssessmentSession.total_questions.is_(None)
+    )
+    if uploader_id is not None:
+        unscored = unscored.join(
+            AssessmentStudent, AssessmentStudent.id == AssessmentSession.student_id
+        ).filter(AssessmentStudent.uploaded_by_user_id == uploader_id)
+    session_ids = [row[0] for row in unscored.all()]
+    if not session_ids:
+        return 0
+    
+    Question = AssessmentSessionQuestion
+    rows = db.query(
+        Question.session_id,
+        func.count(Question.id),
+        func.sum(case((Question.is_correct == 'True', 1), else_=0)),
+        func.sum(case((and_(
+            or_(Question.is_correct.is_(None), Question.is_correct != 'True'),
+            or_(Question.student_answer.is_(None), Question.student_answer == '')
+        ), 1), else_=0))
+    ).filter(Question.session_id.in_(session_ids)).group_by(Question.session_id).all()
+    counts = {row[0]: row[1:] for row in rows}
+    
+    mappings = []
+    for session_id in session_ids:
+        total, correct, skipped = counts.get(session_id, (0, 0, 0))
+        correct, skipped = correct or 0, skipped or 0
+        mappings.append({
+            'id': session_id,
+            'correct_count': correct,
+            'skipped_count': skipped,
+            'wrong_count': total - correct - skipped,
+            'total_questions': total,
+            'accuracy': round(correct / total * 100, 2) if total > 0 else 0
+        })
+    
+    db.bulk_update_mappings(AssessmentSession, mappings)
+    db.commit()
+    print(f"DEBUG: Backfilled scores for {len(mappings)} assessment sessions")
+    return len(mappings)
+
+
+@cached(key_prefix="assessment", key=lambda db, uploader_id: uploader_id)
+def dashboard_stats(db: Session, uploader_id: Any) -> Dict[str, Any]:
+    """
+    Uploader dashboard numbers from three aggregate queries, independent of
+    the number of students. Cached per uploader; see invalidate_dashboard_stats.
+    """
+    # Students per grade label (one row per distinct label, not per student)
+    grade_counts = db.query(AssessmentStudent.grade, func.count(AssessmentStudent.id)).filter(
+        AssessmentStudent.uploaded_by_user_id == uploader_id
+    ).group_by(AssessmentStudent.grade).all()
+    
+    total_students = sum(count for _, count in grade_counts)
+    
+    # Labels like "7", "Grade 7" and "7th" are the same grade
+    by_grade: Dict[str, int] = {}
+    for label, count in sorted(grade_counts, key=lambda row: str(row[0])):
+        grade = parse_grade(label)
+        if grade is not None:
+            by_grade[str(grade)] = by_grade.get(str(grade), 0) + count
+    top_grade = max(by_grade, key=by_grade.get) if by_grade else "N/A"
+    
+    # Sessions, and students with accuracy >= 80% in at least one completed session
+    high_scorer = case((and_(
+        AssessmentSession.status == "COMPLETED",
+        AssessmentSession.total_questions > 0,
+        AssessmentSession.accuracy >= 80
+    ), AssessmentSession.student_id), else_=None)
+    assessments_count, high_scorers_count = db.query(
+        func.count(AssessmentSession.id),
+        func.count(func.distinct(high_scorer))
+    ).join(
+        AssessmentStudent, AssessmentStudent.id == AssessmentSession.student_id
+    ).filter(AssessmentStudent.uploaded_by_user_id == uploader_id).one()
+    
+    return {
+        "total_students": total_students,
+        "assessments_count": assessments_count or 0,
+        "high_scorers_count": high_scorers_count or 0,
+        "top_grade": top_grade
+    }
+
+
+def invalidate_dashboard_stats(uploader_id: Any):
+    """Drop an uploader's cached dashboard numbers (after uploads, starts and submissions)"""
+    invalidate_cache(f"assessment:dashboard_stats:{uploader_id}")
+
+
+def shutdown():
+    _generation_pool.shutdown(wait=False, cancel_futures=True)
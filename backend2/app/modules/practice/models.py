@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -34,6 +34,10 @@ class QuestionAttempt(Base):
     is_correct = Column(Boolean, nullable=False)
     solution_text = Column(Text, nullable=True)
 
+    # Template version and seed the question was generated from (text is always stored)
+    template_version = Column(String, nullable=True)
+    generation_seed = Column(BigInteger, nullable=True)
+
     time_spent_seconds = Column(Integer, nullable=False) 
 
     attempted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
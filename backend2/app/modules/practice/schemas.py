@@ -15,6 +15,11 @@ class QuestionAttemptBase(BaseModel):
     is_correct: bool
     solution_text: Optional[str] = None
     
+    # Echoed from the practice endpoint; recorded for reference only, the text
+    # above is always stored since it cannot be checked against the client's seed
+    template_version: Optional[str] = None
+    generation_seed: Optional[int] = None
+    
     time_spent_seconds: int
 
 class QuestionAttemptCreate(QuestionAttemptBase):
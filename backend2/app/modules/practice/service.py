@@ -34,6 +34,8 @@ class PracticeService:
                 student_answer=attempt_data.student_answer,
                 is_correct=attempt_data.is_correct,
                 solution_text=attempt_data.solution_text,
+                template_version=attempt_data.template_version,
+                generation_seed=attempt_data.generation_seed,
                 time_spent_seconds=attempt_data.time_spent_seconds
             )
             db.add(new_attempt)
@@ -0,0 +1,174 @@
+"""
+Template output cardinality estimation.
+
+A template that can only produce a handful of distinct questions makes
+deduplicating generators retry until they give up. Drawing n samples from N
+equally likely outputs yields on average N * (1 - (1 - 1/N)^n) distinct ones,
+so the observed (samples, distinct) pair gives an estimate of N. Once more
+samples would almost surely not find anything new, the template is saturated
+and generators stop early ("pool exhausted") instead of spinning.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.modules.questions.models import TemplateCardinality
+from app.modules.questions.rendering import template_version_hash
+
+# Saturated once one more, as yet unseen, output would have been missed
+# by all samples with less than this probability
+MISS_PROBABILITY = 0.05
+
+
+def _expected_distinct(cardinality: float, samples: int) -> float:
+    if cardinality <= 1:
+        return 1.0
+    return cardinality * -math.expm1(samples * math.log1p(-1.0 / cardinality))
+
+
+def estimate_cardinality(samples: int, distinct: int) -> Optional[int]:
+    """
+    Estimate how many distinct outputs a template has.
+    Returns None while no collisions have been seen (only a lower bound is known).
+    """
+    if distinct <= 0 or distinct >= samples:
+        return None
+    if distinct == 1:
+        return 1
+
+    # _expected_distinct is increasing in N: bisect for N with E[distinct] == distinct
+    low, high = float(distinct), float(distinct) * 2
+    while _expected_distinct(high, samples) < distinct:
+        high *= 2
+        if high > 1e12:
+            return None
+    for _ in range(60):
+        mid = (low + high) / 2
+        if _expected_distinct(mid, samples) < distinct:
+            low = mid
+        else:
+            high = mid
+    return max(distinct, int(round(high)))
+
+
+def is_saturated(samples: int, distinct: int) -> bool:
+    """
+    True when (almost) every output the template can produce has been seen:
+    had there been distinct + 1 outputs, some sample would very likely have hit the extra one.
+    """
+    if distinct <= 0 or samples <= distinct:
+        return False
+    return (1.0 - 1.0 / (distinct + 1)) ** samples < MISS_PROBABILITY
+
+
+def expected_draws(cardinality: int, known: int, wanted: int) -> int:
+    """
+    Expected samples needed to see `wanted` new outputs when `known` of
+    `cardinality` have been seen already (coupon collector).
+    """
+    remaining = cardinality - known
+    wanted = min(wanted, remaining)
+    if wanted <= 0:
+        return 0
+    return math.ceil(sum(cardinality / (remaining - i) for i in range(wanted)))
+
+
+class CardinalityStore:
+    """
+    Estimates per (source, template_id), cached in memory and persisted in
+    template_cardinality. An estimate only applies to the scripts it was
+    measured on; editing a template makes it stale.
+    """
+
+    def __init__(self):
+        # (source, template_id) -> (version_hash, samples, distinct)
+        self._observations: Dict[Tuple[str, int], Tuple[str, int, int]] = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+
+    def _load(self, db: Optional[Session], source: str, template_id: int):
+        key = (source, template_id)
+        with self._lock:
+            if key in self._loaded or db is None:
+                return
+            self._loaded.add(key)
+
+        row = db.query(TemplateCardinality).filter(
+            TemplateCardinality.source == source,
+            TemplateCardinality.template_id == template_id
+        ).first()
+        if row:
+            self._merge(key, row.version_hash, row.samples_observed, row.distinct_observed)
+
+    def _merge(self, key, version_hash: str, samples: int, distinct: int) -> bool:
+        """Keep the observation with the most samples for the current version"""
+        with self._lock:
+            current = self._observations.get(key)
+            if current and current[0] == version_hash and current[1] >= samples:
+                return False
+            self._observations[key] = (version_hash, samples, distinct)
+            return True
+
+    def get(
+        self,
+        db: Optional[Session],
+        source: str,
+        template_id: int,
+        scripts: List[str]
+    ) -> Optional[Tuple[Optional[int], bool]]:
+        """(estimated_cardinality, saturated) for these scripts, or None if never observed"""
+        self._load(db, source, template_id)
+        version_hash = template_version_hash(source, scripts)
+        with self._lock:
+            observation = self._observations.get((source, template_id))
+        if not observation or observation[0] != version_hash:
+            return None
+        _, samples, distinct = observation
+        return estimate_cardinality(samples, distinct), is_saturated(samples, distinct)
+
+    def estimate(self, db: Optional[Session], source: str, template_id: int, scripts: List[str]) -> Optional[int]:
+        """Estimated number of distinct outputs, or None if unknown/unbounded so far"""
+        known = self.get(db, source, template_id, scripts)
+        return known[0] if known else None
+
+    def observe(self, source: str, template_id: int, scripts: List[str], samples: int, distinct: int):
+        """Record a generation run in memory only (request paths)"""
+        if samples <= 0:
+            return
+        self._merge((source, template_id), template_version_hash(source, scripts), samples, distinct)
+
+    def record(
+        self,
+        db: Session,
+        source: str,
+        template_id: int,
+        scripts: List[str],
+        samples: int,
+        distinct: int
+    ):
+        """Record a generation run and persist it (caller commits)"""
+        if samples <= 0:
+            return
+        self._load(db, source, template_id)
+        version_hash = template_version_hash(source, scripts)
+        if not self._merge((source, template_id), version_hash, samples, distinct):
+            return
+
+        row = db.query(TemplateCardinality).filter(
+            TemplateCardinality.source == source,
+            TemplateCardinality.template_id == template_id
+        ).first()
+        if not row:
+            row = TemplateCardinality(source=source, template_id=template_id)
+            db.add(row)
+        row.version_hash = version_hash
+        row.samples_observed = samples
+        row.distinct_observed = distinct
+        row.estimated_cardinality = estimate_cardinality(samples, distinct)
+        row.saturated = is_saturated(samples, distinct)
+
+
+cardinality_store = CardinalityStore()
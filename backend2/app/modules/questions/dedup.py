@@ -0,0 +1,92 @@
+"""
+Duplicate detection for bulk question generation.
+
+A generation job loads the template's stored hash signatures once and checks
+candidates in memory instead of querying per candidate. Up to
+GENERATION_DEDUP_SET_LIMIT stored questions are held as an exact set; larger
+templates get a Bloom filter (about 1.2 bytes per question at a 1% false
+positive rate), streamed in with a server-side cursor. A false positive only
+drops a genuinely new candidate, which the job replaces with another draw.
+
+Accepted rows are written with insert_generated_questions: chunked multi-row
+INSERTs with ON CONFLICT (template_id, hash_signature) DO NOTHING, so two
+jobs for the same template can never store the same question twice.
+"""
+
+import hashlib
+import math
+from typing import Any, Dict, List, Set, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.insert import insert_for
+from app.modules.questions.models import GeneratedQuestion
+
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex hash signatures"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = BLOOM_FALSE_POSITIVE_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        # Double hashing: two 64-bit halves of one digest give all k positions
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def load_known_hashes(db: Session, template_id: int, expected_new: int = 0) -> Union[Set[str], BloomFilter]:
+    """
+    Hash signatures already stored for a template, as a set or (for very large
+    templates) a Bloom filter sized to also take `expected_new` more.
+    """
+    stored = db.query(func.count(GeneratedQuestion.generated_question_id)).filter(
+        GeneratedQuestion.template_id == template_id
+    ).scalar() or 0
+
+    rows = db.query(GeneratedQuestion.hash_signature).filter(
+        GeneratedQuestion.template_id == template_id,
+        GeneratedQuestion.hash_signature.isnot(None)
+    ).yield_per(10000)
+
+    if stored <= settings.GENERATION_DEDUP_SET_LIMIT:
+        return {hash_signature for (hash_signature,) in rows}
+
+    known = BloomFilter(stored + expected_new)
+    for (hash_signature,) in rows:
+        known.add(hash_signature)
+    print(f"DEBUG: Template {template_id} has {stored} stored questions; using a {known.size // 8 // 1024} KiB Bloom filter")
+    return known
+
+
+def insert_generated_questions(db: Session, rows: List[Dict[str, Any]]) -> Set[str]:
+    """
+    Bulk insert GeneratedQuestion mappings in chunks of GENERATION_INSERT_CHUNK_SIZE,
+    skipping any whose (template_id, hash_signature) is already stored.
+    Returns the hash signatures actually inserted (caller commits).
+    """
+    table = GeneratedQuestion.__table__
+    inserted: Set[str] = set()
+    chunk_size = settings.GENERATION_INSERT_CHUNK_SIZE
+    for start in range(0, len(rows), chunk_size):
+        statement = insert_for(db, table).values(rows[start:start + chunk_size]).on_conflict_do_nothing(
+            index_elements=['template_id', 'hash_signature']
+        ).returning(table.c.hash_signature)
+        inserted.update(hash_signature for (hash_signature,) in db.execute(statement))
+    return inserted
@@ -6,9 +6,15 @@ Uses RestrictedPython to execute user-provided code in a sandboxed environment.
 from RestrictedPython import compile_restricted
 from RestrictedPython.Guards import safe_builtins, guarded_iter_unpack_sequence
 import random
+import re
 import math
+import hashlib
+import secrets
 import threading
-from typing import Dict, Any, Tuple
+import time
+import types
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 
 
 class CodeExecutionError(Exception):
@@ -21,19 +27,146 @@ class CodeTimeoutError(CodeExecutionError):
     pass
 
 
+def new_seed() -> int:
+    """Fresh random seed for an unseeded execution"""
+    return secrets.randbits(63)
+
+
+def normalize_seed(value: Any) -> int:
+    """
+    Turn a user supplied seed (e.g. QuestionGenerationJob.generation_seed) into an int
+    in [0, 2**63), so it fits the BigInteger seed columns. Numbers in that range are
+    used as-is, other numbers are reduced into it, anything else is hashed.
+    """
+    if isinstance(value, int):
+        return value % (1 << 63)
+    text = str(value).strip()
+    if re.fullmatch(r'-?[0-9]+', text):
+        return int(text) % (1 << 63)
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big') >> 1
+
+
+def derive_seed(base_seed: int, index: int) -> int:
+    """
+    Seed for the index-th sample of a seeded run.
+    Hashing (rather than base + index) keeps neighbouring seeds and shards uncorrelated.
+    """
+    digest = hashlib.sha256(f"{base_seed}:{index}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') >> 1
+
+
+def _make_random_module(rng: random.Random) -> types.ModuleType:
+    """
+    Build a stand-in for the `random` module whose functions are bound to `rng`.
+    Templates keep writing `random.randint(...)` but every execution has its own RNG.
+    """
+    module = types.ModuleType('random')
+    for name in dir(random):
+        if name.startswith('_'):
+            continue
+        bound = getattr(rng, name, None)
+        module.__dict__[name] = bound if callable(bound) else getattr(random, name)
+    return module
+
+
+class ExecutionTrace:
+    """
+    Compile/run timings and failures of one executor call.
+    Pass one to an execute_* method and the executor fills it in; plain
+    attributes so it survives the trip back from a sandbox worker.
+    """
+    
+    def __init__(self):
+        self.compile_seconds = 0.0
+        self.run_seconds = []      # One entry per executed sample
+        self.errors = []           # Exception type names of failed samples
+    
+    def merge(self, other: "ExecutionTrace"):
+        self.compile_seconds += other.compile_seconds
+        self.run_seconds.extend(other.run_seconds)
+        self.errors.extend(other.errors)
+
+
+class CompiledCodeCache:
+    """
+    Size-bounded LRU cache of compiled RestrictedPython code objects.
+    
+    Entries are keyed by a SHA-256 of the source, so an edited template simply
+    misses and the stale entry ages out (or is dropped via invalidate()).
+    """
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key_for(code: str) -> str:
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+    
+    def get_or_compile(self, code: str):
+        """Return the cached code object for `code`, compiling it on a miss"""
+        key = self.key_for(code)
+        with self._lock:
+            byte_code = self._entries.get(key)
+            if byte_code is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return byte_code
+            self.misses += 1
+        
+        # Compile outside the lock; failures raise and are never cached
+        byte_code = compile_restricted(code, '<template>', 'exec')
+        
+        with self._lock:
+            self._entries[key] = byte_code
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return byte_code
+    
+    def invalidate(self, *codes: str):
+        """Drop cached entries for the given source strings"""
+        with self._lock:
+            for code in codes:
+                if code:
+                    self._entries.pop(self.key_for(code), None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "current_size": len(self._entries),
+                "max_size": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
 class QuestionExecutor:
     """
     Safely execute question template code.
     
     Security measures:
     - RestrictedPython compilation
-    - 5-second execution timeout
+    - 5-second execution timeout (10 seconds overall for batch calls)
     - Only random and math modules allowed
+    - Each execution gets its own seeded random.Random (reported back as 'seed')
     - No file system or network access
     - Comprehensive guards for safe operations
+    - Compiled code objects are cached by source hash (shared by all entry points)
     """
     
     TIMEOUT_SECONDS = 5
+    BATCH_TIMEOUT_SECONDS = 10
+    COMPILE_CACHE_SIZE = 2048
     ALLOWED_MODULES = {
         'random': random,
         'math': math
@@ -76,6 +209,21 @@ class QuestionExecutor:
         'None': None,
     }
     
+    def __init__(self):
+        self.compile_cache = CompiledCodeCache(self.COMPILE_CACHE_SIZE)
+    
+    def _compile(self, code: str):
+        """Compile restricted code, reusing a cached code object when possible"""
+        return self.compile_cache.get_or_compile(code)
+    
+    def invalidate_compiled(self, *codes: str):
+        """Forget compiled code for template sources that were edited or deleted"""
+        self.compile_cache.invalidate(*codes)
+    
+    def get_compile_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the compiled-code cache"""
+        return self.compile_cache.stats()
+    
     def _run_with_timeout(self, func, timeout_seconds):
         """Run a function with timeout using threading"""
         result = {'value': None, 'error': None}
@@ -100,6 +248,36 @@ class QuestionExecutor:
         
         return result['value']
     
+    def _compile_checked(self, code: str, trace: Optional[ExecutionTrace] = None):
+        """Validate and compile a single script, recording compile time on the trace"""
+        start = time.perf_counter()
+        try:
+            is_valid, error = self.validate_code_syntax(code)
+            if not is_valid:
+                raise CodeExecutionError(error)
+            try:
+                return self._compile(code)
+            except Exception as e:
+                raise CodeExecutionError(f"Failed to compile code: {str(e)}")
+        finally:
+            if trace is not None:
+                trace.compile_seconds += time.perf_counter() - start
+    
+    def _timed(self, func, trace: Optional[ExecutionTrace] = None):
+        """Run one sample, recording its run time and failure type on the trace"""
+        if trace is None:
+            return func()
+        start = time.perf_counter()
+        try:
+            return func()
+        except Exception as e:
+            # Record the template's own exception type, not our wrapper
+            cause = e.__cause__ if isinstance(e, CodeExecutionError) and e.__cause__ else e
+            trace.errors.append(type(cause).__name__)
+            raise
+        finally:
+            trace.run_seconds.append(time.perf_counter() - start)
+    
     def validate_code_syntax(self, code: str) -> Tuple[bool, str]:
         """
         Validate Python code syntax without executing.
@@ -108,20 +286,26 @@ class QuestionExecutor:
             (is_valid, error_message)
         """
         try:
-            compile_restricted(code, '<string>', 'exec')
+            self._compile(code)
             return True, ""
         except SyntaxError as e:
             return False, f"Syntax error: {str(e)}"
         except Exception as e:
             return False, f"Compilation error: {str(e)}"
     
-    def _create_safe_globals(self):
+    def _create_safe_globals(self, seed: int):
         """Create a safe global environment with all necessary guards"""
         
+        # Per-execution RNG, so concurrent executions never share random state
+        modules = {
+            **self.ALLOWED_MODULES,
+            'random': _make_random_module(random.Random(seed))
+        }
+        
         def safe_import(name, *args, **kwargs):
             """Only allow importing specific modules"""
-            if name in self.ALLOWED_MODULES:
-                return self.ALLOWED_MODULES[name]
+            if name in modules:
+                return modules[name]
             raise ImportError(f"Import of '{name}' is not allowed")
         
         def safe_getitem(obj, index):
@@ -171,13 +355,18 @@ class QuestionExecutor:
                 '_write_': lambda x: x,
                 '_apply_': lambda f, *args, **kwargs: f(*args, **kwargs),
             },
-            **self.ALLOWED_MODULES
+            **modules
         }
         
         return safe_globals
     
     
-    def execute_sequential(self, scripts: list[str]) -> Dict[str, Any]:
+    def execute_sequential(
+        self,
+        scripts: list[str],
+        seed: Optional[int] = None,
+        trace: Optional[ExecutionTrace] = None
+    ) -> Dict[str, Any]:
         """
         Execute a sequence of scripts in the same safe global environment.
         Useful for v2 generation where question, answer, and solution are separate scripts 
@@ -185,59 +374,20 @@ class QuestionExecutor:
         
         Args:
             scripts: List of Python code strings to execute in order
+            seed: Optional seed for the script's `random` module (a fresh one is drawn if omitted)
+            trace: Optional ExecutionTrace to record compile/run time on
             
         Returns:
-            Dict with 'question', 'answer', 'solution' and other metadata
+            Dict with 'question', 'answer', 'solution', 'seed' and other metadata
         """
-        # Validate all scripts first
-        for i, code in enumerate(scripts):
-            if not code.strip():
-                continue
-            is_valid, error = self.validate_code_syntax(code)
-            if not is_valid:
-                raise CodeExecutionError(f"Syntax error in script {i+1}: {error}")
+        byte_codes = self._compile_scripts(scripts, trace)
+        seed = new_seed() if seed is None else seed
         
         # Prepare safe execution environment
-        safe_globals = self._create_safe_globals()
-        
-        # Add a specific function to allow scripts to explicitly export data if they want
-        # though we will mostly rely on checking globals
-        output_data = {}
+        safe_globals = self._create_safe_globals(seed)
         
         def execute_all():
-            for code in scripts:
-                if not code.strip():
-                    continue
-                    
-                try:
-                    byte_code = compile_restricted(code, '<script>', 'exec')
-                    exec(byte_code, safe_globals)
-                except Exception as e:
-                    raise CodeExecutionError(f"Execution error: {str(e)}")
-            
-            # Extract results from globals
-            # We look for specific variable names that the scripts should set
-            # Or specialized functions provided by the v2 format
-            
-            # Standard fields request by v2
-            result = {
-                'question': safe_globals.get('question'),
-                'answer': safe_globals.get('answer'),
-                'solution': safe_globals.get('solution'),
-                'options': safe_globals.get('options'),
-                'type': safe_globals.get('type'),
-                'topic': safe_globals.get('topic'),
-                'variables': safe_globals.get('variables', {})
-            }
-            
-            # If standard variables aren't set, checks if they return JSX/String from last expression? 
-            # No, `exec` doesn't return value. Current requirement is to setting variables.
-            # We can support an explicit `generate()` like v1, but sequential scripts usually imply top-level execution.
-            
-            # Helper: If question is missing, check if 'question_text' or similar exists, or maybe they just set 'output'
-            
-            # Clean up None values
-            return {k: v for k, v in result.items() if v is not None}
+            return {**self._timed(lambda: self._run_sequential(byte_codes, safe_globals), trace), 'seed': seed}
 
         try:
             return self._run_with_timeout(execute_all, self.TIMEOUT_SECONDS)
@@ -248,62 +398,202 @@ class QuestionExecutor:
         except Exception as e:
             raise CodeExecutionError(f"Sequential execution error: {str(e)}")
 
-    def execute_generator(self, code: str) -> Dict[str, Any]:
+    def _compile_scripts(self, scripts: list[str], trace: Optional[ExecutionTrace] = None) -> list:
+        """Validate and compile v2 scripts, skipping empty ones"""
+        start = time.perf_counter()
+        byte_codes = []
+        try:
+            for i, code in enumerate(scripts):
+                if not code.strip():
+                    continue
+                is_valid, error = self.validate_code_syntax(code)
+                if not is_valid:
+                    raise CodeExecutionError(f"Syntax error in script {i+1}: {error}")
+                byte_codes.append(self._compile(code))
+        finally:
+            if trace is not None:
+                trace.compile_seconds += time.perf_counter() - start
+        return byte_codes
+
+    def _run_sequential(self, byte_codes: list, safe_globals: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute compiled v2 scripts in one shared namespace and collect the standard fields"""
+        for byte_code in byte_codes:
+            try:
+                exec(byte_code, safe_globals)
+            except Exception as e:
+                raise CodeExecutionError(f"Execution error: {str(e)}") from e
+        
+        # Extract results from globals
+        # We look for specific variable names that the scripts should set
+        
+        # Standard fields request by v2
+        result = {
+            'question': safe_globals.get('question'),
+            'answer': safe_globals.get('answer'),
+            'solution': safe_globals.get('solution'),
+            'options': safe_globals.get('options'),
+            'type': safe_globals.get('type'),
+            'topic': safe_globals.get('topic'),
+            'variables': safe_globals.get('variables', {})
+        }
+        
+        # Clean up None values
+        return {k: v for k, v in result.items() if v is not None}
+
+    def _run_generator(self, byte_code, safe_globals: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute compiled v1 generator code and return its validated output"""
+        exec(byte_code, safe_globals)
+        
+        # Check for explicit generate() function
+        if 'generate' in safe_globals and callable(safe_globals['generate']):
+            result = safe_globals['generate']()
+        else:
+            # Fallback: check for implicit result in global variables
+            # This supports simple top-level scripts that just set variables
+            if 'question' in safe_globals and 'answer' in safe_globals:
+                result = {
+                    'question': safe_globals['question'],
+                    'answer': safe_globals['answer'],
+                    'variables': safe_globals.get('variables', {}),
+                    'options': safe_globals.get('options'),
+                    'type': safe_globals.get('type'),
+                    'topic': safe_globals.get('topic')
+                }
+                # Clean up None values
+                result = {k: v for k, v in result.items() if v is not None}
+            else:
+                raise CodeExecutionError("Code must define a 'generate()' function OR set 'question' and 'answer' variables")
+        
+        # Validate output structure
+        self._validate_generator_output(result)
+        
+        return result
+
+    def _run_batch(
+        self,
+        run_sample,
+        n: int,
+        seed: Optional[int],
+        start_index: int,
+        trace: Optional[ExecutionTrace] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run `run_sample` n times, each in a fresh namespace, under one overall time budget.
+        Samples that cannot start before the budget runs out are reported as errors.
+        """
+        deadline = time.monotonic() + self.BATCH_TIMEOUT_SECONDS
+        entries = []
+        
+        for index in range(start_index, start_index + n):
+            sample_seed = new_seed() if seed is None else derive_seed(seed, index)
+            
+            if time.monotonic() >= deadline:
+                if trace is not None:
+                    trace.errors.append(CodeTimeoutError.__name__)
+                entries.append({
+                    'result': None,
+                    'seed': sample_seed,
+                    'error': f"Batch exceeded {self.BATCH_TIMEOUT_SECONDS} second budget",
+                    'error_type': CodeTimeoutError.__name__
+                })
+                continue
+            
+            try:
+                safe_globals = self._create_safe_globals(sample_seed)
+                result = self._timed(lambda: run_sample(safe_globals), trace)
+                entries.append({'result': {**result, 'seed': sample_seed}, 'seed': sample_seed, 'error': None})
+            except Exception as e:
+                entries.append({'result': None, 'seed': sample_seed, 'error': str(e), 'error_type': type(e).__name__})
+        
+        return entries
+
+    def execute_sequential_batch(
+        self,
+        scripts: list[str],
+        n: int,
+        seed: Optional[int] = None,
+        start_index: int = 0,
+        trace: Optional[ExecutionTrace] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate n independent samples from v2 scripts in a single call.
+        Scripts are compiled once; each sample runs in its own namespace.
+        
+        Args:
+            scripts: List of Python code strings to execute in order
+            n: Number of samples to generate
+            seed: Optional base seed; sample i is seeded with derive_seed(seed, start_index + i)
+            start_index: Index of the first sample (lets callers continue a seeded run)
+            trace: Optional ExecutionTrace to record compile/run time on
+            
+        Returns:
+            List of n dicts with 'result' (or None), 'seed' and 'error' (or None)
+            
+        Raises:
+            CodeExecutionError: If a script does not compile
+            CodeTimeoutError: If a single sample hangs past the batch budget
+        """
+        byte_codes = self._compile_scripts(scripts, trace)
+        
+        def execute_all():
+            return self._run_batch(
+                lambda safe_globals: self._run_sequential(byte_codes, safe_globals), n, seed, start_index, trace
+            )
+        
+        return self._run_with_timeout(execute_all, self.BATCH_TIMEOUT_SECONDS)
+
+    def execute_generator_batch(
+        self,
+        code: str,
+        n: int,
+        seed: Optional[int] = None,
+        start_index: int = 0,
+        trace: Optional[ExecutionTrace] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate n independent samples from v1 generator code in a single call.
+        Same contract as execute_sequential_batch().
+        """
+        byte_code = self._compile_checked(code, trace)
+        
+        def execute_all():
+            return self._run_batch(
+                lambda safe_globals: self._run_generator(byte_code, safe_globals), n, seed, start_index, trace
+            )
+        
+        return self._run_with_timeout(execute_all, self.BATCH_TIMEOUT_SECONDS)
+
+    def execute_generator(
+        self,
+        code: str,
+        seed: Optional[int] = None,
+        trace: Optional[ExecutionTrace] = None
+    ) -> Dict[str, Any]:
         """
         Execute dynamic_question code to generate a question.
         
         Args:
             code: Python code defining a generate() function
+            seed: Optional seed for the code's `random` module (a fresh one is drawn if omitted)
+            trace: Optional ExecutionTrace to record compile/run time on
             
         Returns:
-            Dict with 'question', 'answer', and optionally 'variables', 'options', 'type'
+            Dict with 'question', 'answer', 'seed', and optionally 'variables', 'options', 'type'
             
         Raises:
             CodeExecutionError: If execution fails
             CodeTimeoutError: If execution times out
         """
-        # Validate syntax first
-        is_valid, error = self.validate_code_syntax(code)
-        if not is_valid:
-            raise CodeExecutionError(error)
-        
-        # Compile with restrictions
-        try:
-            byte_code = compile_restricted(code, '<generator>', 'exec')
-        except Exception as e:
-            raise CodeExecutionError(f"Failed to compile code: {str(e)}")
+        # Validate syntax and compile with restrictions
+        byte_code = self._compile_checked(code, trace)
         
         # Prepare safe execution environment
-        safe_globals = self._create_safe_globals()
+        seed = new_seed() if seed is None else seed
+        safe_globals = self._create_safe_globals(seed)
         
         # Execute with timeout
         def execute():
-            exec(byte_code, safe_globals)
-            
-            # Check for explicit generate() function
-            if 'generate' in safe_globals and callable(safe_globals['generate']):
-                result = safe_globals['generate']()
-            else:
-                # Fallback: check for implicit result in global variables
-                # This supports simple top-level scripts that just set variables
-                if 'question' in safe_globals and 'answer' in safe_globals:
-                    result = {
-                        'question': safe_globals['question'],
-                        'answer': safe_globals['answer'],
-                        'variables': safe_globals.get('variables', {}),
-                        'options': safe_globals.get('options'),
-                        'type': safe_globals.get('type'),
-                        'topic': safe_globals.get('topic')
-                    }
-                    # Clean up None values
-                    result = {k: v for k, v in result.items() if v is not None}
-                else:
-                    raise CodeExecutionError("Code must define a 'generate()' function OR set 'question' and 'answer' variables")
-            
-            # Validate output structure
-            self._validate_generator_output(result)
-            
-            return result
+            return {**self._timed(lambda: self._run_generator(byte_code, safe_globals), trace), 'seed': seed}
         
         try:
             return self._run_with_timeout(execute, self.TIMEOUT_SECONDS)
@@ -314,7 +604,13 @@ class QuestionExecutor:
         except Exception as e:
             raise CodeExecutionError(f"Execution error: {str(e)}")
     
-    def execute_validator(self, code: str, user_answer: Any, correct_answer: Any) -> bool:
+    def execute_validator(
+        self,
+        code: str,
+        user_answer: Any,
+        correct_answer: Any,
+        trace: Optional[ExecutionTrace] = None
+    ) -> bool:
         """
         Execute logical_answer code to validate a student's answer.
         
@@ -322,6 +618,7 @@ class QuestionExecutor:
             code: Python code defining a validate() function
             user_answer: Student's submitted answer
             correct_answer: Correct answer from question generation
+            trace: Optional ExecutionTrace to record compile/run time on
             
         Returns:
             True if answer is correct, False otherwise
@@ -330,22 +627,14 @@ class QuestionExecutor:
             CodeExecutionError: If execution fails
             CodeTimeoutError: If execution times out
         """
-        # Validate syntax first
-        is_valid, error = self.validate_code_syntax(code)
-        if not is_valid:
-            raise CodeExecutionError(error)
-        
-        # Compile with restrictions
-        try:
-            byte_code = compile_restricted(code, '<validator>', 'exec')
-        except Exception as e:
-            raise CodeExecutionError(f"Failed to compile code: {str(e)}")
+        # Validate syntax and compile with restrictions
+        byte_code = self._compile_checked(code, trace)
         
         # Prepare safe execution environment
-        safe_globals = self._create_safe_globals()
+        safe_globals = self._create_safe_globals(new_seed())
         
         # Execute with timeout
-        def execute():
+        def validate():
             exec(byte_code, safe_globals)
             
             # Verify validate function exists
@@ -356,6 +645,9 @@ class QuestionExecutor:
             result = safe_globals['validate'](user_answer, correct_answer)
             return bool(result)
         
+        def execute():
+            return self._timed(validate, trace)
+        
         try:
             return self._run_with_timeout(execute, self.TIMEOUT_SECONDS)
         except CodeTimeoutError:
@@ -365,6 +657,54 @@ class QuestionExecutor:
         except Exception as e:
             raise CodeExecutionError(f"Validation error: {str(e)}")
     
+    def execute_validator_batch(
+        self,
+        items: List[Tuple[str, Any, Any]],
+        trace: Optional[ExecutionTrace] = None
+    ) -> List[Optional[bool]]:
+        """
+        Run many logical_answer validations in a single call (e.g. a whole submission).
+        Each distinct validator is compiled and defined once and then called for
+        every answer it checks; all calls share one overall time budget.
+        
+        Args:
+            items: (validator code, user_answer, correct_answer) per answer
+            trace: Optional ExecutionTrace to record compile/run time on
+            
+        Returns:
+            True/False per item, or None where the validator failed or the budget ran out
+        """
+        def validate_all():
+            deadline = time.monotonic() + self.BATCH_TIMEOUT_SECONDS
+            validators = {}
+            results = []
+            
+            for code, user_answer, correct_answer in items:
+                if time.monotonic() >= deadline:
+                    if trace is not None:
+                        trace.errors.append(CodeTimeoutError.__name__)
+                    results.append(None)
+                    continue
+                
+                try:
+                    if code not in validators:
+                        # A validator that fails to load is not retried for later answers
+                        validators[code] = None
+                        safe_globals = self._create_safe_globals(new_seed())
+                        exec(self._compile_checked(code, trace), safe_globals)
+                        validators[code] = safe_globals.get('validate')
+                    validate = validators[code]
+                    if validate is None:
+                        results.append(None)
+                        continue
+                    results.append(bool(self._timed(lambda: validate(user_answer, correct_answer), trace)))
+                except Exception:
+                    results.append(None)
+            
+            return results
+        
+        return self._run_with_timeout(validate_all, self.BATCH_TIMEOUT_SECONDS)
+    
     def _validate_generator_output(self, output: Any):
         """Validate that generator output has required structure"""
         if not isinstance(output, dict):
@@ -0,0 +1,287 @@
+"""
+Per-template executor metrics.
+
+Call sites wrap executor calls in `executor_metrics.track(source, template_id)`;
+the executor fills in an ExecutionTrace (compile vs. run time, failed samples)
+and the registry aggregates it per template in-process. A background thread
+flushes the aggregated deltas to template_execution_stats periodically.
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.questions.executor import ExecutionTrace, CodeTimeoutError
+from app.modules.questions.models import TemplateExecutionStat
+
+# Upper bounds (ms) of the run-time histogram buckets; the last bucket is open-ended
+RUN_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+SORT_FIELDS = {"run_ms", "p95_ms", "failure_rate", "timeouts", "duplicate_rate", "executions"}
+
+
+class _TemplateCounters:
+    """Counters for one template over some window"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.compile_ms = 0.0
+        self.run_ms = 0.0
+        self.run_ms_max = 0.0
+        self.histogram = [0] * (len(RUN_BUCKETS_MS) + 1)
+        self.exceptions: Dict[str, int] = {}
+        self.samples_checked = 0
+        self.duplicates = 0
+
+    def _add_exception(self, name: str, count: int = 1):
+        self.exceptions[name] = self.exceptions.get(name, 0) + count
+        if name == CodeTimeoutError.__name__:
+            self.timeouts += count
+
+    def add_trace(self, trace: ExecutionTrace, error: Optional[str] = None):
+        self.calls += 1
+        self.executions += len(trace.run_seconds)
+        self.compile_ms += trace.compile_seconds * 1000
+
+        for seconds in trace.run_seconds:
+            ms = seconds * 1000
+            self.run_ms += ms
+            self.run_ms_max = max(self.run_ms_max, ms)
+            bucket = next((i for i, bound in enumerate(RUN_BUCKETS_MS) if ms <= bound), len(RUN_BUCKETS_MS))
+            self.histogram[bucket] += 1
+
+        for name in trace.errors:
+            self.failures += 1
+            self._add_exception(name)
+
+        # A call that raised without a recorded sample failure (compile error,
+        # hard timeout, sandbox unavailable) counts as one failure of its own
+        if error and not trace.errors:
+            self.failures += 1
+            self._add_exception(error)
+
+    def merge_row(self, row: TemplateExecutionStat):
+        self.calls += row.calls or 0
+        self.executions += row.executions or 0
+        self.failures += row.failures or 0
+        self.timeouts += row.timeouts or 0
+        self.compile_ms += row.compile_ms or 0.0
+        self.run_ms += row.run_ms or 0.0
+        self.run_ms_max = max(self.run_ms_max, row.run_ms_max or 0.0)
+        for i, count in enumerate((row.run_histogram or {}).get("counts", [])):
+            if i < len(self.histogram):
+                self.histogram[i] += count
+        for name, count in (row.exceptions or {}).items():
+            self.exceptions[name] = self.exceptions.get(name, 0) + count
+        self.samples_checked += row.samples_checked or 0
+        self.duplicates += row.duplicates or 0
+
+    def merge(self, other: "_TemplateCounters"):
+        self.calls += other.calls
+        self.executions += other.executions
+        self.failures += other.failures
+        self.timeouts += other.timeouts
+        self.compile_ms += other.compile_ms
+        self.run_ms += other.run_ms
+        self.run_ms_max = max(self.run_ms_max, other.run_ms_max)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        for name, count in other.exceptions.items():
+            self.exceptions[name] = self.exceptions.get(name, 0) + count
+        self.samples_checked += other.samples_checked
+        self.duplicates += other.duplicates
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Approximate run-time percentile (bucket upper bound, or max for the open bucket)"""
+        total = sum(self.histogram)
+        if total == 0:
+            return None
+        target = q * total
+        running = 0
+        for i, count in enumerate(self.histogram):
+            running += count
+            if running >= target:
+                return float(RUN_BUCKETS_MS[i]) if i < len(RUN_BUCKETS_MS) else round(self.run_ms_max, 2)
+        return round(self.run_ms_max, 2)
+
+    def summary(self) -> Dict[str, Any]:
+        attempts = max(self.executions, self.calls)
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "failure_rate": round(self.failures / attempts, 4) if attempts else 0.0,
+            "avg_compile_ms": round(self.compile_ms / self.calls, 3) if self.calls else 0.0,
+            "avg_run_ms": round(self.run_ms / self.executions, 3) if self.executions else 0.0,
+            "run_ms": round(self.run_ms, 2),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_run_ms": round(self.run_ms_max, 2),
+            "exceptions": dict(self.exceptions),
+            "samples_checked": self.samples_checked,
+            "duplicates": self.duplicates,
+            "duplicate_rate": round(self.duplicates / self.samples_checked, 4) if self.samples_checked else 0.0
+        }
+
+
+class ExecutorMetrics:
+    """
+    In-process registry of per-template executor metrics.
+
+    Keys are (source, template_id): source is "v1"/"v2", or "adhoc" for
+    unsaved authoring previews (template_id None).
+    """
+
+    def __init__(self, enabled: bool, flush_interval: int):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[str, Optional[int]], _TemplateCounters] = {}
+        self._window_start = datetime.utcnow()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _counters(self, source: str, template_id: Optional[int]) -> _TemplateCounters:
+        key = (source, template_id)
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = _TemplateCounters()
+        return counters
+
+    @contextmanager
+    def track(self, source: str, template_id: Optional[int] = None):
+        """
+        Record one executor call. Yields the ExecutionTrace to pass as `trace=`
+        (None when metrics are disabled, which turns tracing off).
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        trace = ExecutionTrace()
+        error = None
+        try:
+            yield trace
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            with self._lock:
+                self._counters(source, template_id).add_trace(trace, error)
+
+    def record_duplicates(self, source: str, template_id: Optional[int], samples_checked: int, duplicates: int):
+        """Record how many generated samples were rejected as duplicates"""
+        if not self.enabled or samples_checked == 0:
+            return
+        with self._lock:
+            counters = self._counters(source, template_id)
+            counters.samples_checked += samples_checked
+            counters.duplicates += duplicates
+
+    def flush(self):
+        """Write the current window to template_execution_stats and start a new one"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            window_start, self._window_start = self._window_start, datetime.utcnow()
+            window_end = self._window_start
+        if not pending:
+            return
+
+        db = SessionLocal()
+        try:
+            db.add_all([
+                TemplateExecutionStat(
+                    source=source,
+                    template_id=template_id,
+                    window_start=window_start,
+                    window_end=window_end,
+                    calls=c.calls,
+                    executions=c.executions,
+                    failures=c.failures,
+                    timeouts=c.timeouts,
+                    compile_ms=c.compile_ms,
+                    run_ms=c.run_ms,
+                    run_ms_max=c.run_ms_max,
+                    run_histogram={"bounds_ms": RUN_BUCKETS_MS, "counts": c.histogram},
+                    exceptions=c.exceptions,
+                    samples_checked=c.samples_checked,
+                    duplicates=c.duplicates
+                )
+                for (source, template_id), c in pending.items()
+            ])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"WARNING: Could not flush executor metrics: {e}")
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="executor-metrics-flusher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.enabled:
+            self.flush()
+
+    def report(
+        self,
+        db: Session,
+        hours: int = 24,
+        sort_by: str = "run_ms",
+        limit: int = 50,
+        source: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Per-template summaries over the last `hours`: flushed rows plus the
+        current, not yet flushed window. Sorted descending by `sort_by`.
+        """
+        since = datetime.utcnow() - timedelta(hours=hours)
+        query = db.query(TemplateExecutionStat).filter(TemplateExecutionStat.window_end >= since)
+        if source:
+            query = query.filter(TemplateExecutionStat.source == source)
+
+        totals: Dict[Tuple[str, Optional[int]], _TemplateCounters] = {}
+        for row in query.all():
+            key = (row.source, row.template_id)
+            totals.setdefault(key, _TemplateCounters()).merge_row(row)
+
+        with self._lock:
+            for key, counters in self._pending.items():
+                if source and key[0] != source:
+                    continue
+                totals.setdefault(key, _TemplateCounters()).merge(counters)
+
+        report = [
+            {"source": key[0], "template_id": key[1], **counters.summary()}
+            for key, counters in totals.items()
+        ]
+        sort_by = sort_by if sort_by in SORT_FIELDS else "run_ms"
+        report.sort(key=lambda item: item[sort_by] or 0, reverse=True)
+        return report[:limit]
+
+
+executor_metrics = ExecutorMetrics(
+    enabled=settings.EXECUTOR_METRICS_ENABLED,
+    flush_interval=settings.EXECUTOR_METRICS_FLUSH_INTERVAL
+)
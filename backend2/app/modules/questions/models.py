@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, func, Text, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, Float, DateTime, ForeignKey, Index, func, Text, JSON
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -62,14 +62,32 @@ class QuestionGenerationJob(Base):
     generation_params = Column(JSON, nullable=True)               # Additional params (difficulty override, etc.)
     
     # Status Tracking
-    status = Column(String, default="pending", index=True)        # "pending", "processing", "completed", "failed"
+    status = Column(String, default="pending", index=True)        # "pending", "processing", "completed", "failed", "cancelled"
+    status_detail = Column(Text, nullable=True)                   # e.g. "pool exhausted: ..." when completed short
     created_by_user_id = Column(UUID(as_uuid=True), nullable=True, index=True)  # UUID to match User model
     created_at = Column(DateTime, server_default=func.now())
     completed_at = Column(DateTime, nullable=True)
     
+    # Worker bookkeeping (see app/worker.py)
+    attempts = Column(Integer, default=0)                         # Times a worker has claimed the job
+    worker_id = Column(String, nullable=True)                     # "host:pid" of the worker running it
+    heartbeat_at = Column(DateTime, nullable=True)                # Refreshed while running; stale = worker died
+    run_after = Column(DateTime, nullable=True)                   # Retry backoff: not claimed before this
+    
+    # Checkpoint: generated_count questions are committed; sampling resumes at this seed index
+    next_sample_index = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)             # Stop at the next checkpoint
+    
     # Relationships
     template = relationship("QuestionTemplate", back_populates="generation_jobs")
     generated_questions = relationship("GeneratedQuestion", back_populates="job")
+    
+    @property
+    def progress(self) -> float:
+        """Percent of the requested questions generated so far"""
+        if not self.requested_count:
+            return 0.0
+        return round(min(self.generated_count or 0, self.requested_count) / self.requested_count * 100, 1)
 
 
 class GeneratedQuestion(Base):
@@ -78,15 +96,23 @@ class GeneratedQuestion(Base):
     Each record is a unique question instance.
     """
     __tablename__ = "generated_questions"
+    __table_args__ = (
+        # A template never stores the same question twice (bulk inserts skip conflicts)
+        Index("uq_generated_questions_template_hash", "template_id", "hash_signature", unique=True),
+    )
     
     generated_question_id = Column(Integer, primary_key=True, autoincrement=True)
     job_id = Column(Integer, ForeignKey("question_generation_jobs.job_id"), nullable=False, index=True)
     template_id = Column(Integer, ForeignKey("question_templates.template_id"), nullable=False, index=True)
     
     # Question Content
-    question_html = Column(Text, nullable=False)                  # Rendered HTML question
+    question_html = Column(Text, nullable=True)                   # Rendered HTML question (NULL in compact storage)
     answer_value = Column(String, nullable=False)                 # Correct answer
     variables_used = Column(JSON, nullable=True)                  # Variables used in generation (for debugging)
+    
+    # Compact storage: re-render from (template version, seed) instead of storing text
+    template_version = Column(String, nullable=True)              # TemplateVersion.version_hash
+    generation_seed = Column(BigInteger, nullable=True)           # Seed passed to the executor
 
     # Metadata
     difficulty_snapshot = Column(String, nullable=True)           # Difficulty at generation time
@@ -98,6 +124,80 @@ class GeneratedQuestion(Base):
     template = relationship("QuestionTemplate", back_populates="generated_questions")
 
 
+class TemplateVersion(Base):
+    """
+    Immutable snapshot of the scripts a question was generated from.
+    Compact question rows point here by hash so they can be re-rendered
+    even after the template itself is edited.
+    """
+    __tablename__ = "question_template_versions"
+    
+    version_hash = Column(String, primary_key=True)               # sha256 of source + scripts
+    source = Column(String, nullable=False)                       # "v1" (QuestionTemplate) or "v2" (QuestionGeneration)
+    template_id = Column(Integer, nullable=False, index=True)
+    scripts = Column(JSON, nullable=False)                        # Scripts in execution order
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class PracticePoolInstance(Base):
+    """
+    Spilled practice pool instances.
+    Ready-to-serve executor outputs persisted across restarts (PRACTICE_POOL_SPILL).
+    """
+    __tablename__ = "practice_pool_instances"
+    
+    instance_id = Column(Integer, primary_key=True, autoincrement=True)
+    pool_key = Column(String, nullable=False, index=True)         # TemplateVersion-style hash of source + scripts
+    template_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)                        # Executor result (includes seed)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class TemplateExecutionStat(Base):
+    """
+    Per-template executor metrics, one row per template per flush window.
+    Written periodically by the in-process metrics registry.
+    """
+    __tablename__ = "template_execution_stats"
+    
+    stat_id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String, nullable=False)                       # "v1", "v2" or "adhoc" (unsaved preview)
+    template_id = Column(Integer, nullable=True, index=True)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False, index=True)
+    
+    calls = Column(Integer, default=0)                            # Executor calls (a batch is one call)
+    executions = Column(Integer, default=0)                       # Samples executed
+    failures = Column(Integer, default=0)                         # Samples/calls that raised
+    timeouts = Column(Integer, default=0)
+    compile_ms = Column(Float, default=0.0)                       # Total compile time
+    run_ms = Column(Float, default=0.0)                           # Total run time
+    run_ms_max = Column(Float, default=0.0)
+    run_histogram = Column(JSON, nullable=True)                   # Bucket upper bound (ms) -> count
+    exceptions = Column(JSON, nullable=True)                      # Exception type -> count
+    
+    # Uniqueness: generated samples vs. those rejected as duplicates
+    samples_checked = Column(Integer, default=0)
+    duplicates = Column(Integer, default=0)
+
+
+class TemplateCardinality(Base):
+    """
+    Estimated number of distinct questions a template can produce,
+    inferred from duplicate rates observed during generation.
+    """
+    __tablename__ = "template_cardinality"
+    
+    source = Column(String, primary_key=True)                     # "v1" or "v2"
+    template_id = Column(Integer, primary_key=True)
+    version_hash = Column(String, nullable=False)                 # Scripts the estimate was made for
+    samples_observed = Column(Integer, nullable=False)
+    distinct_observed = Column(Integer, nullable=False)
+    estimated_cardinality = Column(Integer, nullable=True)        # NULL = no collisions seen yet (unbounded so far)
+    saturated = Column(Boolean, default=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
 class SyllabusConfig(Base):
     """
     Store syllabus arrangement configuration per grade.
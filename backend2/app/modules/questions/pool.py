@@ -0,0 +1,352 @@
+"""
+Pre-generated practice question pools.
+
+Each template gets an in-memory buffer of ready-to-serve, deduplicated executor
+outputs. Practice requests pop from the buffer; a background refiller keeps
+buffers above a low-water mark, hottest templates first. Requests only run
+template code themselves when a pool is empty.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.questions.cardinality import cardinality_store, is_saturated
+from app.modules.questions.executor import CodeExecutionError, new_seed
+from app.modules.questions.models import PracticePoolInstance
+from app.modules.questions.rendering import template_version_hash
+from app.modules.questions.sandbox import executor
+from app.modules.questions.metrics import executor_metrics
+
+REFILL_BATCH_SIZE = 25
+MAX_BACKOFF_SECONDS = 60
+# Stop tracking identities for cardinality once a template is clearly not small
+MAX_TRACKED_IDENTITIES = 10000
+
+
+def result_identity(result: Dict[str, Any]) -> str:
+    """Dedup key for an executor result: question text, answer and options"""
+    raw_identity = f"{result.get('question', '')}_{result.get('answer', '')}"
+    if 'options' in result:
+        raw_identity += f"_{json.dumps(result['options'], sort_keys=True, default=str)}"
+    return hashlib.sha256(raw_identity.encode()).hexdigest()
+
+
+class _TemplatePool:
+    """Buffer and refill state for one (source, scripts) pair"""
+
+    def __init__(self, key: str, source: str, template_id: int, scripts: List[str], capacity: int):
+        self.key = key
+        self.source = source
+        self.template_id = template_id
+        self.scripts = scripts
+        self.buffer = deque()
+        # Identities currently buffered or recently served, oldest first
+        self.recent = OrderedDict()
+        self.recent_limit = capacity * 4
+        self.base_seed = new_seed()
+        self.next_index = 0
+        self.demand = 0.0
+        self.served = 0
+        self.failures = 0
+        self.backoff_until = 0.0
+        self.refilling = False
+        self.spill_loaded = False
+        # Every identity generated so far and how many successful samples it took
+        self.seen = set()
+        self.checked = 0
+        self.saturated = False
+
+    def remember(self, identity: str):
+        self.recent[identity] = True
+        self.recent.move_to_end(identity)
+        while len(self.recent) > self.recent_limit:
+            self.recent.popitem(last=False)
+
+
+class PracticePool:
+    """
+    Per-template pools of ready practice instances.
+
+    - take() never runs template code; it returns whatever is buffered
+    - The refiller thread tops pools up in batches through the sandbox executor
+    - Pools are keyed by a hash of the scripts, so editing a template starts a fresh pool
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        low_water: int,
+        max_templates: int,
+        refill_interval: float,
+        spill: bool = False
+    ):
+        self.capacity = capacity
+        self.low_water = low_water
+        self.max_templates = max_templates
+        self.refill_interval = refill_interval
+        self.spill = spill
+        self._pools: "OrderedDict[str, _TemplatePool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------------
+
+    def take(self, source: str, template_id: int, scripts: List[str], count: int) -> List[Dict[str, Any]]:
+        """
+        Pop up to `count` ready instances for a template.
+        Registers the template for background refill if it is not pooled yet.
+        """
+        if not settings.PRACTICE_POOL_ENABLED:
+            return []
+
+        pool = self._get_or_create(source, template_id, scripts)
+        self._load_spilled(pool)
+
+        with self._lock:
+            taken = []
+            while pool.buffer and len(taken) < count:
+                taken.append(pool.buffer.popleft())
+            pool.demand += count
+            pool.served += len(taken)
+            self.hits += len(taken)
+            self.misses += count - len(taken)
+            needs_refill = len(pool.buffer) < self.low_water
+
+        if needs_refill:
+            self._wake.set()
+        return taken
+
+    def discard(self, source: str, template_id: int):
+        """Drop all pools for a template (e.g. after it is deleted)"""
+        with self._lock:
+            for key in [k for k, p in self._pools.items() if p.source == source and p.template_id == template_id]:
+                del self._pools[key]
+
+    def _get_or_create(self, source: str, template_id: int, scripts: List[str]) -> _TemplatePool:
+        key = template_version_hash(source, scripts)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _TemplatePool(key, source, template_id, list(scripts), self.capacity)
+                self._pools[key] = pool
+                while len(self._pools) > self.max_templates:
+                    self._pools.popitem(last=False)
+            else:
+                self._pools.move_to_end(key)
+        return pool
+
+    # ------------------------------------------------------------------
+    # Refill
+    # ------------------------------------------------------------------
+
+    def _refill_candidates(self) -> List[_TemplatePool]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                p for p in self._pools.values()
+                if len(p.buffer) < self.low_water and not p.refilling and p.backoff_until <= now
+            ]
+            for p in candidates:
+                p.refilling = True
+        # Hot templates first
+        return sorted(candidates, key=lambda p: p.demand, reverse=True)
+
+    def _generate(self, pool: _TemplatePool, n: int) -> List[Dict[str, Any]]:
+        with executor_metrics.track(pool.source, pool.template_id) as trace:
+            if pool.source == "v1":
+                return executor.execute_generator_batch(
+                    pool.scripts[0], n, seed=pool.base_seed, start_index=pool.next_index, trace=trace
+                )
+            return executor.execute_sequential_batch(
+                pool.scripts, n, seed=pool.base_seed, start_index=pool.next_index, trace=trace
+            )
+
+    def _check_saturation(self, pool: _TemplatePool):
+        """Decide whether a pool may serve repeats, from its own samples or a stored estimate"""
+        if pool.saturated:
+            return
+        if is_saturated(pool.checked, len(pool.seen)):
+            pool.saturated = True
+            return
+
+        db = SessionLocal()
+        try:
+            known = cardinality_store.get(db, pool.source, pool.template_id, pool.scripts)
+        except Exception as e:
+            print(f"WARNING: Could not load cardinality for {pool.source} template {pool.template_id}: {e}")
+            known = None
+        finally:
+            db.close()
+        pool.saturated = bool(known and known[1])
+
+    def refill(self, pool: _TemplatePool):
+        """
+        Top one pool up to capacity.
+        A saturated template has no unseen outputs left, so its pool is filled
+        with repeats instead of retrying (and backing off) forever.
+        """
+        added = 0
+        self._check_saturation(pool)
+        try:
+            while len(pool.buffer) < self.capacity and not self._stop.is_set():
+                n = min(REFILL_BATCH_SIZE, self.capacity - len(pool.buffer))
+                entries = self._generate(pool, n)
+                pool.next_index += n
+
+                fresh = 0
+                checked = 0
+                with self._lock:
+                    for entry in entries:
+                        if entry['error']:
+                            continue
+                        checked += 1
+                        identity = result_identity(entry['result'])
+                        if len(pool.seen) < MAX_TRACKED_IDENTITIES:
+                            pool.seen.add(identity)
+                        if identity in pool.recent and not pool.saturated:
+                            continue
+                        pool.remember(identity)
+                        pool.buffer.append(entry['result'])
+                        fresh += 1
+                    pool.checked += checked
+                added += fresh
+                executor_metrics.record_duplicates(pool.source, pool.template_id, checked, checked - fresh)
+
+                if len(pool.seen) < MAX_TRACKED_IDENTITIES:
+                    cardinality_store.observe(pool.source, pool.template_id, pool.scripts, pool.checked, len(pool.seen))
+                if fresh == 0:
+                    # Every instance failed or was a duplicate; serve repeats once that is all there is
+                    if checked and not pool.saturated and is_saturated(pool.checked, len(pool.seen)):
+                        pool.saturated = True
+                        continue
+                    break
+        except CodeExecutionError as e:
+            print(f"WARNING: Practice pool refill failed for {pool.source} template {pool.template_id}: {e}")
+        finally:
+            with self._lock:
+                if added:
+                    pool.failures = 0
+                    pool.backoff_until = 0.0
+                elif len(pool.buffer) < self.low_water:
+                    pool.failures += 1
+                    pool.backoff_until = time.monotonic() + min(MAX_BACKOFF_SECONDS, 2 ** pool.failures)
+                pool.refilling = False
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+            for pool in self._refill_candidates():
+                if self._stop.is_set():
+                    break
+                self.refill(pool)
+            # Decay demand so "hot" reflects recent traffic
+            with self._lock:
+                for pool in self._pools.values():
+                    pool.demand *= 0.5
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="practice-pool-refiller", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.refill_interval + 5)
+            self._thread = None
+        if self.spill:
+            self._spill_all()
+
+    # ------------------------------------------------------------------
+    # DB spill
+    # ------------------------------------------------------------------
+
+    def _spill_all(self):
+        """Persist buffered instances so a restart does not start cold"""
+        with self._lock:
+            rows = [
+                PracticePoolInstance(pool_key=p.key, template_id=p.template_id, payload=result)
+                for p in self._pools.values()
+                for result in p.buffer
+            ]
+        if not rows:
+            return
+
+        db = SessionLocal()
+        try:
+            db.add_all(rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"WARNING: Could not spill practice pools: {e}")
+        finally:
+            db.close()
+
+    def _load_spilled(self, pool: _TemplatePool):
+        """Claim spilled instances for a pool the first time it is used"""
+        if not self.spill or pool.spill_loaded:
+            return
+        pool.spill_loaded = True
+
+        db = SessionLocal()
+        try:
+            rows = db.query(PracticePoolInstance).filter(
+                PracticePoolInstance.pool_key == pool.key
+            ).limit(self.capacity).with_for_update(skip_locked=True).all()
+            if not rows:
+                return
+            payloads = [row.payload for row in rows]
+            for row in rows:
+                db.delete(row)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"WARNING: Could not load spilled practice pool {pool.key}: {e}")
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            for result in payloads:
+                identity = result_identity(result)
+                if identity not in pool.recent:
+                    pool.remember(identity)
+                    pool.buffer.append(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": settings.PRACTICE_POOL_ENABLED,
+                "templates": len(self._pools),
+                "buffered": sum(len(p.buffer) for p in self._pools.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0,
+                "refiller_running": bool(self._thread and self._thread.is_alive())
+            }
+
+
+practice_pool = PracticePool(
+    capacity=settings.PRACTICE_POOL_CAPACITY,
+    low_water=settings.PRACTICE_POOL_LOW_WATER,
+    max_templates=settings.PRACTICE_POOL_MAX_TEMPLATES,
+    refill_interval=settings.PRACTICE_POOL_REFILL_INTERVAL,
+    spill=settings.PRACTICE_POOL_SPILL
+)
@@ -0,0 +1,166 @@
+"""
+Compact question storage and on-demand rendering.
+
+In compact mode a stored question keeps only its answer, a template version hash
+and the generation seed. The text is re-rendered lazily by replaying the
+versioned scripts with the same seed; rendered output is cached in memory.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.modules.questions.models import TemplateVersion
+from app.modules.questions.executor import CodeExecutionError
+from app.modules.questions.sandbox import executor
+from app.modules.questions.metrics import executor_metrics
+
+logger = logging.getLogger(__name__)
+
+# (version_hash, seed) -> executor result
+_render_cache = LRUCache(maxsize=settings.RENDER_CACHE_SIZE)
+# version_hash -> (source, template_id, scripts)
+_version_cache = LRUCache(maxsize=4096)
+_lock = threading.Lock()
+
+
+def compact_storage_enabled() -> bool:
+    return settings.QUESTION_STORAGE_MODE == "compact"
+
+
+def template_version_hash(source: str, scripts: List[str]) -> str:
+    """Content hash identifying exactly which scripts produced a question"""
+    payload = json.dumps({"source": source, "scripts": scripts}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def register_template_version(db: Session, source: str, template_id: int, scripts: List[str]) -> str:
+    """
+    Make sure a TemplateVersion row exists for these scripts and return its hash.
+    Only touches the database the first time a version is seen by this process.
+    """
+    version_hash = template_version_hash(source, scripts)
+
+    with _lock:
+        if version_hash in _version_cache:
+            return version_hash
+
+    exists = db.query(TemplateVersion.version_hash).filter(
+        TemplateVersion.version_hash == version_hash
+    ).first()
+
+    if not exists:
+        try:
+            with db.begin_nested():
+                db.add(TemplateVersion(
+                    version_hash=version_hash,
+                    source=source,
+                    template_id=template_id,
+                    scripts=scripts
+                ))
+        except IntegrityError:
+            # Another request registered the same version concurrently
+            pass
+
+    with _lock:
+        _version_cache[version_hash] = (source, template_id, scripts)
+    return version_hash
+
+
+def cache_version(version_hash: str, source: str, template_id: int, scripts: List[str]):
+    """Make a version renderable from memory without registering it in the database"""
+    with _lock:
+        _version_cache[version_hash] = (source, template_id, scripts)
+
+
+def remember_rendered(version_hash: str, seed: int, result: Dict[str, Any]):
+    """Prime the render cache with output we already have (e.g. right after generation)"""
+    with _lock:
+        _render_cache[(version_hash, seed)] = result
+
+
+def load_version(db: Session, version_hash: str) -> Optional[Tuple[str, int, List[str]]]:
+    """(source, template_id, scripts) of a template version; None if unknown"""
+    with _lock:
+        cached = _version_cache.get(version_hash)
+    if cached:
+        return cached
+
+    row = db.query(TemplateVersion).filter(TemplateVersion.version_hash == version_hash).first()
+    if not row:
+        return None
+
+    with _lock:
+        _version_cache[version_hash] = (row.source, row.template_id, row.scripts)
+    return row.source, row.template_id, row.scripts
+
+
+def render(db: Session, version_hash: str, seed: int) -> Dict[str, Any]:
+    """
+    Re-render a compactly stored question.
+
+    Raises:
+        CodeExecutionError: If the version is unknown or the scripts fail
+    """
+    key = (version_hash, seed)
+    with _lock:
+        cached = _render_cache.get(key)
+    if cached is not None:
+        return cached
+
+    version = load_version(db, version_hash)
+    if not version:
+        raise CodeExecutionError(f"Unknown template version {version_hash}")
+
+    source, template_id, scripts = version
+    with executor_metrics.track(source, template_id) as trace:
+        if source == "v1":
+            result = executor.execute_generator(scripts[0], seed=seed, trace=trace)
+        else:
+            result = executor.execute_sequential(scripts, seed=seed, trace=trace)
+
+    remember_rendered(version_hash, seed, result)
+    return result
+
+
+def hydrate(
+    db: Session,
+    rows: Iterable[Any],
+    text_attr: str,
+    builders: Dict[str, Callable[[Any, Dict[str, Any]], Any]]
+):
+    """
+    Fill in rendered fields on compactly stored rows, in place.
+
+    Rows whose `text_attr` is already set (full-text rows) are left alone.
+    Values are set as committed state so hydrating never causes a write.
+    Raises CodeExecutionError if a row cannot be re-rendered, so callers fail
+    the request instead of serving blank questions.
+
+    Args:
+        rows: ORM objects with template_version and generation_seed columns
+        text_attr: Attribute that is NULL for compact rows (e.g. 'question_html')
+        builders: attribute name -> function(row, result) building its value from the render result
+    """
+    for row in rows:
+        if getattr(row, text_attr) is not None:
+            continue
+        if row.template_version is None or row.generation_seed is None:
+            continue
+
+        try:
+            result = render(db, row.template_version, row.generation_seed)
+        except CodeExecutionError as e:
+            logger.error("Could not render %s/%s: %s", row.template_version, row.generation_seed, e)
+            raise
+
+        for attr, build in builders.items():
+            set_committed_value(row, attr, build(row, result))
@@ -6,14 +6,19 @@ All endpoints follow SkillBuilder API standards.
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-import random
-from typing import Optional
+from typing import List, Optional
 
 from app.db.session import get_db
+from app.core.config import settings
 from app.core.security import get_current_user
 from app.modules.questions import schemas, service
 from app.modules.questions.models import QuestionGeneration
 from app.modules.questions.executor import CodeExecutionError, CodeTimeoutError
+from app.modules.questions.sandbox import executor
+from app.modules.questions import rendering
+from app.modules.questions.pool import practice_pool
+from app.modules.questions.template_index import template_index
+from app.modules.questions.sampler import v2_sampler
 
 router = APIRouter(prefix="/question-templates", tags=["Question Templates"])
 generation_router = APIRouter(prefix="/question-generation-jobs", tags=["Question Generation"])
@@ -301,10 +306,11 @@ def get_practice_questions(
     Generate practice questions for a template (PUBLIC - no auth required).
     
     This endpoint is for students to practice with dynamically generated questions.
-    It generates fresh questions on-the-fly without storing them.
+    Questions come from the pre-generated practice pool; only a pool miss
+    generates on-the-fly. Nothing is stored.
     """
     try:
-        preview_result = service.QuestionTemplateService.preview_template(
+        preview_result = service.QuestionTemplateService.practice_questions(
             db=db,
             template_id=template_id,
             count=count
@@ -351,8 +357,8 @@ def create_generation_job(
     Create a question generation job.
     
     - Creates job in 'pending' status
-    - Job will be processed by background worker
-    - Returns job details immediately
+    - Job will be processed by the background worker (python -m app.worker)
+    - Returns job details immediately; poll GET /{job_id} for progress
     """
     try:
         job = service.QuestionGenerationService.create_generation_job(
@@ -361,13 +367,13 @@ def create_generation_job(
             user_id=current_user.user_id if current_user else None
         )
         
-        # TODO: Trigger background worker to process job
-        # For now, process synchronously (will move to async later)
-        try:
-            service.QuestionGenerationService.process_generation_job(db=db, job_id=job.job_id)
-        except Exception as e:
-            # Job will remain in failed status
-            pass
+        if settings.GENERATION_JOBS_INLINE:
+            # Deployments without a worker process jobs in the request
+            try:
+                service.QuestionGenerationService.process_generation_job(db=db, job_id=job.job_id)
+            except Exception as e:
+                # Job will remain in failed status
+                pass
         
         return schemas.APIResponse(
             success=True,
@@ -396,7 +402,8 @@ def get_generation_job(
     Get generation job status.
     
     - Returns job details including status and progress
-    - Status values: pending, processing, completed, failed
+    - Status values: pending, processing, completed, failed, cancelled
+    - generated_count and progress are updated at every checkpoint while the job runs
     """
     job = service.QuestionGenerationService.get_job(db=db, job_id=job_id)
     
@@ -417,6 +424,37 @@ def get_generation_job(
     )
 
 
+@generation_router.post("/{job_id}/cancel", response_model=schemas.APIResponse)
+def cancel_generation_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Cancel a generation job.
+    
+    - Pending jobs are cancelled right away
+    - Running jobs stop at their next checkpoint, keeping the questions generated so far
+    """
+    job = service.QuestionGenerationService.cancel_job(db=db, job_id=job_id)
+    
+    if not job:
+        return schemas.APIResponse(
+            success=False,
+            data=None,
+            error=schemas.ErrorDetail(
+                code="JOB_NOT_FOUND",
+                message=f"Job with ID {job_id} not found"
+            ).dict()
+        )
+    
+    return schemas.APIResponse(
+        success=True,
+        data=schemas.QuestionGenerationJobResponse.from_orm(job).dict(),
+        error=None
+    )
+
+
 # ============================================================================
 # Generated Questions Endpoints
 # ============================================================================
@@ -472,15 +510,25 @@ def list_generated_questions(
     - Paginated results (max 100 per page)
     - Optional random ordering
     """
-    questions, total = service.QuestionGenerationService.list_generated_questions(
-        db=db,
-        current_user=None,
-        template_id=template_id,
-        job_id=job_id,
-        limit=limit,
-        offset=offset,
-        random_order=random
-    )
+    try:
+        questions, total = service.QuestionGenerationService.list_generated_questions(
+            db=db,
+            current_user=None,
+            template_id=template_id,
+            job_id=job_id,
+            limit=limit,
+            offset=offset,
+            random_order=random
+        )
+    except CodeExecutionError as e:
+        return schemas.APIResponse(
+            success=False,
+            data=None,
+            error=schemas.ErrorDetail(
+                code="QUESTION_RENDER_FAILED",
+                message=str(e)
+            ).dict()
+        )
     
     return schemas.APIResponse(
         success=True,
@@ -504,7 +552,17 @@ def get_generated_question(
     
     - Returns full question details including debug info
     """
-    question = service.QuestionGenerationService.get_generated_question(db=db, question_id=question_id)
+    try:
+        question = service.QuestionGenerationService.get_generated_question(db=db, question_id=question_id)
+    except CodeExecutionError as e:
+        return schemas.APIResponse(
+            success=False,
+            data=None,
+            error=schemas.ErrorDetail(
+                code="QUESTION_RENDER_FAILED",
+                message=str(e)
+            ).dict()
+        )
     
     if not question:
         return schemas.APIResponse(
@@ -632,6 +690,7 @@ def create_generation_template(
         db.add(template)
         db.commit()
         db.refresh(template)
+        template_index.invalidate()
         
         return schemas.APIResponse(
             success=True,
@@ -788,11 +847,12 @@ def get_practice_questions_by_skill(
     count: int = Query(default=5, ge=1, le=20, description="Number of questions to generate"),
     type: Optional[str] = Query(None, description="Preferred format: MCQ or User Input"),
     difficulty: Optional[str] = Query(None, description="Difficulty: Easy, Medium, or Hard"),
+    exclude: Optional[List[int]] = Query(None, description="Template IDs already practiced; others are preferred"),
     db: Session = Depends(get_db)
 ):
     """
     Generate practice questions for a specific skill (PUBLIC/STUDENT).
-    Finds the latest active v2 template for the skill and generates questions.
+    Picks a v2 template for the skill and generates questions.
     """
     try:
         # Find all templates for this skill
@@ -821,12 +881,13 @@ def get_practice_questions_by_skill(
         # 1. If explicit difficulty requested, try to find it.
         # 2. Else, Waterfall: Medium -> Easy -> Hard -> Any.
         
+        # 3. Templates in `exclude` are used only when nothing else matches.
         selected_template = None
         
         if difficulty:
             diff_matches = [t for t in filtered_templates if t.difficulty and t.difficulty.lower() == difficulty.lower()]
             if diff_matches:
-                selected_template = random.choice(diff_matches)
+                selected_template = v2_sampler.sample(diff_matches, 1, exclude_ids=exclude)[0]
         
         if not selected_template:
             # Apply Waterfall Logic on filtered_templates
@@ -834,16 +895,10 @@ def get_practice_questions_by_skill(
             easys = [t for t in filtered_templates if t.difficulty and t.difficulty.lower() == 'easy']
             hards = [t for t in filtered_templates if t.difficulty and t.difficulty.lower() == 'hard']
             
-            if mediums:
-                selected_template = random.choice(mediums)
-            elif easys:
-                selected_template = random.choice(easys)
-            elif hards:
-                selected_template = random.choice(hards)
-            else:
-                # Fallback to any available if standard difficulties not found
-                if filtered_templates:
-                    selected_template = random.choice(filtered_templates)
+            # Fallback to any available if standard difficulties not found
+            candidates = mediums or easys or hards or filtered_templates
+            if candidates:
+                selected_template = v2_sampler.sample(candidates, 1, exclude_ids=exclude)[0]
         
 
 
@@ -859,18 +914,27 @@ def get_practice_questions_by_skill(
                 ).dict()
             )
 
-        preview_result = service.QuestionGenerationService.preview_generation_v2(
+        preview_result = service.QuestionGenerationService.practice_questions_v2(
             db=db,
-            question_code=selected_template.question_template,
-            answer_code=selected_template.answer_template,
-            solution_code=selected_template.solution_template,
+            template=selected_template,
             count=count
         )
         
+        # Compact storage: clients echo (template_version, seed) back when recording attempts
+        template_version = None
+        if rendering.compact_storage_enabled():
+            template_version = rendering.register_template_version(
+                db, "v2", selected_template.template_id,
+                [selected_template.question_template, selected_template.answer_template, selected_template.solution_template]
+            )
+            db.commit()
+        
         # Add template_id to each question sample
         if 'preview_samples' in preview_result:
             for sample in preview_result['preview_samples']:
                 sample['template_id'] = selected_template.template_id
+                if template_version:
+                    sample['template_version'] = template_version
         
         # Enrich result with template metadata for frontend
         preview_result['template_metadata'] = {
@@ -894,6 +958,43 @@ def get_practice_questions_by_skill(
 
 
 
+@new_templates_router.get("/{template_id}/solution", response_model=schemas.APIResponse)
+def get_practice_solution(
+    template_id: int,
+    version: str = Query(..., description="Version from the sample's solution_handle"),
+    seed: int = Query(..., description="Seed from the sample's solution_handle"),
+    db: Session = Depends(get_db)
+):
+    """
+    Render the solution for a practice sample on demand (PUBLIC/STUDENT).
+    Practice samples only carry a solution_handle; this replays the template
+    under the same seed to produce the matching solution.
+    """
+    try:
+        solution = service.QuestionGenerationService.render_solution(
+            db=db,
+            template_id=template_id,
+            version=version,
+            seed=seed
+        )
+        
+        return schemas.APIResponse(
+            success=True,
+            data=solution,
+            error=None
+        )
+    except ValueError as e:
+        code = "TEMPLATE_NOT_FOUND" if "not found" in str(e).lower() else "SOLUTION_GENERATION_ERROR"
+        return schemas.APIResponse(
+            success=False,
+            data=None,
+            error=schemas.ErrorDetail(
+                code=code,
+                message=str(e)
+            ).dict()
+        )
+
+
 @new_templates_router.patch("/{template_id}", response_model=schemas.APIResponse)
 def update_generation_template(
     template_id: int,
@@ -917,11 +1018,19 @@ def update_generation_template(
         )
     
     update_dict = update_data.model_dump(exclude_unset=True)
+    
+    # Drop compiled code for scripts that are being replaced
+    executor.invalidate_compiled(*[
+        getattr(template, field) for field in ('question_template', 'answer_template', 'solution_template')
+        if field in update_dict and update_dict[field] != getattr(template, field)
+    ])
+    
     for key, value in update_dict.items():
         setattr(template, key, value)
     
     db.commit()
     db.refresh(template)
+    template_index.invalidate()
     
     return schemas.APIResponse(
         success=True,
@@ -947,9 +1056,14 @@ def delete_generation_template(
             detail={"code": "TEMPLATE_NOT_FOUND", "message": f"Template with ID {template_id} not found"}
         )
     
+    scripts = (template.question_template, template.answer_template, template.solution_template)
+    
     try:
         db.delete(template)
         db.commit()
+        executor.invalidate_compiled(*scripts)
+        practice_pool.discard("v2", template_id)
+        template_index.invalidate()
     except IntegrityError:
         db.rollback()
         raise HTTPException(
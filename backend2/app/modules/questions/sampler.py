@@ -0,0 +1,181 @@
+"""
+Topic-diverse template sampling.
+
+Picks `count` templates round-robin across topics (one per topic per round, in
+random order), subject to per-topic caps, type quotas, a difficulty mix and
+templates to avoid. Templates are bucketed by topic once; each pass then
+visits every template at most once, shuffling buckets lazily and reading a
+template's type/difficulty only when it is considered, with index
+bookkeeping instead of list membership tests, so sampling is O(pool).
+When the constraints cannot all be met, later passes relax them in order:
+difficulty mix, topic cap, avoided templates, type quotas.
+
+Used by assessment paper selection and skill practice.
+"""
+
+import random
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.modules.questions.template_index import normalize_difficulty, normalize_type
+
+# (enforce difficulty mix, enforce topic cap, avoid excluded, enforce type quotas) per pass
+RELAXATION_PASSES = [
+    (True, True, True, True),
+    (False, True, True, True),
+    (False, False, True, True),
+    (False, False, False, True),
+    (False, False, False, False),
+]
+
+
+def split_quota(weights: Dict[str, float], count: int) -> Dict[str, int]:
+    """Split `count` by weight (largest remainder), e.g. {'easy': 0.6, 'medium': 0.4}, 10 -> {'easy': 6, 'medium': 4}"""
+    total = sum(weights.values())
+    if total <= 0:
+        return {key: 0 for key in weights}
+    exact = {key: count * weight / total for key, weight in weights.items()}
+    quota = {key: int(value) for key, value in exact.items()}
+    by_remainder = sorted(exact, key=lambda key: exact[key] - quota[key], reverse=True)
+    for key in by_remainder[:count - sum(quota.values())]:
+        quota[key] += 1
+    return quota
+
+
+class TemplateSampler:
+    """
+    Samples templates from a pool of dicts or ORM rows.
+    The key functions say where to find each template's id, topic, type and difficulty.
+    """
+
+    def __init__(
+        self,
+        id_key: Callable[[Any], Any],
+        topic_key: Callable[[Any], Any],
+        type_key: Callable[[Any], Any],
+        difficulty_key: Callable[[Any], Any]
+    ):
+        self.id_key = id_key
+        self.topic_key = topic_key
+        self.type_key = type_key
+        self.difficulty_key = difficulty_key
+
+    def sample(
+        self,
+        pool: List[Any],
+        count: int,
+        topic_cap: Optional[int] = None,
+        type_quota: Optional[Dict[str, int]] = None,
+        difficulty_mix: Optional[Dict[str, float]] = None,
+        exclude_ids: Optional[Iterable[Any]] = None,
+        rng: Optional[random.Random] = None
+    ) -> List[Any]:
+        """
+        Pick up to `count` distinct templates from `pool`.
+
+        Args:
+            topic_cap: Max templates per topic
+            type_quota: type -> number of templates, e.g. {'mcq': 13, 'input': 12};
+                        types without a quota are only used once quotas are relaxed
+            difficulty_mix: difficulty -> weight, split into quotas of `count`
+            exclude_ids: Templates to avoid (e.g. already seen), used only as a last resort
+            rng: Random source (for reproducible samples)
+
+        Returns:
+            Sampled templates; grouped in type_quota order when quotas are given
+        """
+        rng = rng or random
+        n = len(pool)
+        if count <= 0 or n == 0:
+            return []
+
+        exclude_ids = set(exclude_ids or ())
+        topics = [self.topic_key(item) for item in pool]
+        buckets: Dict[Any, List[int]] = {}
+        for i, topic in enumerate(topics):
+            buckets.setdefault(topic, []).append(i)
+        topic_order = list(buckets.values())
+
+        # Filled in lazily, only for templates that are actually considered
+        types: List[Any] = [None] * n
+        difficulties: List[Any] = [None] * n
+        excluded: List[Optional[bool]] = [None] * n
+
+        difficulty_left = split_quota(difficulty_mix, count) if difficulty_mix else None
+        type_left = dict(type_quota) if type_quota else None
+        topic_counts: Dict[Any, int] = {}
+        taken = bytearray(n)
+        chosen: List[int] = []
+
+        for enforce_difficulty, enforce_cap, avoid_excluded, enforce_types in RELAXATION_PASSES:
+            if len(chosen) >= count:
+                break
+            if not enforce_types and type_left is not None and sum(type_left.values()) <= 0:
+                # Type quotas were met; anything more would break the requested ratio
+                break
+
+            def accept(i: int) -> bool:
+                if taken[i]:
+                    return False
+                if types[i] is None:
+                    types[i] = self.type_key(pool[i])
+                    difficulties[i] = self.difficulty_key(pool[i])
+                    excluded[i] = bool(exclude_ids) and self.id_key(pool[i]) in exclude_ids
+                if avoid_excluded and excluded[i]:
+                    return False
+                if enforce_cap and topic_cap is not None and topic_counts.get(topics[i], 0) >= topic_cap:
+                    return False
+                if enforce_types and type_left is not None and type_left.get(types[i], 0) <= 0:
+                    return False
+                if enforce_difficulty and difficulty_left is not None and difficulty_left.get(difficulties[i], 0) <= 0:
+                    return False
+                return True
+
+            # Round-robin over topics; exhausted topics drop out, so a pass is O(pool)
+            rng.shuffle(topic_order)
+            active = topic_order
+            position = 0
+            while active and len(chosen) < count:
+                still_active = []
+                for bucket in active:
+                    # Lazy Fisher-Yates: draw this position from the rest of the bucket
+                    j = rng.randrange(position, len(bucket))
+                    bucket[position], bucket[j] = bucket[j], bucket[position]
+                    i = bucket[position]
+                    if accept(i):
+                        taken[i] = 1
+                        chosen.append(i)
+                        topic_counts[topics[i]] = topic_counts.get(topics[i], 0) + 1
+                        if type_left is not None and types[i] in type_left:
+                            type_left[types[i]] -= 1
+                        if difficulty_left is not None and difficulties[i] in difficulty_left:
+                            difficulty_left[difficulties[i]] -= 1
+                        if len(chosen) >= count:
+                            break
+                    if position + 1 < len(bucket):
+                        still_active.append(bucket)
+                active = still_active
+                position += 1
+
+        if type_quota:
+            order = {key: rank for rank, key in enumerate(type_quota)}
+            chosen.sort(key=lambda i: order.get(types[i], len(order)))
+        return [pool[i] for i in chosen]
+
+
+# Template index entries (dicts); types are 'mcq' or 'input'
+# Index entries mix v1 and v2 templates, whose ids overlap
+index_sampler = TemplateSampler(
+    id_key=itemgetter('source', 'id'),
+    topic_key=itemgetter('topic'),
+    type_key=lambda item: 'mcq' if normalize_type(item['type']) == 'mcq' else 'input',
+    difficulty_key=lambda item: normalize_difficulty(item['difficulty'])
+)
+
+# QuestionGeneration rows
+v2_sampler = TemplateSampler(
+    id_key=attrgetter('template_id'),
+    topic_key=attrgetter('skill_name'),
+    type_key=lambda t: normalize_type(t.type),
+    difficulty_key=lambda t: normalize_difficulty(t.difficulty)
+)
@@ -0,0 +1,305 @@
+"""
+Process-pool sandbox for question template execution.
+Template code runs in a fixed set of pre-started worker processes, so a runaway
+script is killed and replaced instead of spinning inside the API process.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.modules.questions.executor import (
+    QuestionExecutor,
+    ExecutionTrace,
+    executor as inline_executor,
+    CodeExecutionError,
+    CodeTimeoutError
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SandboxUnavailableError(CodeExecutionError):
+    """Raised when no sandbox worker could be acquired or started"""
+    pass
+
+
+class _WorkerExecutor(QuestionExecutor):
+    """
+    Executor used inside sandbox worker processes.
+    The parent enforces the wall-clock limit by killing the process, so code
+    runs directly instead of on a helper thread.
+    """
+
+    def _run_with_timeout(self, func, timeout_seconds):
+        return func()
+
+
+def _worker_main(conn):
+    """Worker process loop: receive (method, args, kwargs), reply (status, value, trace)"""
+    worker_executor = _WorkerExecutor()
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+
+        method, args, kwargs = request
+        # The trace is filled in here and shipped back with the response
+        trace = kwargs.get("trace")
+        try:
+            response = ("ok", getattr(worker_executor, method)(*args, **kwargs), trace)
+        except CodeExecutionError as e:
+            response = ("error", e, trace)
+        except Exception as e:
+            response = ("error", CodeExecutionError(f"Execution error: {str(e)}"), trace)
+
+        try:
+            conn.send(response)
+        except Exception as e:
+            # Result could not be pickled (e.g. template returned an exotic object)
+            conn.send(("error", CodeExecutionError(f"Template output could not be returned: {str(e)}"), trace))
+
+
+class _SandboxWorker:
+    """A single sandbox process and the parent end of its pipe"""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def call(self, method: str, args: tuple, kwargs: dict, timeout_seconds: float) -> Any:
+        self.conn.send((method, args, kwargs))
+
+        if not self.conn.poll(timeout_seconds):
+            raise CodeTimeoutError(f"Code execution exceeded {timeout_seconds} second limit")
+
+        status, value, trace = self.conn.recv()
+        if trace is not None:
+            # Copy worker-side timings onto the caller's trace object
+            kwargs["trace"].merge(trace)
+        if status == "error":
+            raise value
+        return value
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        finally:
+            self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.process.join(1)
+        except (OSError, ValueError):
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Fixed-size pool of sandbox worker processes.
+
+    - Workers are started lazily on first use
+    - Each call gets a hard wall-clock limit; on timeout the worker is killed and respawned
+    - A worker that cannot be respawned is dropped, and replaced on a later call
+    - submit() blocks the calling thread, submit_async() awaits without blocking the event loop
+    """
+
+    def __init__(self, size: int, timeout_seconds: float, acquire_timeout_seconds: float):
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = []
+        self._started = False
+        self._lock = threading.Lock()
+        self.respawn_count = 0
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                worker = _SandboxWorker(self._ctx)
+                self._workers.append(worker)
+                self._idle.put(worker)
+            self._started = True
+
+    def _respawn(self, dead: _SandboxWorker) -> Optional[_SandboxWorker]:
+        """Replace a killed worker; None (and one worker short) if a new one cannot be started"""
+        dead.kill()
+        with self._lock:
+            self._workers = [w for w in self._workers if w is not dead]
+        try:
+            worker = _SandboxWorker(self._ctx)
+        except Exception as e:
+            logger.error("Failed to respawn sandbox worker: %s", e)
+            return None
+        with self._lock:
+            self._workers.append(worker)
+            self.respawn_count += 1
+        return worker
+
+    def _replace_missing(self):
+        """Start workers lost to failed respawns (best effort)"""
+        with self._lock:
+            while self._started and len(self._workers) < self.size:
+                try:
+                    worker = _SandboxWorker(self._ctx)
+                except Exception as e:
+                    logger.error("Failed to replace sandbox worker: %s", e)
+                    return
+                self._workers.append(worker)
+                self._idle.put(worker)
+                self.respawn_count += 1
+
+    def submit(self, method: str, *args, timeout_seconds: float = None, **kwargs) -> Any:
+        """Run a QuestionExecutor method in a sandbox worker and return its result"""
+        if not self._started:
+            try:
+                self.start()
+            except OSError as e:
+                logger.error("Failed to start sandbox pool: %s", e)
+                raise SandboxUnavailableError(f"Sandbox pool could not be started: {str(e)}")
+        if len(self._workers) < self.size:
+            self._replace_missing()
+
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout_seconds)
+        except queue.Empty:
+            raise SandboxUnavailableError("All sandbox workers are busy, try again shortly")
+
+        try:
+            return worker.call(method, args, kwargs, timeout_seconds or self.timeout_seconds)
+        except CodeTimeoutError:
+            worker = self._respawn(worker)
+            raise
+        except (EOFError, OSError) as e:
+            # Worker died mid-call (crash, OOM kill); replace it
+            worker = self._respawn(worker)
+            raise CodeExecutionError(f"Sandbox worker crashed: {str(e) or type(e).__name__}")
+        finally:
+            # Only live workers go back; a failed respawn leaves None
+            if worker is not None:
+                self._idle.put(worker)
+
+    async def submit_async(self, method: str, *args, timeout_seconds: float = None, **kwargs) -> Any:
+        """Async variant of submit(); waits on a thread so the event loop stays free"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, partial(self.submit, method, *args, timeout_seconds=timeout_seconds, **kwargs)
+        )
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._idle = queue.Queue()
+            self._started = False
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "started": self._started,
+            "idle_workers": self._idle.qsize(),
+            "respawn_count": self.respawn_count
+        }
+
+
+class PooledQuestionExecutor(QuestionExecutor):
+    """
+    Drop-in replacement for QuestionExecutor that runs template code in a SandboxPool.
+    Syntax validation still compiles in-process (compiling never runs user code).
+    """
+
+    def __init__(self, pool: SandboxPool):
+        super().__init__()
+        self.pool = pool
+
+    def execute_sequential(
+        self,
+        scripts: list[str],
+        seed: Optional[int] = None,
+        trace: Optional[ExecutionTrace] = None
+    ) -> Dict[str, Any]:
+        return self.pool.submit("execute_sequential", scripts, seed, trace=trace)
+
+    def execute_generator(
+        self,
+        code: str,
+        seed: Optional[int] = None,
+        trace: Optional[ExecutionTrace] = None
+    ) -> Dict[str, Any]:
+        return self.pool.submit("execute_generator", code, seed, trace=trace)
+
+    def execute_validator(
+        self,
+        code: str,
+        user_answer: Any,
+        correct_answer: Any,
+        trace: Optional[ExecutionTrace] = None
+    ) -> bool:
+        return self.pool.submit("execute_validator", code, user_answer, correct_answer, trace=trace)
+
+    def execute_validator_batch(
+        self,
+        items: List[Tuple[str, Any, Any]],
+        trace: Optional[ExecutionTrace] = None
+    ) -> List[Optional[bool]]:
+        return self.pool.submit(
+            "execute_validator_batch", items,
+            timeout_seconds=self.BATCH_TIMEOUT_SECONDS, trace=trace
+        )
+
+    def execute_sequential_batch(
+        self,
+        scripts: list[str],
+        n: int,
+        seed: Optional[int] = None,
+        start_index: int = 0,
+        trace: Optional[ExecutionTrace] = None
+    ) -> List[Dict[str, Any]]:
+        return self.pool.submit(
+            "execute_sequential_batch", scripts, n, seed, start_index,
+            timeout_seconds=self.BATCH_TIMEOUT_SECONDS, trace=trace
+        )
+
+    def execute_generator_batch(
+        self,
+        code: str,
+        n: int,
+        seed: Optional[int] = None,
+        start_index: int = 0,
+        trace: Optional[ExecutionTrace] = None
+    ) -> List[Dict[str, Any]]:
+        return self.pool.submit(
+            "execute_generator_batch", code, n, seed, start_index,
+            timeout_seconds=self.BATCH_TIMEOUT_SECONDS, trace=trace
+        )
+
+sandbox_pool = SandboxPool(
+    size=settings.SANDBOX_POOL_SIZE,
+    timeout_seconds=QuestionExecutor.TIMEOUT_SECONDS,
+    acquire_timeout_seconds=settings.SANDBOX_ACQUIRE_TIMEOUT
+)
+
+# Executor used by services and routers. SANDBOX_POOL_SIZE=0 keeps the
+# in-process (thread based) executor, e.g. for scripts and local debugging.
+executor = PooledQuestionExecutor(sandbox_pool) if settings.SANDBOX_POOL_SIZE > 0 else inline_executor
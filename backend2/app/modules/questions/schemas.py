@@ -115,6 +115,7 @@ class PreviewSample(BaseModel):
     question_type: Optional[str] = None  # 'mcq', 'user_input', etc.
     options: Optional[List[Any]] = None  # For MCQ questions (can be strings or numbers)
     topic: Optional[str] = None  # Question topic if provided
+    seed: Optional[int] = None  # Seed that reproduces this sample
 
 
 class QuestionTemplatePreviewResponse(BaseModel):
@@ -130,10 +131,15 @@ class QuestionGenerationJobResponse(BaseModel):
     template_id: int
     requested_count: int
     generated_count: int
+    progress: float = 0.0  # Percent of requested_count generated so far
     status: str
+    status_detail: Optional[str] = None
+    attempts: Optional[int] = None
+    cancel_requested: Optional[bool] = None
     created_by_user_id: Optional[UUID]  # Changed from int to UUID
     created_at: datetime
     completed_at: Optional[datetime]
+    generation_seed: Optional[str] = None
     
     class Config:
         from_attributes = True
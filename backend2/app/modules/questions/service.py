@@ -5,26 +5,54 @@ Handles CRUD operations, code execution, and question generation.
 
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 import hashlib
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 
+from app.core.config import settings
+from app.core.cache import cached, invalidate_cache
 from app.modules.questions import models
 from app.modules.questions.models import (
     QuestionTemplate,
     QuestionGenerationJob,
     GeneratedQuestion,
-    SyllabusConfig
+    SyllabusConfig,
+    QuestionGeneration
 )
 from app.modules.questions.schemas import (
     QuestionTemplateCreate,
     QuestionTemplateUpdate,
     QuestionGenerationJobCreate
 )
-from app.modules.questions.executor import executor, CodeExecutionError, CodeTimeoutError
+from app.modules.questions.executor import CodeExecutionError, CodeTimeoutError, new_seed, normalize_seed
+from app.modules.questions.sandbox import executor, sandbox_pool
+from app.modules.questions import rendering
+from app.modules.questions.pool import practice_pool, result_identity
+from app.modules.questions.metrics import executor_metrics
+from app.modules.questions.cardinality import cardinality_store, expected_draws, is_saturated
+from app.modules.questions.dedup import insert_generated_questions, load_known_hashes
+from app.modules.questions.template_index import template_index
 from app.modules.auth.models import User
 
+# Samples per sandbox call when a generation job is split into seed-range shards
+SHARD_BATCH_SIZE = 50
+
+# Generation job sandbox calls in flight, across all jobs in this process, never
+# exceed the sandbox workers; extra calls queue here instead of timing out on
+# SANDBOX_ACQUIRE_TIMEOUT
+_shard_slots = threading.BoundedSemaphore(sandbox_pool.size) if sandbox_pool.size > 0 else None
+
+# Runs the shards of generation jobs
+_shard_pool = ThreadPoolExecutor(
+    max_workers=max(1, sandbox_pool.size),
+    thread_name_prefix="generation-shard"
+)
+
 
 class QuestionTemplateService:
     """Service for managing question templates"""
@@ -61,6 +89,7 @@ class QuestionTemplateService:
         db.add(template)
         db.commit()
         db.refresh(template)
+        template_index.invalidate()
         
         return template
     
@@ -153,12 +182,21 @@ class QuestionTemplateService:
             if not is_valid:
                 raise ValueError(f"Invalid logical_answer code: {error}")
         
+        # Drop compiled code for scripts that are being replaced
+        changes = update_data.dict(exclude_unset=True)
+        executor.invalidate_compiled(*[
+            getattr(template, field) for field in ('dynamic_question', 'logical_answer')
+            if field in changes and changes[field] != getattr(template, field)
+        ])
+        
         # Update fields
-        for field, value in update_data.dict(exclude_unset=True).items():
+        for field, value in changes.items():
             setattr(template, field, value)
         
         db.commit()
         db.refresh(template)
+        template_index.invalidate()
+        QuestionTemplateService.invalidate_practice_template(template_id)
         
         return template
     
@@ -172,6 +210,9 @@ class QuestionTemplateService:
         
         template.status = "inactive"
         db.commit()
+        practice_pool.discard("v1", template_id)
+        template_index.invalidate()
+        QuestionTemplateService.invalidate_practice_template(template_id)
         
         return True
     
@@ -186,34 +227,91 @@ class QuestionTemplateService:
         if not template:
             raise ValueError("Template not found")
         
-        # Generate sample questions
+        samples = QuestionTemplateService.generate_samples(template_id, template.dynamic_question, count)
+        preview_data, preview_html = QuestionTemplateService.build_preview(template)
+        
+        # Update template
+        template.preview_data = preview_data
+        template.preview_html = preview_html
+        db.commit()
+        
+        return {
+            "preview_samples": samples,
+            "preview_data": preview_data,
+            "preview_html": preview_html
+        }
+    
+    @staticmethod
+    def generate_samples(
+        template_id: int,
+        code: str,
+        count: int,
+        exclude: Optional[Set[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate `count` samples, one sandbox call per round (ValueError if any fails).
+        
+        With exclude (result_identity values already being served), results
+        repeating those or each other are skipped and redrawn, for up to
+        count * 3 draws or until the template has nothing new left; the
+        identities of returned samples are added to exclude.
+        """
         samples = []
-        for _ in range(count):
+        max_attempts = count * 3 if exclude is not None else count
+        attempts = 0
+        checked = 0
+        distinct = set()
+        while len(samples) < count and attempts < max_attempts:
+            batch_size = min(count - len(samples), max_attempts - attempts)
+            attempts += batch_size
             try:
-                result = executor.execute_generator(template.dynamic_question)
-                
-                sample = {
-                    "question_html": result['question'],
-                    "answer_value": str(result['answer']),
-                    "variables_used": result.get('variables', {})
-                }
-                
-                # Add MCQ-specific fields
-                if 'options' in result:
-                    sample['options'] = result['options']
-                    sample['question_type'] = result.get('type', 'mcq')
-                else:
-                    sample['question_type'] = result.get('type', 'user_input')
-                
-                if 'topic' in result:
-                    sample['topic'] = result['topic']
-                
-                samples.append(sample)
-                
+                with executor_metrics.track("v1", template_id) as trace:
+                    entries = executor.execute_generator_batch(code, batch_size, trace=trace)
             except (CodeExecutionError, CodeTimeoutError) as e:
                 raise ValueError(f"Failed to generate preview: {str(e)}")
+            
+            for entry in entries:
+                if entry['error']:
+                    raise ValueError(f"Failed to generate preview: {entry['error']}")
+                result = entry['result']
+                if exclude is not None:
+                    identity = result_identity(result)
+                    checked += 1
+                    distinct.add(identity)
+                    if identity in exclude:
+                        continue
+                    exclude.add(identity)
+                samples.append(QuestionTemplateService.format_sample(result))
+            
+            if exclude is not None and len(samples) < count and is_saturated(checked, len(distinct)):
+                break
+        return samples
+    
+    @staticmethod
+    def format_sample(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a generator result into a preview/practice sample"""
+        sample = {
+            "question_html": result['question'],
+            "answer_value": str(result['answer']),
+            "variables_used": result.get('variables', {}),
+            "seed": result['seed']
+        }
+        
+        # Add MCQ-specific fields
+        if 'options' in result:
+            sample['options'] = result['options']
+            sample['question_type'] = result.get('type', 'mcq')
+        else:
+            sample['question_type'] = result.get('type', 'user_input')
+        
+        if 'topic' in result:
+            sample['topic'] = result['topic']
         
-        # Build preview data
+        return sample
+    
+    @staticmethod
+    def build_preview(template: QuestionTemplate):
+        """Build (preview_data, preview_html) for a template"""
         preview_data = {
             "module": template.module,
             "category": template.category,
@@ -234,16 +332,71 @@ class QuestionTemplateService:
         </div>
         """
         
-        # Update template
-        template.preview_data = preview_data
-        template.preview_html = preview_html
-        db.commit()
+        return preview_data, preview_html
+    
+    @staticmethod
+    @cached(key_prefix="questions", key=lambda db, template_id: template_id)
+    def practice_template(db: Session, template_id: int) -> Dict[str, Any]:
+        """
+        Generator code and preview metadata of a template, cached for CACHE_TTL.
+        Dropped by invalidate_practice_template when the template is updated or
+        deleted in this process.
+        """
+        template = db.query(
+            QuestionTemplate.dynamic_question,
+            QuestionTemplate.module,
+            QuestionTemplate.category,
+            QuestionTemplate.topic,
+            QuestionTemplate.subtopic,
+            QuestionTemplate.format,
+            QuestionTemplate.difficulty,
+            QuestionTemplate.type
+        ).filter(QuestionTemplate.template_id == template_id).first()
+        if not template:
+            raise ValueError("Template not found") # Not cached, so new templates show up at once
         
+        preview_data, preview_html = QuestionTemplateService.build_preview(template)
         return {
-            "preview_samples": samples,
+            "dynamic_question": template.dynamic_question,
             "preview_data": preview_data,
             "preview_html": preview_html
         }
+    
+    @staticmethod
+    def invalidate_practice_template(template_id: int):
+        invalidate_cache(f"questions:practice_template:{template_id}")
+    
+    @staticmethod
+    def practice_questions(db: Session, template_id: int, count: int = 10) -> Dict[str, Any]:
+        """
+        Serve practice samples for a template. Read-only: nothing is written,
+        so student traffic never takes row locks on the template.
+        Pops pre-generated instances from the practice pool and only generates
+        live for whatever the pool could not cover.
+        """
+        template = QuestionTemplateService.practice_template(db, template_id)
+        
+        scripts = [template['dynamic_question']]
+        # Pooled instances can repeat a question; live generation then tops up
+        # the shortfall with questions not served yet
+        samples = []
+        served = set()
+        for result in practice_pool.take("v1", template_id, scripts, count):
+            identity = result_identity(result)
+            if identity not in served:
+                served.add(identity)
+                samples.append(QuestionTemplateService.format_sample(result))
+        
+        if len(samples) < count:
+            samples.extend(QuestionTemplateService.generate_samples(
+                template_id, template['dynamic_question'], count - len(samples), exclude=served
+            ))
+        
+        return {
+            "preview_samples": samples,
+            "preview_data": template['preview_data'],
+            "preview_html": template['preview_html']
+        }
 
 
 class QuestionGenerationService:
@@ -256,56 +409,86 @@ class QuestionGenerationService:
         question_code: str,
         answer_code: str,
         solution_code: str,
-        count: int = 3
+        count: int = 3,
+        include_solution: bool = True,
+        template_id: Optional[int] = None,
+        exclude: Optional[Set[str]] = None
     ) -> Dict[str, Any]:
         """
         Generate preview samples for v2 template (sequential python scripts).
         Generates extra samples to ensure uniqueness.
+        
+        With include_solution=False the solution script is not run; the
+        solution can be rendered later from the sample's seed (see render_solution).
+        template_id attributes executor metrics to a saved template (unsaved previews are "adhoc").
+        exclude holds result_identity values of samples already being served
+        with these; matching results are skipped.
         """
+        exclude = exclude or set()
+        metrics_source = "v2" if template_id is not None else "adhoc"
+        scripts = [question_code, answer_code]
+        # Question identity only depends on the question and answer scripts
+        cardinality_scripts = list(scripts)
+        if include_solution:
+            scripts.append(solution_code)
+        
         samples = []
         seen_hashes = set()
+        requested = count
+        exhausted = False
+        
+        # Never ask a saturated template for more distinct questions than it has
+        if template_id is not None:
+            known = cardinality_store.get(db, "v2", template_id, cardinality_scripts)
+            if known and known[1] and known[0] < count:
+                count = known[0]
+                exhausted = True
         
         # Generate more than requested to account for duplicates
         # Clamp max attempts to prevent infinite loops
         max_attempts = count * 3
         attempts = 0
+        checked = 0
+        duplicates = 0
         
         while len(samples) < count and attempts < max_attempts:
-            attempts += 1
+            # One sandbox round trip per round; usually a single round suffices
+            batch_size = min(count - len(samples), max_attempts - attempts)
+            attempts += batch_size
             try:
-                # Execute sequentially
-                result = executor.execute_sequential([question_code, answer_code, solution_code])
-                
-                # Format sample
-                sample = {
-                    "question_html": str(result.get('question', '')),
-                    "answer_value": str(result.get('answer', '')),
-                    "solution_html": str(result.get('solution', '')),
-                    "variables_used": result.get('variables', {})
-                }
-                
-                # Add optional fields
-                if 'options' in result:
-                    sample['options'] = result['options']
-                    sample['question_type'] = result.get('type', 'mcq')
-                else:
-                    sample['question_type'] = result.get('type', 'user_input')
-                
-                # Create a simple hash for deduplication based on question text and answer
-                # Include options for MCQ to be precise
-                raw_identity = f"{sample['question_html']}_{sample['answer_value']}"
-                if 'options' in sample:
-                    raw_identity += f"_{json.dumps(sample['options'], sort_keys=True)}"
-                    
-                sample_hash = hashlib.sha256(raw_identity.encode()).hexdigest()
-                
-                if sample_hash not in seen_hashes:
-                    seen_hashes.add(sample_hash)
-                    samples.append(sample)
-                
+                with executor_metrics.track(metrics_source, template_id) as trace:
+                    entries = executor.execute_sequential_batch(scripts, batch_size, trace=trace)
             except (CodeExecutionError, CodeTimeoutError) as e:
                 # Swallow error during attempt phase unless we have 0 samples at end
+                # (still counted by executor_metrics)
                 continue
+            
+            for entry in entries:
+                if entry['error']:
+                    continue
+                result = entry['result']
+                
+                # Deduplicate on question text, answer and (for MCQ) options
+                sample_hash = result_identity(result)
+                checked += 1
+                
+                if sample_hash in seen_hashes:
+                    duplicates += 1
+                elif len(samples) < count:
+                    seen_hashes.add(sample_hash)
+                    if sample_hash in exclude:
+                        duplicates += 1
+                    else:
+                        samples.append(QuestionGenerationService.format_sample_v2(result, include_solution))
+            
+            # Stop retrying once the template has nothing new left to produce
+            if len(samples) < count and is_saturated(checked, len(seen_hashes)):
+                exhausted = True
+                break
+        
+        executor_metrics.record_duplicates(metrics_source, template_id, checked, duplicates)
+        if template_id is not None:
+            cardinality_store.observe("v2", template_id, cardinality_scripts, checked, len(seen_hashes))
         
         if not samples and attempts > 0:
              # If we failed completely, try one last time to raise the error
@@ -314,8 +497,124 @@ class QuestionGenerationService:
         
         return {
             "preview_samples": samples,
+            "pool_exhausted": exhausted and len(samples) < requested
             # No persistent storage updates for this ephemeral preview
         }
+    
+    @staticmethod
+    def format_sample_v2(result: Dict[str, Any], include_solution: bool = True) -> Dict[str, Any]:
+        """Turn a v2 sequential result into a preview/practice sample"""
+        sample = {
+            "question_html": str(result.get('question', '')),
+            "answer_value": str(result.get('answer', '')),
+            "variables_used": result.get('variables', {}),
+            "seed": result['seed']
+        }
+        if include_solution:
+            sample['solution_html'] = str(result.get('solution', ''))
+        
+        # Add optional fields
+        if 'options' in result:
+            sample['options'] = result['options']
+            sample['question_type'] = result.get('type', 'mcq')
+        else:
+            sample['question_type'] = result.get('type', 'user_input')
+        
+        return sample
+    
+    @staticmethod
+    def practice_questions_v2(db: Session, template: QuestionGeneration, count: int = 5) -> Dict[str, Any]:
+        """
+        Serve practice samples for a v2 template.
+        Pops pre-generated instances from the practice pool and only runs the
+        scripts live for whatever the pool could not cover.
+        
+        Solutions are not generated here. Each sample carries a solution_handle
+        (template id, version, seed) for the on-demand solution endpoint.
+        """
+        scripts = [template.question_template, template.answer_template]
+        
+        # A saturated template cannot supply more distinct questions than its cardinality
+        known = cardinality_store.get(db, "v2", template.template_id, scripts)
+        pool_exhausted = bool(known and known[1] and known[0] < count)
+        if pool_exhausted:
+            count = known[0]
+        
+        # Pooled instances can repeat a question; live generation then tops up
+        # the shortfall with questions not served yet
+        samples = []
+        served = set()
+        for result in practice_pool.take("v2", template.template_id, scripts, count):
+            identity = result_identity(result)
+            if identity not in served:
+                served.add(identity)
+                samples.append(QuestionGenerationService.format_sample_v2(result, include_solution=False))
+        
+        if len(samples) < count:
+            live = QuestionGenerationService.preview_generation_v2(
+                db=db,
+                question_code=template.question_template,
+                answer_code=template.answer_template,
+                solution_code=template.solution_template,
+                count=count - len(samples),
+                include_solution=False,
+                template_id=template.template_id,
+                exclude=served
+            )
+            samples.extend(live['preview_samples'])
+            pool_exhausted = pool_exhausted or live['pool_exhausted']
+        
+        version = rendering.template_version_hash(
+            "v2", [template.question_template, template.answer_template, template.solution_template]
+        )
+        for sample in samples:
+            sample['solution_handle'] = {
+                "template_id": template.template_id,
+                "version": version,
+                "seed": sample['seed']
+            }
+        
+        return {"preview_samples": samples, "pool_exhausted": pool_exhausted}
+    
+    @staticmethod
+    def render_solution(db: Session, template_id: int, version: str, seed: int) -> Dict[str, Any]:
+        """
+        Render the solution for a practice sample from its solution handle.
+        Replays question, answer and solution scripts under the sample's seed,
+        so the solution matches the question the student saw. Results are cached.
+        
+        Only versions of this v2 template (with its solution script) are
+        rendered, whatever else is registered.
+        
+        Raises:
+            ValueError: If the template is missing or the version is unknown
+        """
+        template = db.query(QuestionGeneration).filter(QuestionGeneration.template_id == template_id).first()
+        if not template:
+            raise ValueError("Template not found")
+        
+        scripts = [template.question_template, template.answer_template, template.solution_template]
+        if rendering.template_version_hash("v2", scripts) == version:
+            rendering.cache_version(version, "v2", template_id, scripts)
+        else:
+            stored = rendering.load_version(db, version)
+            if not stored or stored[0] != "v2" or stored[1] != template_id or len(stored[2]) != 3:
+                # Template was edited since the sample was served and the old version was never
+                # stored, or the handle points at another template's (or an assessment) version
+                raise ValueError("Template version not found; the template has changed since this question was served")
+        
+        try:
+            result = rendering.render(db, version, seed)
+        except CodeTimeoutError as e:
+            raise ValueError(f"Solution generation timed out: {str(e)}")
+        except CodeExecutionError as e:
+            raise ValueError(f"Failed to generate solution: {str(e)}")
+        
+        return {
+            "template_id": template_id,
+            "seed": seed,
+            "solution_html": str(result.get('solution', ''))
+        }
 
     @staticmethod
     def create_generation_job(
@@ -355,52 +654,122 @@ class QuestionGenerationService:
         """
         Process a generation job (generate all questions).
         This should be called by a background worker.
+        
+        Questions are committed in checkpoints (every GENERATION_INSERT_CHUNK_SIZE
+        questions or GENERATION_CHECKPOINT_SECONDS), together with generated_count
+        and the next seed index, so progress is visible while the job runs and a
+        failed or interrupted job resumes from its last checkpoint. A cancel
+        request is honoured at the next checkpoint.
+        
+        Samples are drawn in waves of up to GENERATION_JOB_SHARDS seed ranges,
+        run concurrently on separate sandbox workers. Each wave is merged in
+        seed order through the job's single dedup set, so the output matches
+        an unsharded run with the same seed and checkpoints stay contiguous.
         """
         
         job = db.query(QuestionGenerationJob).filter(QuestionGenerationJob.job_id == job_id).first()
         if not job:
             raise ValueError("Job not found")
+        if job.status in ("completed", "cancelled"):
+            return
         
         template = db.query(QuestionTemplate).filter(QuestionTemplate.template_id == job.template_id).first()
         if not template:
             raise ValueError("Template not found")
         
+        # Every job runs from an explicit base seed so its output can be reproduced.
+        # Question i is generated with derive_seed(base_seed, i).
+        if not job.generation_seed:
+            job.generation_seed = str(new_seed())
+        base_seed = normalize_seed(job.generation_seed)
+        
         # Update job status
         job.status = "processing"
         db.commit()
         
-        generated_count = 0
+        template_version = None
+        if rendering.compact_storage_enabled():
+            template_version = rendering.register_template_version(
+                db, "v1", template.template_id, [template.dynamic_question]
+            )
+        
+        # Resume from the last checkpoint (0 for a new job)
+        generated_count = job.generated_count or 0
+        attempts = job.next_sample_index or 0
+        seen_hashes = set()
+        samples_checked = 0
+        exhausted = False
+        cancelled = False
+        
+        # Each question gets up to 5 attempts, spent in batched sandbox calls
+        max_attempts = job.requested_count * 5
+        target = job.requested_count
+        
+        # Size the job from the template's known output cardinality, if any
+        scripts = [template.dynamic_question]
+        known = cardinality_store.get(db, "v1", template.template_id, scripts)
+        if known and known[0]:
+            cardinality, saturated = known
+            stored = db.query(func.count(func.distinct(GeneratedQuestion.hash_signature))).filter(
+                GeneratedQuestion.template_id == template.template_id
+            ).scalar() or 0
+            if saturated:
+                target = min(target, generated_count + max(0, cardinality - stored))
+                exhausted = target < job.requested_count
+            # Draws needed to find the missing questions, with slack for estimation error
+            max_attempts = min(
+                max_attempts,
+                attempts + 2 * expected_draws(cardinality, min(stored, cardinality - 1), target - generated_count) + 10
+            )
+        
+        # Stored questions are checked in memory; accepted ones are bulk inserted
+        known_hashes = load_known_hashes(db, template.template_id, expected_new=target)
+        pending_rows = []
+        
+        def write_pending() -> int:
+            """Insert accepted rows; returns how many were already stored by a concurrent job"""
+            if not pending_rows:
+                return 0
+            lost = len(pending_rows) - len(insert_generated_questions(db, pending_rows))
+            pending_rows.clear()
+            return lost
+        
+        def checkpoint():
+            """Commit accepted questions together with the progress needed to resume"""
+            nonlocal generated_count
+            generated_count -= write_pending()
+            job.generated_count = generated_count
+            job.next_sample_index = attempts
+            db.commit()
+        
+        last_checkpoint = time.monotonic()
+        
+        # Large jobs run several seed ranges at once, one sandbox worker each
+        shards = max(1, min(settings.GENERATION_JOB_SHARDS, sandbox_pool.size))
         
         try:
-            for _ in range(job.requested_count):
-                max_retries = 5
-                retry_count = 0
-                question = None
+            while generated_count < target and attempts < max_attempts:
+                wave_size = min(target - generated_count, max_attempts - attempts, shards * SHARD_BATCH_SIZE)
+                ranges = [
+                    (start, min(SHARD_BATCH_SIZE, attempts + wave_size - start))
+                    for start in range(attempts, attempts + wave_size, SHARD_BATCH_SIZE)
+                ]
+                entries = QuestionGenerationService.run_seed_ranges(
+                    template.template_id, template.dynamic_question, base_seed, ranges
+                )
+                attempts += wave_size
+                checked = 0
+                duplicates = 0
                 
-                while retry_count < max_retries:
-                    # Execute generator
-                    result = executor.execute_generator(template.dynamic_question)
+                for entry in entries:
+                    if entry['error']:
+                        raise CodeExecutionError(entry['error'])
+                    result = entry['result']
                     
                     # Extract question data based on type
                     question_text = result.get('question', '')
                     answer_value = str(result.get('answer', ''))
-                    
-                    # Build comprehensive variables_used object
-                    variables_used = {
-                        'question_type': result.get('type', template.type),  # 'mcq', 'userInput', etc.
-                        'original_variables': result.get('variables', {}),  # Original generation variables
-                    }
-                    
-                    # For MCQ questions, store options
-                    if 'options' in result:
-                        variables_used['options'] = result['options']
-                        variables_used['has_options'] = True
-                    else:
-                        variables_used['has_options'] = False
-                    
-                    # Store topic if provided
-                    if 'topic' in result:
-                        variables_used['topic'] = result['topic']
+                    variables_used = QuestionGenerationService.build_variables_used(result, template.type)
                     
                     # Create hash signature for duplicate detection
                     # Include options in hash for MCQ to detect true duplicates
@@ -410,46 +779,162 @@ class QuestionGenerationService:
                         hash_input = f"{question_text}{answer_value}"
                     hash_signature = hashlib.sha256(hash_input.encode()).hexdigest()
                     
-                    # Check for duplicates
-                    existing = db.query(GeneratedQuestion).filter(
-                        GeneratedQuestion.template_id == template.template_id,
-                        GeneratedQuestion.hash_signature == hash_signature
-                    ).first()
+                    # Check for duplicates (within this job and already stored)
+                    if generated_count >= target:
+                        continue
+                    checked += 1
+                    if hash_signature in seen_hashes:
+                        duplicates += 1
+                        continue
+                    seen_hashes.add(hash_signature)
                     
-                    if not existing:
-                        # Create generated question
-                        question = GeneratedQuestion(
-                            job_id=job.job_id,
-                            template_id=template.template_id,
-                            question_html=question_text,
-                            answer_value=answer_value,
-                            variables_used=variables_used,
-                            difficulty_snapshot=template.difficulty,
-                            hash_signature=hash_signature
-                        )
+                    if hash_signature in known_hashes:
+                        duplicates += 1
+                    else:
+                        pending_rows.append({
+                            'job_id': job.job_id,
+                            'template_id': template.template_id,
+                            # Compact storage: text is re-rendered from (version, seed) on read
+                            'question_html': None if template_version else question_text,
+                            'answer_value': answer_value,
+                            'variables_used': None if template_version else variables_used,
+                            'difficulty_snapshot': template.difficulty,
+                            'hash_signature': hash_signature,
+                            'template_version': template_version,
+                            'generation_seed': result['seed']
+                        })
+                        generated_count += 1
+                
+                executor_metrics.record_duplicates("v1", template.template_id, checked, duplicates)
+                samples_checked += checked
+                
+                if (len(pending_rows) >= settings.GENERATION_INSERT_CHUNK_SIZE
+                        or time.monotonic() - last_checkpoint >= settings.GENERATION_CHECKPOINT_SECONDS):
+                    checkpoint()
+                    last_checkpoint = time.monotonic()
+                    # Reloaded after the commit, so this sees a cancel request made meanwhile
+                    if job.cancel_requested:
+                        cancelled = True
                         break
-                    
-                    # Duplicate found, retry
-                    retry_count += 1
                 
-                if question:
-                    db.add(question)
-                    generated_count += 1
+                # Every output the template can make has been seen; more attempts only find duplicates
+                if generated_count < target and is_saturated(samples_checked, len(seen_hashes)):
+                    exhausted = True
+                    break
+            
+            generated_count -= write_pending()
+            job.next_sample_index = attempts
+            
+            cardinality_store.record(db, "v1", template.template_id, scripts, samples_checked, len(seen_hashes))
             
             # Update job
             job.status = "completed"
+            if cancelled:
+                job.status = "cancelled"
+                job.status_detail = f"cancelled after {generated_count} of {job.requested_count} questions"
+            elif exhausted and generated_count < job.requested_count:
+                cardinality = cardinality_store.estimate(db, "v1", template.template_id, scripts)
+                job.status_detail = (
+                    f"pool exhausted: template produces about {cardinality} distinct questions; "
+                    f"generated {generated_count} of {job.requested_count}"
+                )
             job.generated_count = generated_count
             job.completed_at = datetime.utcnow()
             
         except Exception as e:
             import traceback
             traceback.print_exc()
+            # Questions up to the last checkpoint are kept; a retry resumes from there
+            db.rollback()
             job.status = "failed"
+            job.status_detail = str(e)
             db.commit()
             raise ValueError(f"Job failed: {str(e)}")
         
         db.commit()
     
+    @staticmethod
+    def run_seed_ranges(
+        template_id: int,
+        code: str,
+        base_seed: int,
+        ranges: List[Tuple[int, int]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate samples for (start_index, count) seed ranges, concurrently when
+        there are several. Entries come back in seed order, exactly as one
+        sequential run over the same indices would produce them. If a range
+        fails, ranges that have not started yet are cancelled.
+        """
+        def run(start_index: int, count: int) -> List[Dict[str, Any]]:
+            with _shard_slots or nullcontext():
+                with executor_metrics.track("v1", template_id) as trace:
+                    return executor.execute_generator_batch(code, count, seed=base_seed, start_index=start_index, trace=trace)
+        
+        if len(ranges) == 1:
+            return run(*ranges[0])
+        futures = [_shard_pool.submit(run, start_index, count) for start_index, count in ranges]
+        try:
+            return [entry for future in futures for entry in future.result()]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    
+    @staticmethod
+    def build_variables_used(result: Dict[str, Any], default_type: str) -> Dict[str, Any]:
+        """Build the variables_used payload stored with a generated question"""
+        variables_used = {
+            'question_type': result.get('type', default_type),  # 'mcq', 'userInput', etc.
+            'original_variables': result.get('variables', {}),  # Original generation variables
+            'seed': result.get('seed'),  # Regenerates this exact question
+        }
+        
+        # For MCQ questions, store options
+        if 'options' in result:
+            variables_used['options'] = result['options']
+            variables_used['has_options'] = True
+        else:
+            variables_used['has_options'] = False
+        
+        # Store topic if provided
+        if 'topic' in result:
+            variables_used['topic'] = result['topic']
+        
+        return variables_used
+    
+    @staticmethod
+    def hydrate_generated_questions(db: Session, questions: List[GeneratedQuestion]):
+        """Re-render text for generated questions stored in compact form"""
+        rendering.hydrate(db, questions, 'question_html', {
+            'question_html': lambda q, result: result.get('question', ''),
+            'variables_used': lambda q, result: QuestionGenerationService.build_variables_used(
+                result, q.template.type if q.template else None
+            ),
+        })
+    
+    @staticmethod
+    def cancel_job(db: Session, job_id: int) -> Optional[QuestionGenerationJob]:
+        """
+        Cancel a job: pending (or retrying) jobs at once, running ones at their next checkpoint.
+        Finished jobs are returned unchanged.
+        """
+        job = db.query(QuestionGenerationJob).filter(
+            QuestionGenerationJob.job_id == job_id
+        ).with_for_update().first()
+        if not job:
+            return None
+        
+        if job.status in ("pending", "failed"):
+            job.status = "cancelled"
+            job.status_detail = f"cancelled after {job.generated_count or 0} of {job.requested_count} questions"
+            job.completed_at = datetime.utcnow()
+        if job.status != "completed":
+            job.cancel_requested = True
+        db.commit()
+        db.refresh(job)
+        return job
+    
     @staticmethod
     def get_job(db: Session, job_id: int) -> Optional[QuestionGenerationJob]:
         """Get a generation job by ID"""
@@ -487,6 +972,7 @@ class QuestionGenerationService:
         else:
             questions = query.order_by(GeneratedQuestion.created_at.desc()).offset(offset).limit(limit).all()
         
+        QuestionGenerationService.hydrate_generated_questions(db, questions)
         return questions, total
     
     @staticmethod
@@ -510,9 +996,12 @@ class QuestionGenerationService:
     @staticmethod
     def get_generated_question(db: Session, question_id: int) -> Optional[GeneratedQuestion]:
         """Get a single generated question by ID"""
-        return db.query(GeneratedQuestion).filter(
+        question = db.query(GeneratedQuestion).filter(
             GeneratedQuestion.generated_question_id == question_id
         ).first()
+        if question:
+            QuestionGenerationService.hydrate_generated_questions(db, [question])
+        return question
 
 
 class SyllabusService:
@@ -0,0 +1,158 @@
+"""
+In-memory index of template metadata for assessment paper selection.
+
+Holds only ids and the columns selection filters on, keyed by
+(grade, normalized difficulty, normalized type, topic), so picking a paper
+needs no query over the large code columns. Code text is fetched afterwards
+for the chosen templates only (see attach_template_code).
+
+Built at startup and rebuilt lazily after template writes in this process;
+also rebuilt after TEMPLATE_INDEX_TTL seconds so writes made by other
+workers show up.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.modules.questions.models import QuestionGeneration, QuestionTemplate
+
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+
+
+def normalize_difficulty(value: Optional[str]) -> str:
+    """'Easy', 'very easy', 'EASY ' -> 'easy'; unknown values are lowercased"""
+    value = (value or "").strip().lower()
+    for level in DIFFICULTY_LEVELS:
+        if level in value:
+            return level
+    return value
+
+
+def normalize_type(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+class TemplateIndex:
+    """(grade, difficulty, type, topic) -> template metadata, for v2 and active v1 templates"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        # grade -> (difficulty, type, topic) -> entries
+        self._entries: Dict[int, Dict[Tuple[str, str, str], List[Dict[str, Any]]]] = {}
+        self._built_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def build(self, db: Session):
+        entries: Dict[int, Dict[Tuple[str, str, str], List[Dict[str, Any]]]] = {}
+
+        def add(grade, item):
+            key = (normalize_difficulty(item['difficulty']), normalize_type(item['type']), item['topic'])
+            entries.setdefault(grade, {}).setdefault(key, []).append(item)
+
+        v2_rows = db.query(
+            QuestionGeneration.template_id,
+            QuestionGeneration.grade,
+            QuestionGeneration.skill_name,
+            QuestionGeneration.difficulty,
+            QuestionGeneration.type
+        ).all()
+        for template_id, grade, skill_name, difficulty, q_type in v2_rows:
+            add(grade, {"id": template_id, "source": "v2", "topic": skill_name, "difficulty": difficulty, "type": q_type})
+
+        v1_rows = db.query(
+            QuestionTemplate.template_id,
+            QuestionTemplate.grade_level,
+            QuestionTemplate.topic,
+            QuestionTemplate.difficulty,
+            QuestionTemplate.type
+        ).filter(QuestionTemplate.status == "active").all()
+        for template_id, grade_levels, topic, difficulty, q_type in v1_rows:
+            # A v1 template can belong to several grades
+            for grade in grade_levels or []:
+                add(grade, {"id": template_id, "source": "v1", "topic": topic, "difficulty": difficulty, "type": q_type})
+
+        with self._lock:
+            self._entries = entries
+            self._built_at = time.monotonic()
+            self._stale = False
+        print(f"DEBUG: Template index built with {len(v2_rows)} v2 and {len(v1_rows)} v1 templates")
+
+    def invalidate(self):
+        """Mark the index stale after a template write; the next lookup rebuilds it"""
+        with self._lock:
+            self._stale = True
+
+    def _ensure(self, db: Session):
+        with self._lock:
+            fresh = not self._stale and time.monotonic() - self._built_at < self.ttl
+        if not fresh:
+            self.build(db)
+
+    def select(
+        self,
+        db: Session,
+        grade: int,
+        difficulty: str,
+        mcq: Optional[bool] = None,
+        source: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Metadata of matching templates (copies, safe to annotate).
+
+        Args:
+            difficulty: Normalized difficulty ('easy', 'medium', 'hard')
+            mcq: True for MCQ templates only, False for everything but MCQ, None for both
+            source: 'v1' or 'v2' to restrict to one template family
+        """
+        self._ensure(db)
+        with self._lock:
+            entries = self._entries.get(grade, {})
+        return [
+            dict(item)
+            for (d, t, _), items in entries.items()
+            if d == difficulty and (mcq is None or (t == 'mcq') == mcq)
+            for item in items
+            if source is None or item['source'] == source
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "grades": len(self._entries),
+                "keys": sum(len(keys) for keys in self._entries.values()),
+                "entries": sum(len(items) for keys in self._entries.values() for items in keys.values()),
+                "stale": self._stale,
+                "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at else None
+            }
+
+
+def attach_template_code(db: Session, items: List[Dict[str, Any]]):
+    """Fetch code for selected index entries, in place (one query per template family)"""
+    v2_ids = [item['id'] for item in items if item['source'] == 'v2' and 'code' not in item]
+    v1_ids = [item['id'] for item in items if item['source'] == 'v1' and 'code' not in item]
+
+    code = {}
+    if v2_ids:
+        for template_id, question_template, answer_template in db.query(
+            QuestionGeneration.template_id,
+            QuestionGeneration.question_template,
+            QuestionGeneration.answer_template
+        ).filter(QuestionGeneration.template_id.in_(v2_ids)).all():
+            code[('v2', template_id)] = {"code": question_template, "answer_code": answer_template}
+    if v1_ids:
+        for template_id, dynamic_question in db.query(
+            QuestionTemplate.template_id,
+            QuestionTemplate.dynamic_question
+        ).filter(QuestionTemplate.template_id.in_(v1_ids)).all():
+            code[('v1', template_id)] = {"code": dynamic_question}
+
+    for item in items:
+        item.update(code.get((item['source'], item['id']), {}))
+
+
+template_index = TemplateIndex(ttl=settings.TEMPLATE_INDEX_TTL)
@@ -0,0 +1,255 @@
+"""
+Background worker for question generation jobs.
+
+question_generation_jobs doubles as the queue. A worker claims pending jobs
+with SELECT ... FOR UPDATE SKIP LOCKED (so any number of workers can poll the
+same table without handing a job out twice) and runs up to
+GENERATION_WORKER_CONCURRENCY of them at once; template code runs on the
+sandbox pool. While a job runs, its heartbeat_at is refreshed every
+GENERATION_WORKER_HEARTBEAT seconds.
+
+- A failed job is retried with a growing delay until it has been attempted
+  GENERATION_JOB_MAX_ATTEMPTS times; then it stays failed
+- A processing job whose heartbeat is older than GENERATION_JOB_STALE_SECONDS
+  belonged to a worker that died; it is put back in the queue (or failed
+  once out of attempts)
+
+Run with `python -m app.worker`.
+"""
+
+import os
+import socket
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.questions.models import QuestionGenerationJob
+
+
+class GenerationWorker:
+    """Claims and runs generation jobs until stopped"""
+
+    def __init__(
+        self,
+        concurrency: int,
+        poll_interval: float,
+        heartbeat_interval: float,
+        stale_seconds: int,
+        max_attempts: int,
+        retry_delay: float
+    ):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Dict[int, Optional[Future]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._heartbeat_stop = threading.Event()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self.completed = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def claim(self, db: Session) -> Optional[int]:
+        """Take the oldest runnable pending job (commits); None if there is none"""
+        now = datetime.utcnow()
+        job = db.query(QuestionGenerationJob).filter(
+            QuestionGenerationJob.status == "pending",
+            or_(QuestionGenerationJob.run_after.is_(None), QuestionGenerationJob.run_after <= now)
+        ).order_by(QuestionGenerationJob.created_at).limit(1).with_for_update(skip_locked=True).first()
+        if job is None:
+            db.rollback()
+            return None
+
+        job.status = "processing"
+        job.worker_id = self.worker_id
+        job.heartbeat_at = now
+        job.attempts = (job.attempts or 0) + 1
+        job.run_after = None
+        db.commit()
+        return job.job_id
+
+    def recover_stale(self, db: Session) -> int:
+        """Requeue (or fail) processing jobs whose worker stopped heartbeating; returns how many"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        stale = db.query(QuestionGenerationJob).filter(
+            QuestionGenerationJob.status == "processing",
+            QuestionGenerationJob.worker_id.isnot(None),
+            QuestionGenerationJob.heartbeat_at < cutoff
+        ).with_for_update(skip_locked=True).all()
+
+        for job in stale:
+            print(f"WARNING: Generation job {job.job_id} lost its worker {job.worker_id}")
+            self._retry_or_fail(job, f"worker {job.worker_id} stopped responding")
+        db.commit()
+        return len(stale)
+
+    def _retry_or_fail(self, job: QuestionGenerationJob, error: str):
+        job.worker_id = None
+        job.status_detail = error
+        if job.cancel_requested:
+            job.status = "cancelled"
+            job.completed_at = datetime.utcnow()
+        elif (job.attempts or 0) < self.max_attempts:
+            job.status = "pending"
+            job.run_after = datetime.utcnow() + timedelta(seconds=self.retry_delay * (job.attempts or 1))
+        else:
+            job.status = "failed"
+            job.completed_at = datetime.utcnow()
+
+    # ------------------------------------------------------------------
+    # Running jobs
+    # ------------------------------------------------------------------
+
+    def run_job(self, job_id: int):
+        # Imported here: the service pulls in the sandbox executor
+        from app.modules.questions.service import QuestionGenerationService
+
+        db = SessionLocal()
+        try:
+            try:
+                QuestionGenerationService.process_generation_job(db=db, job_id=job_id)
+                with self._lock:
+                    self.completed += 1
+                error = None
+            except Exception as e:
+                db.rollback()
+                error = str(e)
+
+            job = db.query(QuestionGenerationJob).filter(QuestionGenerationJob.job_id == job_id).first()
+            if job is None:
+                return
+            if error is not None:
+                print(f"WARNING: Generation job {job_id} attempt {job.attempts} failed: {error}")
+                self._retry_or_fail(job, error)
+                if job.status == "failed":
+                    with self._lock:
+                        self.failed += 1
+            else:
+                job.worker_id = None
+            job.heartbeat_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # Heartbeats stop with the job, so recover_stale picks it up
+            print(f"WARNING: Could not record generation job {job_id} outcome: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._running.pop(job_id, None)
+            self._wake.set()
+
+    def _heartbeat(self):
+        # Keeps beating while running jobs drain after stop()
+        while not self._heartbeat_stop.wait(self.heartbeat_interval):
+            with self._lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            db = SessionLocal()
+            try:
+                db.query(QuestionGenerationJob).filter(
+                    QuestionGenerationJob.job_id.in_(job_ids),
+                    QuestionGenerationJob.worker_id == self.worker_id
+                ).update({QuestionGenerationJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"WARNING: Generation worker heartbeat failed: {e}")
+            finally:
+                db.close()
+
+    def _free_slots(self) -> int:
+        with self._lock:
+            return self.concurrency - len(self._running)
+
+    def run(self):
+        """Poll for jobs until stop() is called; running jobs are finished before returning"""
+        self._stop.clear()
+        self._heartbeat_stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="generation-job")
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="generation-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+        print(f"DEBUG: Generation worker {self.worker_id} started ({self.concurrency} concurrent jobs)")
+
+        last_recovery = 0.0
+        try:
+            while not self._stop.is_set():
+                db = SessionLocal()
+                try:
+                    # Crash recovery at startup and then about once per stale window
+                    now = datetime.utcnow().timestamp()
+                    if now - last_recovery >= self.stale_seconds / 2:
+                        self.recover_stale(db)
+                        last_recovery = now
+
+                    claimed = False
+                    while self._free_slots() > 0 and not self._stop.is_set():
+                        job_id = self.claim(db)
+                        if job_id is None:
+                            break
+                        claimed = True
+                        # Hold the slot before submitting: a quick job may finish (and free it) at once
+                        with self._lock:
+                            self._running[job_id] = None
+                        future = self._pool.submit(self.run_job, job_id)
+                        with self._lock:
+                            if job_id in self._running:
+                                self._running[job_id] = future
+                except Exception as e:
+                    db.rollback()
+                    claimed = False
+                    print(f"WARNING: Generation worker poll failed: {e}")
+                finally:
+                    db.close()
+
+                # Poll again right away when a slot frees up or a job was just claimed
+                if not claimed:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            self._pool.shutdown(wait=True)
+            self._stop.set()
+            self._heartbeat_stop.set()
+            self._heartbeat_thread.join(timeout=5)
+            print(f"DEBUG: Generation worker {self.worker_id} stopped")
+
+    def stop(self):
+        """Stop claiming jobs; run() returns once the running ones are done"""
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "worker_id": self.worker_id,
+                "running": sorted(self._running),
+                "completed": self.completed,
+                "failed": self.failed
+            }
+
+
+def create_worker() -> GenerationWorker:
+    return GenerationWorker(
+        concurrency=settings.GENERATION_WORKER_CONCURRENCY,
+        poll_interval=settings.GENERATION_WORKER_POLL_INTERVAL,
+        heartbeat_interval=settings.GENERATION_WORKER_HEARTBEAT,
+        stale_seconds=settings.GENERATION_JOB_STALE_SECONDS,
+        max_attempts=settings.GENERATION_JOB_MAX_ATTEMPTS,
+        retry_delay=settings.GENERATION_JOB_RETRY_DELAY
+    )
@@ -0,0 +1,52 @@
+"""
+Question generation worker process.
+
+Runs queued question generation jobs outside the API (see
+app/modules/questions/worker.py), so bulk generation never competes with
+requests for the API's sandbox workers. Start one or more with:
+
+    python -m app.worker
+    python -m app.worker --concurrency 8
+
+SIGINT/SIGTERM stop claiming new jobs and wait for running ones to finish.
+"""
+
+import argparse
+import signal
+
+from app.modules.questions.metrics import executor_metrics
+from app.modules.questions.sandbox import sandbox_pool
+from app.modules.questions.worker import create_worker
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued question generation jobs")
+    parser.add_argument("--concurrency", type=int, default=None, help="Jobs run at once (default: GENERATION_WORKER_CONCURRENCY)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    worker = create_worker()
+    if args.concurrency:
+        worker.concurrency = args.concurrency
+
+    def handle_signal(signum, frame):
+        print(f"DEBUG: Received signal {signum}, finishing running jobs")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    if sandbox_pool.size > 0:
+        sandbox_pool.start()
+    executor_metrics.start()
+    try:
+        worker.run()
+    finally:
+        executor_metrics.shutdown()
+        sandbox_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
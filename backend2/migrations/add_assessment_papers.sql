@@ -0,0 +1,15 @@
+-- Migration: Pre-built assessment paper bank
+-- Date: 2026-10-18
+-- Description: Complete assessment papers generated ahead of time per grade.
+-- start-assessment claims one (SELECT ... FOR UPDATE SKIP LOCKED), copies its
+-- questions into the new session and deletes it.
+
+CREATE TABLE IF NOT EXISTS assessment_papers (
+    id SERIAL PRIMARY KEY,
+    grade INTEGER NOT NULL,
+    questions JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_assessment_papers_grade_created_at
+ON assessment_papers(grade, created_at);
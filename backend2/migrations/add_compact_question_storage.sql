@@ -0,0 +1,38 @@
+-- Migration: Compact question storage
+-- Date: 2026-10-18
+-- Description: Questions can be stored as (template version, seed) instead of
+-- full rendered text. Text columns become nullable; enable with
+-- QUESTION_STORAGE_MODE=compact.
+
+-- Immutable snapshots of the scripts questions were generated from
+CREATE TABLE IF NOT EXISTS question_template_versions (
+    version_hash VARCHAR PRIMARY KEY,
+    source VARCHAR NOT NULL,
+    template_id INTEGER NOT NULL,
+    scripts JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_question_template_versions_template_id
+ON question_template_versions(template_id);
+
+-- Generated questions (job output)
+ALTER TABLE generated_questions
+ADD COLUMN IF NOT EXISTS template_version VARCHAR,
+ADD COLUMN IF NOT EXISTS generation_seed BIGINT;
+
+ALTER TABLE generated_questions
+ALTER COLUMN question_html DROP NOT NULL;
+
+-- Assessment session questions
+ALTER TABLE assessment_session_questions
+ADD COLUMN IF NOT EXISTS template_version VARCHAR,
+ADD COLUMN IF NOT EXISTS generation_seed BIGINT;
+
+ALTER TABLE assessment_session_questions
+ALTER COLUMN question_html DROP NOT NULL;
+
+-- Practice attempts (reference only; attempts always keep their text)
+ALTER TABLE v2_question_attempts
+ADD COLUMN IF NOT EXISTS template_version VARCHAR,
+ADD COLUMN IF NOT EXISTS generation_seed BIGINT;
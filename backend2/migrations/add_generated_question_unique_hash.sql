@@ -0,0 +1,16 @@
+-- Migration: Unique generated questions per template
+-- Date: 2026-10-18
+-- Description: Generation jobs check stored hash signatures in memory and
+-- bulk insert with ON CONFLICT (template_id, hash_signature) DO NOTHING; this
+-- unique index is the conflict target and keeps concurrent jobs for the same
+-- template from storing a question twice. Existing duplicates (from jobs
+-- that raced before this index) are removed first, keeping the oldest row.
+
+DELETE FROM generated_questions g
+USING generated_questions older
+WHERE g.template_id = older.template_id
+  AND g.hash_signature = older.hash_signature
+  AND g.generated_question_id > older.generated_question_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_generated_questions_template_hash
+ON generated_questions(template_id, hash_signature);
@@ -0,0 +1,9 @@
+-- Migration: Generation job checkpoints
+-- Date: 2026-10-18
+-- Description: Generation jobs commit their questions in checkpoints along
+-- with generated_count and the next seed index (next_sample_index), so a
+-- failed or interrupted job resumes where it stopped. cancel_requested asks a
+-- running job to stop at its next checkpoint.
+
+ALTER TABLE question_generation_jobs ADD COLUMN IF NOT EXISTS next_sample_index INTEGER DEFAULT 0;
+ALTER TABLE question_generation_jobs ADD COLUMN IF NOT EXISTS cancel_requested BOOLEAN DEFAULT FALSE;
@@ -0,0 +1,17 @@
+-- Migration: Generation job worker
+-- Date: 2026-10-18
+-- Description: Queue bookkeeping for question_generation_jobs, which the
+-- generation worker (python -m app.worker) claims with
+-- SELECT ... FOR UPDATE SKIP LOCKED. Running jobs refresh heartbeat_at; jobs
+-- whose heartbeat goes stale are requeued, and failed attempts are retried
+-- after run_after.
+
+ALTER TABLE question_generation_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0;
+ALTER TABLE question_generation_jobs ADD COLUMN IF NOT EXISTS worker_id VARCHAR;
+ALTER TABLE question_generation_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
+ALTER TABLE question_generation_jobs ADD COLUMN IF NOT EXISTS run_after TIMESTAMP;
+
+-- Queue scans only look at pending and processing jobs
+CREATE INDEX IF NOT EXISTS idx_question_generation_jobs_queue
+ON question_generation_jobs(status, created_at)
+WHERE status IN ('pending', 'processing');
@@ -0,0 +1,15 @@
+-- Migration: Practice pool spill table
+-- Date: 2026-10-18
+-- Description: Pre-generated practice instances persisted across restarts
+-- when PRACTICE_POOL_SPILL is enabled.
+
+CREATE TABLE IF NOT EXISTS practice_pool_instances (
+    instance_id SERIAL PRIMARY KEY,
+    pool_key VARCHAR NOT NULL,
+    template_id INTEGER NOT NULL,
+    payload JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_practice_pool_instances_pool_key
+ON practice_pool_instances(pool_key);
@@ -0,0 +1,24 @@
+-- Migration: Background roster imports
+-- Date: 2026-10-18
+-- Description: Progress and per-row errors of large student roster uploads,
+-- which are imported in chunks in the background and polled by the uploader.
+-- Students are inserted with ON CONFLICT (serial_number) DO NOTHING, relying on
+-- the existing unique index on assessment_students.serial_number.
+
+CREATE TABLE IF NOT EXISTS assessment_roster_imports (
+    id SERIAL PRIMARY KEY,
+    uploaded_by_user_id UUID NOT NULL REFERENCES users(user_id),
+    filename VARCHAR,
+    status VARCHAR DEFAULT 'pending',
+    total_rows INTEGER,
+    processed_rows INTEGER DEFAULT 0,
+    uploaded_count INTEGER DEFAULT 0,
+    error_count INTEGER DEFAULT 0,
+    errors JSON,
+    status_detail VARCHAR,
+    created_at TIMESTAMP DEFAULT NOW(),
+    completed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_assessment_roster_imports_uploaded_by_user_id
+ON assessment_roster_imports(uploaded_by_user_id);
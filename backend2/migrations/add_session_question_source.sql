@@ -0,0 +1,10 @@
+-- Migration: Template source on assessment session questions
+-- Date: 2026-10-18
+-- Description: v1 and v2 template ids overlap, so session questions record
+-- which kind of template they came from ('v1' or 'v2'). Topics are resolved by
+-- (source, id); rows from before this migration keep the v2-then-v1 lookup.
+
+ALTER TABLE assessment_session_questions ADD COLUMN IF NOT EXISTS template_source VARCHAR;
+
+-- Banked papers were built without the source; the builder replaces them
+DELETE FROM assessment_papers;
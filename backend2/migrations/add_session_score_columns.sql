@@ -0,0 +1,39 @@
+-- Migration: Materialized assessment session scores
+-- Date: 2026-10-18
+-- Description: Score summary on assessment_sessions, written by submit-assessment,
+-- so reports and the dashboard read session rows instead of every question.
+-- Backfills completed sessions once (scripts/backfill_session_scores.py repeats it
+-- for sessions completed by an older deploy after the migration ran).
+
+ALTER TABLE assessment_sessions ADD COLUMN IF NOT EXISTS correct_count INTEGER;
+ALTER TABLE assessment_sessions ADD COLUMN IF NOT EXISTS wrong_count INTEGER;
+ALTER TABLE assessment_sessions ADD COLUMN IF NOT EXISTS skipped_count INTEGER;
+ALTER TABLE assessment_sessions ADD COLUMN IF NOT EXISTS total_questions INTEGER;
+ALTER TABLE assessment_sessions ADD COLUMN IF NOT EXISTS accuracy DOUBLE PRECISION;
+
+UPDATE assessment_sessions s
+SET correct_count = agg.correct,
+    skipped_count = agg.skipped,
+    wrong_count = agg.total - agg.correct - agg.skipped,
+    total_questions = agg.total,
+    accuracy = CASE WHEN agg.total > 0 THEN ROUND(agg.correct * 100.0 / agg.total, 2) ELSE 0 END
+FROM (
+    SELECT session_id,
+           COUNT(*) AS total,
+           SUM(CASE WHEN is_correct = 'True' THEN 1 ELSE 0 END) AS correct,
+           SUM(CASE WHEN (is_correct IS NULL OR is_correct <> 'True')
+                     AND (student_answer IS NULL OR student_answer = '') THEN 1 ELSE 0 END) AS skipped
+    FROM assessment_session_questions
+    GROUP BY session_id
+) agg
+WHERE s.id = agg.session_id
+  AND s.status = 'COMPLETED'
+  AND s.total_questions IS NULL;
+
+-- Completed sessions without any questions
+UPDATE assessment_sessions
+SET correct_count = 0, wrong_count = 0, skipped_count = 0, total_questions = 0, accuracy = 0
+WHERE status = 'COMPLETED' AND total_questions IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_assessment_sessions_student_status
+ON assessment_sessions(student_id, status);
@@ -0,0 +1,20 @@
+-- Migration: Template output cardinality
+-- Date: 2026-10-18
+-- Description: Estimated number of distinct questions per template, inferred
+-- from duplicate rates, so generators stop early on saturated templates.
+-- Jobs that stop early explain why in status_detail.
+
+CREATE TABLE IF NOT EXISTS template_cardinality (
+    source VARCHAR NOT NULL,
+    template_id INTEGER NOT NULL,
+    version_hash VARCHAR NOT NULL,
+    samples_observed INTEGER NOT NULL,
+    distinct_observed INTEGER NOT NULL,
+    estimated_cardinality INTEGER,
+    saturated BOOLEAN DEFAULT FALSE,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (source, template_id)
+);
+
+ALTER TABLE question_generation_jobs
+ADD COLUMN IF NOT EXISTS status_detail TEXT;
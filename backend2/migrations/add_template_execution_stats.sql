@@ -0,0 +1,29 @@
+-- Migration: Per-template executor metrics
+-- Date: 2026-10-18
+-- Description: Flushed windows of executor counters/latency per template,
+-- read by GET /admin/template-metrics.
+
+CREATE TABLE IF NOT EXISTS template_execution_stats (
+    stat_id SERIAL PRIMARY KEY,
+    source VARCHAR NOT NULL,
+    template_id INTEGER,
+    window_start TIMESTAMP NOT NULL,
+    window_end TIMESTAMP NOT NULL,
+    calls INTEGER DEFAULT 0,
+    executions INTEGER DEFAULT 0,
+    failures INTEGER DEFAULT 0,
+    timeouts INTEGER DEFAULT 0,
+    compile_ms DOUBLE PRECISION DEFAULT 0,
+    run_ms DOUBLE PRECISION DEFAULT 0,
+    run_ms_max DOUBLE PRECISION DEFAULT 0,
+    run_histogram JSON,
+    exceptions JSON,
+    samples_checked INTEGER DEFAULT 0,
+    duplicates INTEGER DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_template_execution_stats_template_id
+ON template_execution_stats(template_id);
+
+CREATE INDEX IF NOT EXISTS idx_template_execution_stats_window_end
+ON template_execution_stats(window_end);
@@ -0,0 +1,36 @@
+"""
+Score completed assessment sessions that have no materialized score yet.
+
+The add_session_score_columns migration backfills existing sessions. Run this
+once more if an older deploy completed sessions after the migration ran;
+reports and the dashboard only read the score columns.
+
+Usage:
+    python scripts/backfill_session_scores.py
+"""
+
+import importlib
+import os
+import sys
+
+# Allow running as `python scripts/backfill_session_scores.py` from backend2/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    from app.db.session import SessionLocal
+    # Registers User, which assessment students relate to
+    importlib.import_module("app.modules.auth.models")
+    from app.modules.assessment_integration import service as paper_service
+
+    db = SessionLocal()
+    try:
+        scored = paper_service.backfill_session_scores(db)
+        print(f"Scored {scored} assessment sessions")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark for the topic-diverse template sampler.
+
+Times TemplateSampler.sample against the list-based selector it replaced
+(membership tests on lists of dicts) on synthetic template-index pools.
+Pure CPU: needs no database or sandbox.
+
+Usage:
+    python scripts/bench_sampler.py
+    python scripts/bench_sampler.py --pool 10000 --count 25 --count 500 --topics 200 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Allow running as `python scripts/bench_sampler.py` from backend2/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark template sampling")
+    parser.add_argument("--pool", type=int, action="append", help="Pool size (repeatable; default 1000 and 10000)")
+    parser.add_argument("--count", type=int, action="append", help="Templates to pick (repeatable; default 25 and 500)")
+    parser.add_argument("--topics", type=int, default=150, help="Distinct topics in the pool")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per measurement")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args(argv)
+
+
+def make_pool(size, topics, rng):
+    return [
+        {
+            "id": i,
+            "source": "v2",
+            "topic": f"topic-{rng.randrange(topics)}",
+            "difficulty": rng.choice(["Easy", "Easy", "Medium"]),
+            "type": rng.choice(["MCQ", "User Input"])
+        }
+        for i in range(size)
+    ]
+
+
+def legacy_select_from_pool(pool, count):
+    """The selector start_assessment used before TemplateSampler"""
+    if not pool: return []
+    if len(pool) <= count: return pool
+
+    topic_map = {}
+    for item in pool:
+        topic_map.setdefault(item['topic'], []).append(item)
+
+    selected = []
+    topics = list(topic_map.keys())
+    random.shuffle(topics)
+    for t in topics:
+        if len(selected) < count:
+            selected.append(random.choice(topic_map[t]))
+    while len(selected) < count:
+        t = random.choice(topics)
+        available = [i for i in topic_map[t] if i not in selected]
+        if available:
+            selected.append(random.choice(available))
+        else:
+            selected.append(random.choice(topic_map[t]))
+    return selected
+
+
+def legacy_paper(pool, count):
+    mcq = [t for t in pool if t['type'].lower() == 'mcq']
+    other = [t for t in pool if t['type'].lower() != 'mcq']
+    half = count // 2
+    return legacy_select_from_pool(mcq, half) + legacy_select_from_pool(other, count - half)
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from app.modules.questions.sampler import index_sampler
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    print(f"{'pool':>7} {'count':>6} {'legacy ms':>10} {'sampler ms':>11} {'speedup':>8}")
+    for size in args.pool or [1000, 10000]:
+        pool = make_pool(size, args.topics, rng)
+        seen = {(item['source'], item['id']) for item in rng.sample(pool, min(len(pool), 200))}
+        for count in args.count or [25, 500]:
+            half = count // 2
+            legacy_ms = measure(lambda: legacy_paper(pool, count), args.repeat)
+            sampler_ms = measure(lambda: index_sampler.sample(
+                pool, count,
+                topic_cap=max(1, count // 10),
+                type_quota={'mcq': half, 'input': count - half},
+                difficulty_mix={'easy': 0.7, 'medium': 0.3},
+                exclude_ids=seen,
+                rng=rng
+            ), args.repeat)
+            print(f"{size:>7} {count:>6} {legacy_ms:>10.2f} {sampler_ms:>11.2f} {legacy_ms / sampler_ms:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Top up the assessment paper bank ahead of an exam.
+
+Builds complete papers per grade (Grade 7 blueprint, or the grade's MCQ/input
+mix) until each grade has --depth ready papers. Run it before exam day so
+start-assessment only has to claim papers; the API's background builder then
+keeps the bank topped up to ASSESSMENT_PAPER_BANK_DEPTH.
+
+Usage:
+    python scripts/build_paper_bank.py --grade 7 --depth 300
+    python scripts/build_paper_bank.py --depth 100          # every grade with students
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+# Allow running as `python scripts/build_paper_bank.py` from backend2/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-build assessment papers per grade")
+    parser.add_argument("--grade", type=int, action="append", help="Grade to build (repeatable; default: every grade with students)")
+    parser.add_argument("--depth", type=int, default=None, help="Ready papers wanted per grade (default: ASSESSMENT_PAPER_BANK_DEPTH)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from app.db.session import SessionLocal
+    # Registers User, which assessment students relate to
+    importlib.import_module("app.modules.auth.models")
+    from app.modules.questions.sandbox import sandbox_pool
+    from app.modules.assessment_integration import service as paper_service
+    from app.modules.assessment_integration.paper_bank import paper_bank
+
+    if sandbox_pool.size > 0:
+        sandbox_pool.start()
+
+    db = SessionLocal()
+    try:
+        grades = args.grade or paper_bank.target_grades(db)
+        for grade_level in grades:
+            started = time.time()
+            try:
+                added = paper_bank.top_up(db, grade_level, depth=args.depth)
+            except paper_service.PaperUnavailableError as e:
+                db.rollback()
+                print(f"Grade {grade_level}: skipped ({e})")
+                continue
+            print(f"Grade {grade_level}: built {added} papers in {time.time() - started:.1f}s")
+    finally:
+        db.close()
+        paper_service.shutdown()
+        sandbox_pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
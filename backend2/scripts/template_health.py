@@ -0,0 +1,374 @@
+"""
+Template benchmark and health scan.
+
+Runs every QuestionGeneration (v2) and QuestionTemplate (v1) row N times in
+sandbox worker processes and reports per-template latency percentiles,
+failure/timeout rates, distinct-output cardinality and output-schema
+violations as JSON. With --baseline, exits non-zero on regressions.
+
+Only talks to the configured database; template code runs in the local
+sandbox, so it works offline against a SQLite/Postgres fixture.
+
+Usage:
+    python scripts/template_health.py --runs 50 --output report.json
+    python scripts/template_health.py --database-url sqlite:///fixture.db --baseline baseline.json
+    python scripts/template_health.py --source v2 --grade 7 --save-baseline baseline.json
+
+Exit codes: 0 = ok, 1 = regressions vs. baseline, 2 = setup error.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Allow running as `python scripts/template_health.py` from backend2/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ALLOWED_TYPES = {'mcq', 'user_input', 'userinput', 'user input', 'image_based', 'image based', 'code_based', 'code based'}
+# Stop running a template after this many consecutive timeouts; remaining runs count as timeouts
+MAX_CONSECUTIVE_TIMEOUTS = 3
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark and health-scan all question templates")
+    parser.add_argument("--database-url", help="Database to read templates from (defaults to DATABASE_URL)")
+    parser.add_argument("--runs", type=int, default=30, help="Executions per template")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Sandbox worker processes")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-execution timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed (same seed = same inputs across runs)")
+    parser.add_argument("--source", choices=["v1", "v2"], help="Only scan one template table")
+    parser.add_argument("--template-id", type=int, action="append", help="Only scan these template ids")
+    parser.add_argument("--grade", type=int, help="Only scan templates for this grade")
+    parser.add_argument("--include-inactive", action="store_true", help="Also scan inactive v1 templates")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against this saved report and exit 1 on regressions")
+    parser.add_argument("--save-baseline", help="Also write the report to this path as the new baseline")
+    parser.add_argument("--failure-tolerance", type=float, default=0.02,
+                        help="Allowed absolute increase in failure/timeout rate")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5,
+                        help="Allowed relative increase in p95 latency")
+    parser.add_argument("--cardinality-tolerance", type=float, default=0.2,
+                        help="Allowed relative drop in distinct outputs")
+    return parser.parse_args(argv)
+
+
+def parse_grades(value):
+    """Grades from a grade_level value: a list (Postgres) or its text form, e.g. '[7, 8]' or '{7,8}'"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [int(g) for g in value]
+    return [int(g) for g in re.findall(r'-?\d+', str(value))]
+
+
+def load_templates(db, args):
+    """Return [{source, template_id, name, scripts}] using only the columns we need"""
+    from sqlalchemy import Text, type_coerce
+    from app.modules.questions.models import QuestionGeneration, QuestionTemplate
+
+    templates = []
+
+    if args.source in (None, "v2"):
+        query = db.query(
+            QuestionGeneration.template_id,
+            QuestionGeneration.skill_name,
+            QuestionGeneration.grade,
+            QuestionGeneration.question_template,
+            QuestionGeneration.answer_template,
+            QuestionGeneration.solution_template
+        )
+        if args.grade:
+            query = query.filter(QuestionGeneration.grade == args.grade)
+        if args.template_id:
+            query = query.filter(QuestionGeneration.template_id.in_(args.template_id))
+        for row in query.order_by(QuestionGeneration.template_id).all():
+            templates.append({
+                "source": "v2",
+                "template_id": row.template_id,
+                "name": f"Grade {row.grade} - {row.skill_name}",
+                "scripts": [row.question_template or "", row.answer_template or "", row.solution_template or ""]
+            })
+
+    if args.source in (None, "v1"):
+        query = db.query(
+            QuestionTemplate.template_id,
+            QuestionTemplate.topic,
+            QuestionTemplate.subtopic,
+            QuestionTemplate.dynamic_question
+        )
+        if not args.include_inactive:
+            query = query.filter(QuestionTemplate.status != "inactive")
+        # grade_level is a Postgres ARRAY; elsewhere (e.g. a SQLite fixture) it is
+        # read as stored and the grade is filtered here
+        grade_in_python = bool(args.grade) and db.get_bind().dialect.name != "postgresql"
+        if grade_in_python:
+            query = query.add_columns(type_coerce(QuestionTemplate.grade_level, Text).label("grade_level"))
+        elif args.grade:
+            query = query.filter(QuestionTemplate.grade_level.any(args.grade))
+        if args.template_id:
+            query = query.filter(QuestionTemplate.template_id.in_(args.template_id))
+        for row in query.order_by(QuestionTemplate.template_id).all():
+            if grade_in_python and args.grade not in parse_grades(row.grade_level):
+                continue
+            templates.append({
+                "source": "v1",
+                "template_id": row.template_id,
+                "name": f"{row.topic} - {row.subtopic}",
+                "scripts": [row.dynamic_question or ""]
+            })
+
+    return templates
+
+
+def schema_violations(result):
+    """Problems with an executor result that would break rendering or grading"""
+    problems = []
+
+    question = result.get('question')
+    if not isinstance(question, str) or not question.strip():
+        problems.append("question missing or empty")
+
+    if 'answer' not in result:
+        problems.append("answer missing")
+    elif not isinstance(result['answer'], (str, int, float)):
+        problems.append(f"answer has type {type(result['answer']).__name__}")
+
+    if 'options' in result:
+        options = result['options']
+        if not isinstance(options, list):
+            problems.append("options is not a list")
+        elif len(options) < 2:
+            problems.append("fewer than 2 options")
+        elif len(set(map(str, options))) != len(options):
+            problems.append("duplicate options")
+
+    q_type = result.get('type')
+    if q_type is not None and str(q_type).lower() not in ALLOWED_TYPES:
+        problems.append(f"unknown type '{q_type}'")
+
+    return problems
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return round(sorted_values[index], 3)
+
+
+def scan_template(executor, template, args):
+    """Run one template args.runs times and summarise the outcome"""
+    from app.modules.questions.executor import CodeExecutionError, CodeTimeoutError, ExecutionTrace, derive_seed
+    from app.modules.questions.pool import result_identity
+
+    run_ms = []
+    compile_ms = 0.0
+    failures = 0
+    timeouts = 0
+    exceptions = {}
+    distinct = set()
+    violations = 0
+    violation_examples = []
+    consecutive_timeouts = 0
+
+    for index in range(args.runs):
+        if consecutive_timeouts >= MAX_CONSECUTIVE_TIMEOUTS:
+            # Hopeless template; don't spend runs * timeout seconds on it
+            skipped = args.runs - index
+            timeouts += skipped
+            failures += skipped
+            exceptions["CodeTimeoutError"] = exceptions.get("CodeTimeoutError", 0) + skipped
+            break
+
+        trace = ExecutionTrace()
+        seed = derive_seed(args.seed, index)
+        start = time.perf_counter()
+        try:
+            if template["source"] == "v1":
+                result = executor.execute_generator(template["scripts"][0], seed=seed, trace=trace)
+            else:
+                result = executor.execute_sequential(template["scripts"], seed=seed, trace=trace)
+            consecutive_timeouts = 0
+        except CodeTimeoutError:
+            timeouts += 1
+            failures += 1
+            consecutive_timeouts += 1
+            exceptions["CodeTimeoutError"] = exceptions.get("CodeTimeoutError", 0) + 1
+            continue
+        except CodeExecutionError as e:
+            consecutive_timeouts = 0
+            failures += 1
+            name = trace.errors[-1] if trace.errors else type(e).__name__
+            exceptions[name] = exceptions.get(name, 0) + 1
+            continue
+        finally:
+            compile_ms += trace.compile_seconds * 1000
+            run_ms.append((sum(trace.run_seconds) or (time.perf_counter() - start)) * 1000)
+
+        distinct.add(result_identity(result))
+        problems = schema_violations(result)
+        if problems:
+            violations += 1
+            if len(violation_examples) < 3:
+                violation_examples.append({"seed": seed, "problems": problems})
+
+    run_ms.sort()
+    runs = args.runs
+    succeeded = runs - failures
+    return {
+        "key": f"{template['source']}:{template['template_id']}",
+        "source": template["source"],
+        "template_id": template["template_id"],
+        "name": template["name"],
+        "runs": runs,
+        "failures": failures,
+        "timeouts": timeouts,
+        "failure_rate": round(failures / runs, 4) if runs else 0.0,
+        "timeout_rate": round(timeouts / runs, 4) if runs else 0.0,
+        "exceptions": exceptions,
+        "avg_compile_ms": round(compile_ms / runs, 3) if runs else 0.0,
+        "p50_ms": percentile(run_ms, 0.50),
+        "p95_ms": percentile(run_ms, 0.95),
+        "p99_ms": percentile(run_ms, 0.99),
+        "distinct_outputs": len(distinct),
+        "distinct_ratio": round(len(distinct) / succeeded, 4) if succeeded else 0.0,
+        "schema_violations": violations,
+        "schema_violation_examples": violation_examples
+    }
+
+
+def compare_to_baseline(report, baseline, args):
+    """Return a list of human-readable regressions (templates present in both reports)"""
+    previous = {t["key"]: t for t in baseline.get("templates", [])}
+    regressions = []
+
+    for current in report["templates"]:
+        old = previous.get(current["key"])
+        if not old:
+            continue
+        key = current["key"]
+
+        for field in ("failure_rate", "timeout_rate"):
+            if current[field] > old.get(field, 0) + args.failure_tolerance:
+                regressions.append(f"{key}: {field} {old.get(field, 0)} -> {current[field]}")
+
+        old_p95, new_p95 = old.get("p95_ms"), current["p95_ms"]
+        # Ignore sub-millisecond noise
+        if old_p95 is not None and new_p95 is not None and new_p95 > old_p95 * (1 + args.latency_tolerance) and new_p95 - old_p95 > 1.0:
+            regressions.append(f"{key}: p95_ms {old_p95} -> {new_p95}")
+
+        old_distinct = old.get("distinct_outputs", 0)
+        if old.get("runs") == current["runs"] and current["distinct_outputs"] < old_distinct * (1 - args.cardinality_tolerance):
+            regressions.append(f"{key}: distinct_outputs {old_distinct} -> {current['distinct_outputs']}")
+
+        if current["schema_violations"] > 0 and old.get("schema_violations", 0) == 0:
+            regressions.append(f"{key}: new schema violations ({current['schema_violations']})")
+
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if not os.environ.get("DATABASE_URL"):
+        # Settings may still pick it up from .env
+        try:
+            from app.core.config import settings
+            configured = bool(settings.DATABASE_URL)
+        except Exception as e:
+            print(f"Error: no database configured ({e})", file=sys.stderr)
+            return 2
+        if not configured:
+            print("Error: no database configured (DATABASE_URL is empty)", file=sys.stderr)
+            return 2
+
+    from app.db.session import SessionLocal
+    from app.modules.questions.sandbox import SandboxPool, PooledQuestionExecutor
+
+    db = SessionLocal()
+    try:
+        templates = load_templates(db, args)
+    except Exception as e:
+        print(f"Error: could not load templates: {e}", file=sys.stderr)
+        return 2
+    finally:
+        db.close()
+
+    if not templates:
+        print("Error: no templates matched", file=sys.stderr)
+        return 2
+
+    pool = SandboxPool(
+        size=args.workers,
+        timeout_seconds=args.timeout,
+        acquire_timeout_seconds=max(60.0, args.timeout * 4)
+    )
+    executor = PooledQuestionExecutor(pool)
+
+    started = time.perf_counter()
+    print(f"Scanning {len(templates)} templates x {args.runs} runs on {args.workers} workers...", file=sys.stderr)
+    try:
+        pool.start()
+        with ThreadPoolExecutor(max_workers=args.workers) as threads:
+            results = list(threads.map(lambda t: scan_template(executor, t, args), templates))
+    finally:
+        pool.shutdown()
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "runs_per_template": args.runs,
+        "seed": args.seed,
+        "duration_seconds": round(time.perf_counter() - started, 2),
+        "summary": {
+            "templates": len(results),
+            "with_failures": sum(1 for r in results if r["failures"]),
+            "with_timeouts": sum(1 for r in results if r["timeouts"]),
+            "with_schema_violations": sum(1 for r in results if r["schema_violations"]),
+            "low_cardinality": sum(1 for r in results if r["runs"] - r["failures"] > 1 and r["distinct_ratio"] < 0.5)
+        },
+        "templates": results
+    }
+
+    regressions = []
+    if args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: could not read baseline {args.baseline}: {e}", file=sys.stderr)
+            return 2
+        regressions = compare_to_baseline(report, baseline, args)
+        report["regressions"] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output)
+
+    summary = report["summary"]
+    print(
+        f"Done in {report['duration_seconds']}s: {summary['with_failures']} failing, "
+        f"{summary['with_timeouts']} timing out, {summary['with_schema_violations']} with schema violations",
+        file=sys.stderr
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())